@@ -0,0 +1,112 @@
+"""
+Measures the client side cost of arsenic commands against the in-process
+fake WebDriver server.
+
+Usage::
+
+    python benchmarks/client_overhead.py [--iterations N] [--latency SECONDS]
+
+For every benchmarked command the harness reports the number of commands per
+second and the p50/p99 client overhead, which is the round trip time of the
+command minus the time the fake server spent handling it.
+
+Log events are still rendered, but not printed, unless ``--print-logs`` is
+given. ``--no-trace`` disables wire tracing altogether.
+"""
+import argparse
+import asyncio
+import time
+from statistics import median
+from typing import Awaitable, Callable, Dict, List
+
+import structlog
+
+from arsenic import browsers, get_session
+from arsenic.codec import JSONCodec, MsgspecCodec, OrjsonCodec
+from arsenic.fakedriver import FakeDriver, FakeDriverService
+from arsenic.session import Session
+
+
+CODECS = {"json": JSONCodec, "orjson": OrjsonCodec, "msgspec": MsgspecCodec}
+
+
+def percentile(values: List[float], percent: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(percent / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def build_commands(
+    session: Session,
+) -> Dict[str, Callable[[], Awaitable[object]]]:
+    await session.get("/")
+    element = await session.get_element("h1")
+    return {
+        "get_url": session.get_url,
+        "get_page_source": session.get_page_source,
+        "get_element": lambda: session.get_element("h1"),
+        "get_elements": lambda: session.get_elements("li"),
+        "execute_script": lambda: session.execute_script("return 1"),
+        "get_screenshot": session.get_screenshot,
+        "get_all_cookies": session.get_all_cookies,
+        "add_cookie": lambda: session.add_cookie("name", "value"),
+        "get_window_handle": session.get_window_handle,
+        "element.get_text": element.get_text,
+        "element.get_attribute": lambda: element.get_attribute("id"),
+        "element.click": element.click,
+        "element.is_displayed": element.is_displayed,
+        "element.get_rect": element.get_rect,
+        "get": lambda: session.get("/"),
+    }
+
+
+async def run(service: FakeDriverService, iterations: int, warmup: int, trace: bool):
+    driver = service.driver
+    print(f"{'command':<24}{'cmd/s':>10}{'p50 overhead':>16}{'p99 overhead':>16}")
+    async with get_session(service, browsers.Chrome(), "http://fake") as session:
+        if not trace:
+            session.connection.tracer = None
+        for name, command in (await build_commands(session)).items():
+            for _ in range(warmup):
+                await command()
+            overheads = []
+            start = time.perf_counter()
+            for _ in range(iterations):
+                before = time.perf_counter()
+                await command()
+                elapsed = time.perf_counter() - before
+                overheads.append(elapsed - driver.server_times[-1])
+            total = time.perf_counter() - start
+            print(
+                f"{name:<24}{iterations / total:>10.0f}"
+                f"{median(overheads) * 1e6:>14.0f}us"
+                f"{percentile(overheads, 99) * 1e6:>14.0f}us"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=500)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0)
+    parser.add_argument("--page-source-size", type=int, default=64 * 1024)
+    parser.add_argument("--screenshot-size", type=int, default=256 * 1024)
+    parser.add_argument("--script-result-size", type=int, default=0)
+    parser.add_argument("--print-logs", action="store_true")
+    parser.add_argument("--no-trace", action="store_true")
+    parser.add_argument("--codec", choices=sorted(CODECS), default="json")
+    args = parser.parse_args()
+    if not args.print_logs:
+        structlog.configure(logger_factory=structlog.ReturnLoggerFactory())
+    driver = FakeDriver(
+        latency=args.latency,
+        page_source_size=args.page_source_size,
+        screenshot_size=args.screenshot_size,
+        script_result_size=args.script_result_size,
+    )
+    service = FakeDriverService(driver, codec=CODECS[args.codec]())
+    asyncio.run(run(service, args.iterations, args.warmup, not args.no_trace))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Compares the encode and decode speed of the available codecs on typical
+webdriver payloads.
+
+Usage::
+
+    python benchmarks/codecs.py [--number N]
+"""
+import argparse
+import base64
+import os
+import timeit
+
+from arsenic import constants
+from arsenic.codec import JSONCodec, MsgspecCodec, OrjsonCodec
+
+
+def payloads():
+    elements = [{constants.WEB_ELEMENT: f"element-{i}"} for i in range(500)]
+    return {
+        "find element request": {"using": "css selector", "value": "div > a.link"},
+        "element response": {"value": elements[0]},
+        "elements response": {"value": elements},
+        "page source 1MB": {"value": "<p>text</p>" * (1024 * 1024 // 11)},
+        "screenshot 2MB": {
+            "value": base64.b64encode(os.urandom(1536 * 1024)).decode("ascii")
+        },
+        "script result": {
+            "value": [
+                {"text": f"row {i}", "attrs": {"class": "cell"}, "x": i, "y": i}
+                for i in range(500)
+            ]
+        },
+    }
+
+
+def available_codecs():
+    codecs = {"json": JSONCodec()}
+    for name, codec_class in (("orjson", OrjsonCodec), ("msgspec", MsgspecCodec)):
+        try:
+            codecs[name] = codec_class()
+        except ImportError:
+            print(f"{name} not installed, skipping")
+    return codecs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--number", type=int, default=50)
+    args = parser.parse_args()
+    codecs = available_codecs()
+    print(f"{'payload':<24}{'codec':<10}{'encode':>12}{'decode':>12}")
+    for name, payload in payloads().items():
+        for codec_name, codec in codecs.items():
+            body = codec.encode(payload)
+            encode = timeit.timeit(lambda: codec.encode(payload), number=args.number)
+            decode = timeit.timeit(lambda: codec.decode(body), number=args.number)
+            print(
+                f"{name:<24}{codec_name:<10}"
+                f"{encode / args.number * 1e6:>10.0f}us"
+                f"{decode / args.number * 1e6:>10.0f}us"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Compares the cost of running every command in its own task, as arsenic used
+to, with running it inline in the caller's task and with shielded commands.
+
+Usage::
+
+    python benchmarks/request_path.py [--iterations N]
+"""
+import argparse
+import asyncio
+import time
+
+import structlog
+
+from arsenic import browsers
+from arsenic.fakedriver import FakeDriverService
+
+
+async def noop():
+    return None
+
+
+async def measure(func, iterations: int) -> float:
+    for _ in range(min(iterations, 100)):
+        await func()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        await func()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+async def run(iterations: int):
+    loop = asyncio.get_event_loop()
+    print(f"{'mode':<28}{'per call':>12}")
+    inline = await measure(noop, iterations)
+    tasked = await measure(lambda: loop.create_task(noop()), iterations)
+    print(f"{'coroutine, inline':<28}{inline:>10.2f}us")
+    print(f"{'coroutine, task per call':<28}{tasked:>10.2f}us")
+
+    driver = await FakeDriverService().start()
+    try:
+        session = await driver.new_session(browsers.Chrome())
+        session.connection.tracer = None
+        connection = session.connection
+
+        def command():
+            return connection.request(url="/url", method="GET")
+
+        def tasked_command():
+            return loop.create_task(
+                connection._perform(url="/url", method="GET", data=None, timeout=None)
+            )
+
+        results = {"command, inline": await measure(command, iterations)}
+        results["command, task per call"] = await measure(tasked_command, iterations)
+        connection.shielded = True
+        results["command, shielded"] = await measure(command, iterations)
+        for name, value in results.items():
+            print(f"{name:<28}{value:>10.2f}us")
+        await session.close()
+    finally:
+        await driver.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+    structlog.configure(logger_factory=structlog.ReturnLoggerFactory())
+    asyncio.run(run(args.iterations))
+
+
+if __name__ == "__main__":
+    main()
@@ -10,23 +10,35 @@ class SessionContext:
     service = attr.ib()
     browser = attr.ib()
     bind = attr.ib()
+    timeouts = attr.ib(default=None)
+    scheduler = attr.ib(default=None)
     session = attr.ib(default=None)
 
     async def __aenter__(self):
-        self.session = await start_session(self.service, self.browser, self.bind)
+        self.session = await start_session(
+            self.service,
+            self.browser,
+            self.bind,
+            timeouts=self.timeouts,
+            scheduler=self.scheduler,
+        )
         return self.session
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         await stop_session(self.session)
 
 
-def get_session(service, browser, bind=""):
-    return SessionContext(service, browser, bind)
+def get_session(service, browser, bind="", *, timeouts=None, scheduler=None):
+    return SessionContext(service, browser, bind, timeouts, scheduler)
 
 
-async def start_session(service: Service, browser: Browser, bind=""):
+async def start_session(
+    service: Service, browser: Browser, bind="", *, timeouts=None, scheduler=None
+):
     driver = await service.start()
-    return await driver.new_session(browser, bind=bind)
+    return await driver.new_session(
+        browser, bind=bind, timeouts=timeouts, scheduler=scheduler
+    )
 
 
 async def stop_session(session: Session):
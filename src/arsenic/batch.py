@@ -0,0 +1,151 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+import attr
+
+from arsenic.session import Element, FetchOptions, Session
+
+# element methods whose results Session.fetch can read, by fetch parameter
+ELEMENT_READS = {
+    Element.get_text: "text",
+    Element.get_attribute: "attrs",
+    Element.get_property: "props",
+    Element.get_css_value: "css",
+    Element.get_rect: "rect",
+    Element.is_displayed: "displayed",
+    Element.is_enabled: "enabled",
+}
+NAMED_READS = ("attrs", "props", "css")
+
+
+@attr.s
+class Call:
+    future: asyncio.Future = attr.ib()
+    func: Callable[..., Awaitable[Any]] = attr.ib()
+    args: Tuple[Any, ...] = attr.ib()
+    kwargs: Dict[str, Any] = attr.ib()
+
+
+@attr.s
+class Read:
+    future: asyncio.Future = attr.ib()
+    call: Call = attr.ib()
+    element: Element = attr.ib()
+    field: str = attr.ib()
+
+    @property
+    def name(self) -> str:
+        if self.call.args:
+            return self.call.args[0]
+        return self.call.kwargs["name"]
+
+
+class Batch:
+    """
+    Collects commands and dispatches them together, at most ``concurrency``
+    at a time, when the batch is flushed or its context exits.
+
+    Reads of element values are coalesced into a single
+    :py:meth:`arsenic.session.Session.fetch` call if ``coalesce`` is true,
+    in which case they follow the semantics of its script.
+    """
+
+    def __init__(self, session: Session, concurrency: int = 8, coalesce: bool = False):
+        self.session = session
+        self.concurrency = concurrency
+        self.coalesce = coalesce
+        self._calls: List[Call] = []
+        self._reads: List[Read] = []
+        self._futures: List[asyncio.Future] = []
+
+    def add(self, func: Callable[..., Awaitable[Any]], *args, **kwargs):
+        """
+        Queues the coroutine function ``func`` to be called with ``args`` and
+        ``kwargs``, returning a future of its result.
+        """
+        future = asyncio.get_event_loop().create_future()
+        self._futures.append(future)
+        call = Call(future, func, args, kwargs)
+        field = ELEMENT_READS.get(getattr(func, "__func__", None), None)
+        if self.coalesce and field is not None:
+            self._reads.append(Read(future, call, func.__self__, field))
+        else:
+            self._calls.append(call)
+        return future
+
+    async def flush(self):
+        """
+        Dispatches all queued commands and waits for them to finish.
+        """
+        calls, self._calls = self._calls, []
+        reads, self._reads = self._reads, []
+        semaphore = asyncio.Semaphore(self.concurrency)
+        jobs = [self._run(semaphore, call) for call in calls]
+        if reads and self.session.fetch_script:
+            jobs.append(self._fetch(semaphore, reads))
+        else:
+            jobs.extend(self._run(semaphore, read.call) for read in reads)
+        await asyncio.gather(*jobs)
+
+    async def __aenter__(self) -> "Batch":
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is not None:
+            for future in self._futures:
+                future.cancel()
+            return
+        await self.flush()
+        errors = [
+            future.exception() for future in self._futures if not future.cancelled()
+        ]
+        errors = [error for error in errors if error is not None]
+        if errors:
+            raise errors[0]
+
+    async def _run(self, semaphore: asyncio.Semaphore, call: Call):
+        async with semaphore:
+            try:
+                result = await call.func(*call.args, **call.kwargs)
+            except Exception as exc:
+                call.future.set_exception(exc)
+            else:
+                call.future.set_result(result)
+
+    async def _fetch(self, semaphore: asyncio.Semaphore, reads: List[Read]):
+        elements = list({read.element.id: read.element for read in reads}.values())
+        fields = {field: [] for field in NAMED_READS}
+        for read in reads:
+            if read.field in NAMED_READS:
+                if read.name not in fields[read.field]:
+                    fields[read.field].append(read.name)
+            else:
+                fields[read.field] = True
+        options = FetchOptions(
+            text=fields.get("text", False),
+            attrs=fields["attrs"],
+            props=fields["props"],
+            css=fields["css"],
+            rect=fields.get("rect", False),
+            displayed=fields.get("displayed", False),
+            enabled=fields.get("enabled", False),
+        )
+        async with semaphore:
+            try:
+                rows = await self.session._fetch_script(elements, options)
+            except Exception as exc:
+                for read in reads:
+                    read.future.set_exception(exc)
+                return
+        if rows is None:
+            await asyncio.gather(*(self._run(semaphore, read.call) for read in reads))
+            return
+        data = {
+            element.id: options.build(element, row)
+            for element, row in zip(elements, rows)
+        }
+        for read in reads:
+            value = getattr(data[read.element.id], read.field)
+            if read.field in NAMED_READS:
+                value = value[read.name]
+            read.future.set_result(value)
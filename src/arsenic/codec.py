@@ -0,0 +1,73 @@
+import abc
+import json
+from typing import Any
+
+
+class Codec(metaclass=abc.ABCMeta):
+    """
+    Encodes request bodies sent to and decodes response bodies received from
+    a webdriver.
+    """
+
+    @abc.abstractmethod
+    def encode(self, data: Any) -> bytes:
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    def decode(self, body: bytes) -> Any:
+        """
+        Decodes a response body. Must raise a :py:class:`ValueError` if the
+        body is not valid.
+        """
+        raise NotImplementedError()
+
+
+class JSONCodec(Codec):
+    def encode(self, data: Any) -> bytes:
+        return json.dumps(data).encode("utf-8")
+
+    def decode(self, body: bytes) -> Any:
+        return json.loads(body)
+
+
+class OrjsonCodec(Codec):
+    def __init__(self):
+        import orjson
+
+        self._dumps = orjson.dumps
+        self._loads = orjson.loads
+
+    def encode(self, data: Any) -> bytes:
+        return self._dumps(data)
+
+    def decode(self, body: bytes) -> Any:
+        return self._loads(body)
+
+
+class MsgspecCodec(Codec):
+    def __init__(self):
+        import msgspec.json
+
+        self._encoder = msgspec.json.Encoder()
+        self._decoder = msgspec.json.Decoder()
+
+    def encode(self, data: Any) -> bytes:
+        return self._encoder.encode(data)
+
+    def decode(self, body: bytes) -> Any:
+        return self._decoder.decode(body)
+
+
+def fastest_codec() -> Codec:
+    """
+    Returns the fastest codec available in the current environment.
+    """
+    for codec_class in (OrjsonCodec, MsgspecCodec):
+        try:
+            return codec_class()
+        except ImportError:
+            pass
+    return JSONCodec()
+
+
+default_codec = JSONCodec()
@@ -1,27 +1,102 @@
 import asyncio
 import base64
-import json
-from functools import wraps
+import os
+import tempfile
+from copy import copy
+from functools import partial, wraps
 from io import BytesIO
-from json import JSONDecodeError
 from pathlib import Path
-from typing import Any, Tuple
-from urllib.parse import urlparse, urlunparse
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    BinaryIO,
+    Callable,
+    Dict,
+    Optional,
+    Tuple,
+)
 from zipfile import ZIP_DEFLATED, ZipFile
 
-from aiohttp import ClientSession
+from aiohttp import ClientSession, ClientTimeout
 from structlog import get_logger
 
 from arsenic import errors, constants
+from arsenic.codec import Codec, default_codec
+from arsenic.retry import RetryPolicy, TransientStatus
+from arsenic.scheduler import CommandScheduler
+from arsenic.streaming import ValueStream
+from arsenic.timeouts import CommandTimeouts, remaining
+from arsenic.tracing import WireTracer, default_tracer, truncate
+from arsenic.uploads import UploadCache
+from arsenic.utils import strip_auth
 
 log = get_logger()
 
 
-def wrap_screen(data):
+class LazyScreen(BytesIO):
+    """
+    Base64 encoded PNG of the browser screen sent along with an error. It is
+    decoded the first time it is read, which most of the time is never.
+    """
+
+    def __init__(self, encoded: str):
+        super().__init__()
+        self.encoded: Optional[str] = encoded
+
+    @property
+    def decoded(self) -> BytesIO:
+        self._decode()
+        return self
+
+    def _decode(self):
+        if self.encoded is None:
+            return
+        encoded, self.encoded = self.encoded, None
+        super().write(base64.b64decode(encoded))
+        super().seek(0)
+
+    def __repr__(self):
+        if self.encoded is not None:
+            return f"<LazyScreen encoded={len(self.encoded)}>"
+        return f"<LazyScreen decoded={len(super().getbuffer())}>"
+
+
+def _decoding(name: str):
+    method = getattr(BytesIO, name)
+
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        self._decode()
+        return method(self, *args, **kwargs)
+
+    return wrapper
+
+
+for _name in (
+    "getbuffer",
+    "getvalue",
+    "read",
+    "read1",
+    "readinto",
+    "readinto1",
+    "readline",
+    "readlines",
+    "seek",
+    "tell",
+    "truncate",
+    "write",
+    "writelines",
+    "__next__",
+):
+    setattr(LazyScreen, _name, _decoding(_name))
+
+
+def wrap_screen(data, drop: bool = False):
     """
     Data returned from a webdriver may contain a screen, which is a base64
     encoded PNG of the browser screen. This is a massive string and will make
-    logging useless, so we wrap it in a BytesIO.
+    logging useless, so we wrap it in a LazyScreen, or drop it entirely.
     """
     if (
         isinstance(data, dict)
@@ -30,7 +105,10 @@ def wrap_screen(data):
         and "screen" in data["value"]
         and data["value"]["screen"]
     ):
-        data["value"]["screen"] = BytesIO(base64.b64decode(data["value"]["screen"]))
+        if drop:
+            data["value"]["screen"] = None
+        else:
+            data["value"]["screen"] = LazyScreen(data["value"]["screen"])
 
 
 def unwrap(value):
@@ -50,23 +128,21 @@ def unwrap(value):
 
 
 def ensure_task(func):
+    """
+    Makes sure the coroutine function ``func`` runs inside a task, which
+    aiohttp needs for its timeouts. A new task is only created if the caller
+    is not running in one already.
+    """
+
     @wraps(func)
     async def wrapper(*args, **kwargs):
+        if asyncio.current_task() is not None:
+            return await func(*args, **kwargs)
         return await asyncio.get_event_loop().create_task(func(*args, **kwargs))
 
     return wrapper
 
 
-def strip_auth(url: str) -> str:
-    pr = urlparse(url)
-    safe_netloc = pr.hostname
-    if pr.port:
-        safe_netloc = f"{safe_netloc}:{pr.port}"
-    return urlunparse(
-        (pr.scheme, safe_netloc, pr.path, pr.params, pr.query, pr.fragment)
-    )
-
-
 def check_response_error(*, status: int, data: Any) -> None:
     if status >= 400:
         errors.raise_exception(data, status)
@@ -81,63 +157,352 @@ def check_response_error(*, status: int, data: Any) -> None:
 
 
 class Connection:
-    def __init__(self, session: ClientSession, prefix: str):
+    def __init__(
+        self,
+        session: ClientSession,
+        prefix: str,
+        *,
+        codec: Optional[Codec] = None,
+        tracer: Optional[WireTracer] = default_tracer,
+        shielded: bool = False,
+        drop_error_screens: bool = False,
+        headers: Optional[Dict[str, str]] = None,
+        retry: Optional[RetryPolicy] = None,
+        timeouts: Optional[CommandTimeouts] = None,
+        scheduler: Optional[CommandScheduler] = None,
+    ):
         self.session = session
         self.prefix = prefix
+        self.codec = default_codec if codec is None else codec
+        self.tracer = tracer
+        self.shielded = shielded
+        self.drop_error_screens = drop_error_screens
+        self.headers = headers
+        self.retry = retry
+        self.timeouts = timeouts
+        self.scheduler = scheduler
 
     @ensure_task
     async def request(
         self, *, url: str, method: str, data=None, timeout=None
     ) -> Tuple[int, Any]:
-        header = {"Content-Type": "application/json"}
-        if data is None:
-            data = {}
-        if method not in {"POST", "PUT"}:
-            data = None
-            header = None
-        body = json.dumps(data) if data is not None else None
-        full_url = self.prefix + url
-        log.info(
-            "request", url=strip_auth(full_url), method=method, header=header, body=body
+        perform = partial(
+            self._perform, url=url, method=method, data=data, timeout=timeout
         )
-        async with self.session.request(
-            url=full_url, method=method, headers=header, data=body, timeout=timeout
-        ) as response:
-            response_body = await response.read()
-            try:
-                data = json.loads(response_body)
-            except JSONDecodeError as exc:
-                log.error("json-decode", body=response_body)
-                data = {"error": "!internal", "message": str(exc), "stacktrace": ""}
-            wrap_screen(data)
-            log.info(
-                "response",
-                url=strip_auth(full_url),
+        if self.shielded:
+            # A cancelled caller must not abort a command half way through,
+            # the command finishes in the background instead.
+            return await asyncio.shield(self._schedule(perform))
+        return await self._schedule(perform)
+
+    async def _schedule(
+        self, perform: Callable[[], Awaitable[Tuple[int, Any]]]
+    ) -> Tuple[int, Any]:
+        if self.scheduler is None:
+            return await perform()
+        return await self.scheduler.run(perform)
+
+    async def _perform(
+        self, *, url: str, method: str, data, timeout
+    ) -> Tuple[int, Any]:
+        header, body = self._encode(method, data)
+        return await self._deliver(
+            url=url, method=method, header=header, body=lambda: body, timeout=timeout
+        )
+
+    async def _deliver(
+        self,
+        *,
+        url: str,
+        method: str,
+        header,
+        body: Callable[[], Any],
+        timeout,
+        trace_body=None,
+    ) -> Tuple[int, Any]:
+        """
+        Sends a request, retrying it if it is idempotent. ``body`` returns
+        the body of every attempt.
+        """
+        retry = self.retry
+        if retry is None or not retry.is_idempotent(method, url):
+            return await self._send(
+                url=url,
+                method=method,
+                header=header,
+                body=body(),
+                timeout=timeout,
+                trace_body=trace_body,
+            )
+        try:
+            return await retry.run(
+                lambda: self._send(
+                    url=url,
+                    method=method,
+                    header=header,
+                    body=body(),
+                    timeout=timeout,
+                    trace_body=trace_body,
+                    transient=retry.statuses,
+                )
+            )
+        except TransientStatus as exc:
+            data = self._decode(self.prefix + url, method, exc.status, exc.body, False)
+            return exc.status, data
+
+    async def _send(
+        self,
+        *,
+        url: str,
+        method: str,
+        header,
+        body,
+        timeout,
+        trace_body=None,
+        transient=frozenset(),
+    ) -> Tuple[int, Any]:
+        full_url = self.prefix + url
+        client_timeout = self._timeout(method, url, full_url, timeout)
+        tracer = self.tracer
+        trace = tracer is not None and tracer.should_trace()
+        if trace:
+            tracer.request(
+                url=full_url,
                 method=method,
-                body=body,
-                response=response,
-                data=data,
+                header=header,
+                body=body if trace_body is None else trace_body,
+            )
+        try:
+            async with self.session.request(
+                url=full_url,
+                method=method,
+                headers=self._headers(header),
+                data=body,
+                timeout=client_timeout,
+            ) as response:
+                response_body = await response.read()
+        except asyncio.TimeoutError as exc:
+            raise self._timed_out(method, full_url) from exc
+        if response.status in transient:
+            raise TransientStatus(response.status, response_body)
+        data = self._decode(full_url, method, response.status, response_body, trace)
+        return response.status, data
+
+    async def stream_value(
+        self, *, url: str, method: str = "GET", data=None, timeout=None
+    ) -> AsyncIterator[str]:
+        """
+        Like :py:meth:`request`, but yields the string value of the response
+        piece by piece as it arrives, rather than reading the whole response.
+
+        The scheduler slot and the connection are held until the generator
+        finishes or is closed, so callers which may stop iterating early must
+        close it, for example using :py:func:`arsenic.streaming.aclosing`.
+        """
+        header, body = self._encode(method, data)
+        full_url = self.prefix + url
+        client_timeout = self._timeout(method, url, full_url, timeout)
+        tracer = self.tracer
+        trace = tracer is not None and tracer.should_trace()
+        scheduler = self.scheduler
+        acquired = False
+        try:
+            if scheduler is not None:
+                # the slot is held until the whole value has been streamed
+                await scheduler.acquire()
+                acquired = True
+            if trace:
+                tracer.request(url=full_url, method=method, header=header, body=body)
+            async with self.session.request(
+                url=full_url,
+                method=method,
+                headers=self._headers(header),
+                data=body,
+                timeout=client_timeout,
+            ) as response:
+                stream = ValueStream()
+                if response.status < 400:
+                    async for chunk in response.content.iter_any():
+                        for piece in stream.feed(chunk):
+                            yield piece
+                        if stream.done:
+                            break
+                    if stream.is_string:
+                        # drain the response so the connection can be reused
+                        await response.read()
+                        if not stream.done:
+                            raise errors.ArsenicError(
+                                "Incomplete response from webdriver"
+                            )
+                        if trace:
+                            tracer.response(
+                                url=full_url,
+                                method=method,
+                                status=response.status,
+                                body=None,
+                            )
+                        return
+                response_body = bytes(stream.consumed) + await response.read()
+                data = self._decode(
+                    full_url, method, response.status, response_body, trace
+                )
+                value = data.get("value", None) if isinstance(data, dict) else None
+                if isinstance(value, str):
+                    yield value
+        except asyncio.TimeoutError as exc:
+            raise self._timed_out(method, full_url) from exc
+        finally:
+            if acquired:
+                scheduler.release()
+
+    def _encode(self, method: str, data) -> Tuple[Optional[Dict[str, str]], Any]:
+        if method not in {"POST", "PUT"}:
+            return None, None
+        if data is None:
+            data = {}
+        return {"Content-Type": "application/json"}, self.codec.encode(data)
+
+    def _timeout(
+        self, method: str, url: str, full_url: str, timeout: Optional[float]
+    ) -> Optional[ClientTimeout]:
+        if timeout is None and self.timeouts is not None:
+            timeout = self.timeouts.for_command(method, url)
+        left = remaining()
+        if left is not None:
+            if left <= 0:
+                raise self._timed_out(method, full_url)
+            timeout = left if timeout is None else min(timeout, left)
+        return None if timeout is None else ClientTimeout(total=timeout)
+
+    def _timed_out(self, method: str, full_url: str) -> errors.CommandTimeout:
+        return errors.CommandTimeout(f"{method} {strip_auth(full_url)} timed out")
+
+    def _headers(self, header: Optional[Dict[str, str]]) -> Optional[Dict[str, str]]:
+        if not self.headers:
+            return header
+        if not header:
+            return self.headers
+        return {**self.headers, **header}
+
+    def _decode(
+        self, full_url: str, method: str, status: int, response_body: bytes, trace: bool
+    ) -> Any:
+        try:
+            data = self.codec.decode(response_body)
+        except ValueError as exc:
+            log.error("json-decode", body=truncate(response_body, 4096))
+            data = {"error": "!internal", "message": str(exc), "stacktrace": ""}
+        wrap_screen(data, drop=self.drop_error_screens)
+        tracer = self.tracer
+        if trace or (tracer is not None and tracer.enabled and status >= 400):
+            tracer.response(
+                url=full_url, method=method, status=status, body=response_body
             )
-            check_response_error(data=data, status=response.status)
-            return response.status, data
+        check_response_error(data=data, status=status)
+        return data
 
     async def upload_file(self, path: Path) -> Path:
         log.info("upload-file", path=path, resolved_path=path)
         return path
 
     def prefixed(self, prefix: str) -> "Connection":
-        return self.__class__(self.session, self.prefix + prefix)
+        connection = copy(self)
+        connection.prefix = self.prefix + prefix
+        return connection
+
+
+def zip_file(path: Path) -> str:
+    """
+    Zips the file at ``path`` into a temporary file and returns its path.
+    """
+    fd, archive = tempfile.mkstemp(prefix="arsenic-upload-", suffix=".zip")
+    try:
+        with os.fdopen(fd, "wb") as fobj:
+            with ZipFile(fobj, "w", ZIP_DEFLATED) as zf:
+                zf.write(path, path.name)
+    except:
+        os.unlink(archive)
+        raise
+    return archive
+
+
+def read_base64_chunk(fobj: BinaryIO, size: int) -> bytes:
+    return base64.b64encode(fobj.read(size))
 
 
 class RemoteConnection(Connection):
+    # must be a multiple of 3, so the chunks can be base64 encoded separately
+    upload_chunk_size = 3 * 256 * 1024
+
+    def __init__(
+        self,
+        session: ClientSession,
+        prefix: str,
+        *,
+        upload_cache: Optional[UploadCache] = None,
+        **kwargs,
+    ):
+        super().__init__(session, prefix, **kwargs)
+        self.upload_cache = upload_cache
+
     async def upload_file(self, path: Path) -> Path:
-        fobj = BytesIO()
-        with ZipFile(fobj, "w", ZIP_DEFLATED) as zf:
-            zf.write(path, path.name)
-        content = base64.b64encode(fobj.getvalue()).decode("utf-8")
-        status, data = await self.request(
-            url="/file", method="POST", data={"file": content}
-        )
+        cache = self.upload_cache
+        if cache is None:
+            return await self._upload_file(path)
+        loop = asyncio.get_event_loop()
+        digest = await loop.run_in_executor(None, cache.digest, path)
+        key = (self.prefix, digest, path.name)
+        value = cache.get(key)
+        if value is not None:
+            log.info("upload-file", path=path, resolved_path=value, cached=True)
+            return value
+        value = await self._upload_file(path)
+        cache.put(key, value, os.path.getsize(path))
+        return value
+
+    async def _upload_file(self, path: Path) -> Path:
+        if self.shielded:
+            # the archive is removed once the upload finished in the background
+            return await asyncio.shield(self._zip_and_upload(path))
+        return await self._zip_and_upload(path)
+
+    async def _zip_and_upload(self, path: Path) -> Path:
+        loop = asyncio.get_event_loop()
+        archive = await loop.run_in_executor(None, zip_file, path)
+        try:
+            size = os.path.getsize(archive)
+            prefix, suffix = b'{"file": "', b'"}'
+            length = len(prefix) + (size + 2) // 3 * 4 + len(suffix)
+            status, data = await self._schedule(
+                lambda: self._deliver(
+                    url="/file",
+                    method="POST",
+                    header={
+                        "Content-Type": "application/json",
+                        "Content-Length": str(length),
+                    },
+                    body=lambda: self._upload_body(archive, prefix, suffix),
+                    timeout=None,
+                    trace_body=f"<{path.name}, {length} bytes>",
+                )
+            )
+        finally:
+            await loop.run_in_executor(None, os.unlink, archive)
         value = unwrap(data.get("value", None))
         log.info("upload-file", path=path, resolved_path=value)
         return Path(value)
+
+    async def _upload_body(
+        self, archive: str, prefix: bytes, suffix: bytes
+    ) -> AsyncIterator[bytes]:
+        loop = asyncio.get_event_loop()
+        yield prefix
+        with open(archive, "rb") as fobj:
+            while True:
+                chunk = await loop.run_in_executor(
+                    None, read_base64_chunk, fobj, self.upload_chunk_size
+                )
+                if not chunk:
+                    break
+                yield chunk
+        yield suffix
@@ -0,0 +1,392 @@
+"""
+Driver daemons shared by all processes of a user, so only the first of
+them pays for starting the driver.
+
+The first process to start a :py:class:`SharedDriver` spawns a supervisor,
+which runs the driver and records its URL in a state file in the runtime
+directory. Later processes find the state file and attach to the running
+driver. The supervisor stops the driver once no process has been attached
+to it for ``idle_timeout`` seconds.
+
+Run as ``python -m arsenic.daemon`` the module is the supervisor.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from functools import partial
+from typing import Any, Dict, List, Optional
+
+import aiohttp.client_exceptions
+import attr
+from structlog import get_logger
+
+from arsenic.codec import Codec
+from arsenic.connection import Connection
+from arsenic.errors import ArsenicError
+from arsenic.http import THTTP, open_session
+from arsenic.ports import PortAllocator, default_allocator, lock_file, unlock_file
+from arsenic.services import Service, check_service_status
+from arsenic.webdriver import WebDriver
+
+log = get_logger()
+
+# seconds between two checks of the supervisor
+SUPERVISOR_POLL = 0.5
+# seconds the supervisor waits for the process which started it to attach
+START_GRACE = 60
+LOCK_POLL = 0.01
+
+
+def default_runtime_dir() -> str:
+    base = os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+    return os.path.join(base, "arsenic")
+
+
+def pid_alive(pid: int) -> bool:
+    if sys.platform == "win32":
+        import ctypes
+
+        kernel32 = ctypes.windll.kernel32
+        # PROCESS_QUERY_LIMITED_INFORMATION
+        handle = kernel32.OpenProcess(0x1000, False, pid)
+        if not handle:
+            return False
+        code = ctypes.c_ulong()
+        kernel32.GetExitCodeProcess(handle, ctypes.byref(code))
+        kernel32.CloseHandle(handle)
+        # STILL_ACTIVE
+        return code.value == 259
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def read_state(path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path, encoding="utf-8") as fobj:
+            state = json.load(fobj)
+    except (OSError, ValueError):
+        return None
+    return state if isinstance(state, dict) else None
+
+
+def write_state(path: str, state: Dict[str, Any]):
+    fd, temp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as fobj:
+        json.dump(state, fobj)
+    os.replace(temp, path)
+
+
+def remove_state(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+@contextmanager
+def locked(path: str):
+    """
+    Holds the lock file at ``path``, blocking until it is available.
+    """
+    fd = os.open(path, os.O_RDWR | os.O_CREAT)
+    try:
+        while not lock_file(fd):
+            time.sleep(LOCK_POLL)
+        try:
+            yield
+        finally:
+            unlock_file(fd)
+    finally:
+        os.close(fd)
+
+
+class AsyncLock:
+    """
+    Like :py:func:`locked`, but waits for the lock without blocking the
+    event loop.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fd: Optional[int] = None
+
+    async def __aenter__(self):
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT)
+        try:
+            while not lock_file(fd):
+                await asyncio.sleep(LOCK_POLL)
+        except:
+            os.close(fd)
+            raise
+        self._fd = fd
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        fd, self._fd = self._fd, None
+        try:
+            unlock_file(fd)
+        finally:
+            os.close(fd)
+
+
+@attr.s
+class SharedDriver(Service):
+    """
+    Service attaching to a driver daemon started from ``service``, which
+    must be a local driver service such as
+    :py:class:`arsenic.services.Chromedriver`.
+    """
+
+    service = attr.ib()
+    name: Optional[str] = attr.ib(default=None)
+    runtime_dir: Optional[str] = attr.ib(default=None)
+    idle_timeout: float = attr.ib(default=300)
+    start_timeout: float = attr.ib(default=15)
+    log_path: Optional[str] = attr.ib(default=None)
+    ports: Optional[PortAllocator] = attr.ib(default=None)
+    codec: Optional[Codec] = attr.ib(default=None)
+    http: THTTP = attr.ib(default=None)
+
+    @property
+    def key(self) -> str:
+        if self.name is not None:
+            return self.name
+        binary = getattr(self.service, "binary", "")
+        # resolve through PATH, so the key does not depend on the directory
+        binary = os.path.realpath(shutil.which(binary) or binary)
+        digest = hashlib.sha1(binary.encode("utf-8")).hexdigest()[:12]
+        return f"{type(self.service).__name__.lower()}-{digest}"
+
+    @property
+    def directory(self) -> str:
+        return default_runtime_dir() if self.runtime_dir is None else self.runtime_dir
+
+    @property
+    def state_path(self) -> str:
+        return os.path.join(self.directory, f"{self.key}.json")
+
+    @property
+    def lock_path(self) -> str:
+        return os.path.join(self.directory, f"{self.key}.lock")
+
+    async def start(self) -> WebDriver:
+        os.makedirs(self.directory, exist_ok=True)
+        session, release = open_session(self.http)
+        closers = [release]
+        try:
+            async with AsyncLock(self.lock_path):
+                state = read_state(self.state_path)
+                if state is None or not await self._alive(session, state):
+                    state = await self._spawn(session)
+                state["users"].append(os.getpid())
+                state["attaches"] += 1
+                write_state(self.state_path, state)
+            closers.append(partial(self._detach, state["supervisor"]))
+            return WebDriver(
+                Connection(session, state["url"], codec=self.codec), closers
+            )
+        except:
+            for closer in reversed(closers):
+                await closer()
+            raise
+
+    async def stop(self):
+        """
+        Stops the daemon right away, even if processes are attached to it.
+        """
+        async with AsyncLock(self.lock_path):
+            remove_state(self.state_path)
+
+    async def _alive(self, session: aiohttp.ClientSession, state: Dict[str, Any]):
+        if not pid_alive(state["supervisor"]):
+            return False
+        try:
+            return await check_service_status(session, state["url"])
+        except aiohttp.ClientError:
+            return False
+
+    async def _spawn(self, session: aiohttp.ClientSession) -> Dict[str, Any]:
+        # checks the service runs before starting, such as the version of
+        # geckodriver
+        check_version = getattr(self.service, "_check_version", None)
+        if check_version is not None:
+            await check_version()
+        remove_state(self.state_path)
+        allocator = default_allocator if self.ports is None else self.ports
+        with allocator.reserve() as reservation:
+            url = f"http://localhost:{reservation.port}"
+            cmd = [
+                sys.executable,
+                "-m",
+                "arsenic.daemon",
+                "--state",
+                self.state_path,
+                "--lock",
+                self.lock_path,
+                "--url",
+                url,
+                "--idle-timeout",
+                str(self.idle_timeout),
+            ]
+            if self.log_path is not None:
+                cmd.extend(["--log", self.log_path])
+            cmd.append("--")
+            cmd.extend(self.service.command(reservation.port))
+            supervisor = spawn_detached(cmd)
+            await self._wait_ready(session, supervisor, url)
+        state = read_state(self.state_path)
+        if state is None:
+            raise ArsenicError("Driver daemon did not record its state")
+        return state
+
+    async def _wait_ready(
+        self, session: aiohttp.ClientSession, supervisor: subprocess.Popen, url: str
+    ):
+        loop = asyncio.get_event_loop()
+        deadline = loop.time() + self.start_timeout
+        while loop.time() < deadline:
+            if supervisor.poll() is not None:
+                raise ArsenicError(
+                    f"Driver daemon exited with code {supervisor.returncode}"
+                )
+            if read_state(self.state_path) is not None:
+                try:
+                    if await check_service_status(session, url):
+                        return
+                except aiohttp.client_exceptions.ClientConnectorError:
+                    pass
+            await asyncio.sleep(0.05)
+        remove_state(self.state_path)
+        raise ArsenicError("Driver daemon not starting?")
+
+    async def _detach(self, supervisor: int):
+        async with AsyncLock(self.lock_path):
+            state = read_state(self.state_path)
+            if state is None or state["supervisor"] != supervisor:
+                return
+            pid = os.getpid()
+            if pid in state["users"]:
+                state["users"].remove(pid)
+                write_state(self.state_path, state)
+
+
+def spawn_detached(cmd: List[str]) -> subprocess.Popen:
+    """
+    Starts ``cmd`` so it survives the current process.
+    """
+    kwargs: Dict[str, Any] = {}
+    if sys.platform == "win32":
+        kwargs["creationflags"] = (
+            subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP
+        )
+    else:
+        kwargs["start_new_session"] = True
+    return subprocess.Popen(
+        cmd,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        **kwargs,
+    )
+
+
+def stop_driver(process: subprocess.Popen):
+    process.terminate()
+    try:
+        process.wait(timeout=1)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def supervise(
+    state_path: str,
+    lock_path: str,
+    url: str,
+    idle_timeout: float,
+    cmd: List[str],
+    log_path: Optional[str] = None,
+):
+    """
+    Runs the driver ``cmd`` until no process was attached to it for
+    ``idle_timeout`` seconds, the driver exits, or the state file is
+    removed.
+    """
+    log_file = subprocess.DEVNULL if log_path is None else open(log_path, "ab")
+    process = subprocess.Popen(
+        cmd, stdin=subprocess.DEVNULL, stdout=log_file, stderr=subprocess.STDOUT
+    )
+    supervisor = os.getpid()
+    write_state(
+        state_path,
+        {
+            "url": url,
+            "pid": process.pid,
+            "supervisor": supervisor,
+            "users": [],
+            "attaches": 0,
+        },
+    )
+    idle_since = time.monotonic()
+    try:
+        while process.poll() is None:
+            time.sleep(SUPERVISOR_POLL)
+            with locked(lock_path):
+                state = read_state(state_path)
+                if state is None or state["supervisor"] != supervisor:
+                    break
+                users = [pid for pid in state["users"] if pid_alive(pid)]
+                if users != state["users"]:
+                    state["users"] = users
+                    write_state(state_path, state)
+                now = time.monotonic()
+                if users:
+                    idle_since = now
+                    continue
+                # users may attach and detach between two checks
+                if state["attaches"]:
+                    timeout = idle_timeout
+                else:
+                    timeout = max(idle_timeout, START_GRACE)
+                if now - idle_since >= timeout:
+                    remove_state(state_path)
+                    break
+    finally:
+        stop_driver(process)
+        with locked(lock_path):
+            state = read_state(state_path)
+            if state is not None and state["supervisor"] == supervisor:
+                remove_state(state_path)
+        if log_path is not None:
+            log_file.close()
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Supervises a shared driver.")
+    parser.add_argument("--state", required=True)
+    parser.add_argument("--lock", required=True)
+    parser.add_argument("--url", required=True)
+    parser.add_argument("--idle-timeout", type=float, required=True)
+    parser.add_argument("--log", default=None)
+    parser.add_argument("cmd", nargs="+")
+    args = parser.parse_args(argv)
+    # stop the driver when the supervisor is terminated
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    supervise(args.state, args.lock, args.url, args.idle_timeout, args.cmd, args.log)
+
+
+if __name__ == "__main__":
+    main()
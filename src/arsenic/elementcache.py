@@ -0,0 +1,53 @@
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+import attr
+
+
+@attr.s
+class ElementCacheStats:
+    hits: int = attr.ib(default=0)
+    misses: int = attr.ib(default=0)
+    invalidations: int = attr.ib(default=0)
+    relocations: int = attr.ib(default=0)
+
+
+class ElementCache:
+    """
+    Remembers the results of element lookups of a session until a command
+    which may change the state of the page is sent.
+
+    Lookups started before an invalidation are not stored, so a result can
+    never outlive the page state it was found in. At most ``max_entries``
+    results are kept, the oldest ones are evicted first.
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self.stats = ElementCacheStats()
+        self.generation = 0
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        value = self._entries.get(key, None)
+        if value is None:
+            self.stats.misses += 1
+        else:
+            self.stats.hits += 1
+        return value
+
+    def put(self, key: Hashable, value: Any, generation: int):
+        if generation != self.generation:
+            return
+        self._entries[key] = value
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self):
+        self.generation += 1
+        if self._entries:
+            self._entries.clear()
+            self.stats.invalidations += 1
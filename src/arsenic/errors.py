@@ -1,3 +1,4 @@
+import asyncio
 from typing import Union, Dict, Type, Any
 
 from structlog import get_logger
@@ -37,6 +38,16 @@ class ArsenicTimeout(ArsenicError):
     pass
 
 
+class CommandTimeout(ArsenicTimeout, asyncio.TimeoutError):
+    pass
+
+
+class ServiceExited(ArsenicError):
+    def __init__(self, returncode: int):
+        self.returncode = returncode
+        super().__init__(f"Service exited with code {returncode} while starting")
+
+
 CODES: Dict[Union[str, int], Type[WebdriverError]] = {}
 
 
@@ -75,6 +86,7 @@ IMENotAvailable = create("ime not available", 30)
 IMEEngineActivationFailed = create("ime engine activation failed", 31)
 InvalidSelector = create("invalid selector", 32)
 MoveTargetOutOfBounds = create("move target out of bounds", 34)
+UnsupportedOperation = create("unsupported operation")
 
 # exceptions that may indicate errors within arsenic
 ERROR_CLASSES = (UnknownArsenicError, UnknownCommand, UnknownError)
@@ -0,0 +1,382 @@
+"""
+An in-process stand-in for a WebDriver server.
+
+The fake driver speaks enough of the W3C WebDriver protocol for
+:py:class:`arsenic.session.Session` and :py:class:`arsenic.session.Element`
+to work against it, without running a browser. Every command takes a
+configurable amount of (simulated) time and returns payloads of configurable
+size, which makes it useful to measure the client side cost of a command.
+"""
+import asyncio
+import base64
+import time
+from itertools import count
+from typing import Any, Callable, Dict, List, Optional, Set, Type
+
+import attr
+from aiohttp.web import (
+    AppRunner,
+    Application,
+    Request,
+    Response,
+    TCPSite,
+    json_response,
+    middleware,
+)
+
+from arsenic import constants
+from arsenic.codec import Codec
+from arsenic.connection import Connection
+from arsenic.http import THTTP, open_session
+from arsenic.services import Service
+from arsenic.webdriver import WebDriver
+
+
+class FakeDriverError(Exception):
+    def __init__(self, error: str, message: str, status: int = 404):
+        self.error = error
+        self.message = message
+        self.status = status
+        super().__init__(f"{error}: {message}")
+
+
+@attr.s
+class FakeSessionState:
+    id: str = attr.ib()
+    url: str = attr.ib(default="about:blank")
+    cookies: Dict[str, Dict[str, Any]] = attr.ib(default=attr.Factory(dict))
+    windows: List[str] = attr.ib(default=attr.Factory(lambda: ["window-1"]))
+    window: str = attr.ib(default="window-1")
+    window_rect: Dict[str, int] = attr.ib(
+        default=attr.Factory(lambda: {"x": 0, "y": 0, "width": 800, "height": 600})
+    )
+    elements: Dict[str, str] = attr.ib(default=attr.Factory(dict))
+    stale: Set[str] = attr.ib(default=attr.Factory(set))
+
+    def invalidate_elements(self):
+        """
+        Makes all elements found so far stale, as if the page changed.
+        """
+        self.stale.update(self.elements)
+        self.elements.clear()
+
+
+@attr.s
+class FakeDriver:
+    """
+    Configuration and state of a fake WebDriver server.
+
+    ``latency`` is the time in seconds every command takes on the server side.
+    ``page_source_size``, ``screenshot_size``, ``script_result_size`` and
+    ``error_screen_size`` control the size of the respective payloads.
+    ``elements_count`` is the number of elements returned when looking up
+    multiple elements.
+
+    Selectors containing ``missing`` never match any element. Elements found
+    before navigating are stale afterwards. If
+    ``script_handler`` is set, it is called with the script and its arguments
+    and its return value is used as the result of script execution.
+
+    HTTP statuses appended to :py:attr:`failures` are used, in order, to
+    answer the next commands with a plain text error, as a load balancer
+    would.
+    """
+
+    latency: float = attr.ib(default=0)
+    page_source_size: int = attr.ib(default=1024)
+    screenshot_size: int = attr.ib(default=1024)
+    script_result_size: int = attr.ib(default=0)
+    error_screen_size: int = attr.ib(default=0)
+    elements_count: int = attr.ib(default=3)
+    script_handler: Optional[Callable[[str, List[Any]], Any]] = attr.ib(default=None)
+    sessions: Dict[str, FakeSessionState] = attr.ib(
+        default=attr.Factory(dict), init=False
+    )
+    server_times: List[float] = attr.ib(default=attr.Factory(list), init=False)
+    commands: List[str] = attr.ib(default=attr.Factory(list), init=False)
+    uploads: List[bytes] = attr.ib(default=attr.Factory(list), init=False)
+    failures: List[int] = attr.ib(default=attr.Factory(list), init=False)
+    _ids = attr.ib(default=attr.Factory(count), init=False, repr=False)
+    _runner: Optional[AppRunner] = attr.ib(default=None, init=False, repr=False)
+    url: Optional[str] = attr.ib(default=None, init=False)
+
+    def build_app(self) -> Application:
+        app = Application(middlewares=[self._middleware], client_max_size=2**30)
+        add = app.router.add_route
+        add("GET", "/status", self.status)
+        add("POST", "/session", self.new_session)
+        add("DELETE", "/session/{session_id}", self.delete_session)
+        session = "/session/{session_id}"
+        element = session + "/element/{element_id}"
+        add("GET", session + "/url", self.get_url)
+        add("POST", session + "/url", self.navigate)
+        add("GET", session + "/source", self.source)
+        add("POST", session + "/element", self.find_element)
+        add("POST", session + "/elements", self.find_elements)
+        add("POST", element + "/element", self.find_element)
+        add("POST", element + "/elements", self.find_elements)
+        add("GET", element + "/text", self.element_text)
+        add("GET", element + "/attribute/{name}", self.element_attribute)
+        add("GET", element + "/property/{name}", self.element_attribute)
+        add("GET", element + "/css/{name}", self.element_attribute)
+        add("GET", element + "/displayed", self.true)
+        add("GET", element + "/enabled", self.true)
+        add("GET", element + "/rect", self.element_rect)
+        add("GET", element + "/screenshot", self.element_screenshot)
+        add("POST", element + "/click", self.null)
+        add("POST", element + "/clear", self.null)
+        add("POST", element + "/value", self.null)
+        add("POST", session + "/execute/sync", self.execute)
+        add("POST", session + "/execute/async", self.execute)
+        add("GET", session + "/screenshot", self.screenshot)
+        add("GET", session + "/cookie", self.get_cookies)
+        add("POST", session + "/cookie", self.add_cookie)
+        add("DELETE", session + "/cookie", self.delete_cookies)
+        add("GET", session + "/cookie/{name}", self.get_cookie)
+        add("DELETE", session + "/cookie/{name}", self.delete_cookie)
+        add("GET", session + "/window", self.get_window)
+        add("POST", session + "/window", self.switch_window)
+        add("DELETE", session + "/window", self.close_window)
+        add("GET", session + "/window/handles", self.get_windows)
+        add("POST", session + "/window/new", self.new_window)
+        add("GET", session + "/window/rect", self.get_window_rect)
+        add("POST", session + "/window/rect", self.set_window_rect)
+        add("POST", session + "/window/maximize", self.get_window_rect)
+        add("POST", session + "/window/fullscreen", self.get_window_rect)
+        add("POST", session + "/actions", self.null)
+        add("POST", session + "/file", self.upload_file)
+        return app
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        self._runner = AppRunner(self.build_app())
+        await self._runner.setup()
+        site = TCPSite(self._runner, host, port)
+        await site.start()
+        host, port = site._server.sockets[0].getsockname()[:2]
+        self.url = f"http://{host}:{port}"
+        return self.url
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def __aenter__(self) -> "FakeDriver":
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.stop()
+
+    @middleware
+    async def _middleware(self, request: Request, handler):
+        start = time.perf_counter()
+        self.commands.append(f"{request.method} {request.path}")
+        if self.failures:
+            self.server_times.append(time.perf_counter() - start)
+            return Response(status=self.failures.pop(0), text="unavailable")
+        try:
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            value = await handler(request)
+        except FakeDriverError as exc:
+            value = {"error": exc.error, "message": exc.message, "stacktrace": ""}
+            if self.error_screen_size:
+                value["screen"] = self._png(self.error_screen_size)
+            return json_response({"value": value}, status=exc.status)
+        finally:
+            self.server_times.append(time.perf_counter() - start)
+        if isinstance(value, Response):
+            return value
+        return json_response({"value": value})
+
+    def _png(self, size: int) -> str:
+        return base64.b64encode(b"\x89PNG" + b"\0" * size).decode("ascii")
+
+    def _session(self, request: Request) -> FakeSessionState:
+        try:
+            return self.sessions[request.match_info["session_id"]]
+        except KeyError:
+            raise FakeDriverError("invalid session id", "No such session")
+
+    def _element(self, request: Request) -> str:
+        session = self._session(request)
+        element_id = request.match_info["element_id"]
+        if element_id in session.stale:
+            raise FakeDriverError(
+                "stale element reference", f"Element {element_id} is stale"
+            )
+        if element_id not in session.elements:
+            raise FakeDriverError("no such element", f"Unknown element {element_id}")
+        return element_id
+
+    async def _find(self, request: Request, limit: int) -> List[Dict[str, str]]:
+        session = self._session(request)
+        if "element_id" in request.match_info:
+            self._element(request)
+        data = await request.json()
+        selector = data["value"]
+        if "missing" in selector:
+            return []
+        found = []
+        for _ in range(limit):
+            element_id = f"element-{next(self._ids)}"
+            session.elements[element_id] = selector
+            found.append({constants.WEB_ELEMENT: element_id})
+        return found
+
+    async def status(self, request):
+        return {"ready": True, "message": "fake driver ready"}
+
+    async def new_session(self, request):
+        data = await request.json()
+        session_id = f"session-{next(self._ids)}"
+        self.sessions[session_id] = FakeSessionState(session_id)
+        capabilities = data.get("capabilities", {}).get("alwaysMatch", {})
+        return {"sessionId": session_id, "capabilities": capabilities}
+
+    async def delete_session(self, request):
+        self._session(request)
+        del self.sessions[request.match_info["session_id"]]
+
+    async def null(self, request):
+        self._session(request)
+
+    async def true(self, request):
+        self._element(request)
+        return True
+
+    async def get_url(self, request):
+        return self._session(request).url
+
+    async def navigate(self, request):
+        session = self._session(request)
+        session.url = (await request.json())["url"]
+        session.invalidate_elements()
+
+    async def source(self, request):
+        self._session(request)
+        return "<html>" + "x" * self.page_source_size + "</html>"
+
+    async def find_element(self, request):
+        found = await self._find(request, 1)
+        if not found:
+            raise FakeDriverError("no such element", "Unable to locate element")
+        return found[0]
+
+    async def find_elements(self, request):
+        return await self._find(request, self.elements_count)
+
+    async def element_text(self, request):
+        return f"text of {self._element(request)}"
+
+    async def element_attribute(self, request):
+        return f"{request.match_info['name']} of {self._element(request)}"
+
+    async def element_rect(self, request):
+        self._element(request)
+        return {"x": 1, "y": 2, "width": 3, "height": 4}
+
+    async def screenshot(self, request):
+        self._session(request)
+        return self._png(self.screenshot_size)
+
+    async def element_screenshot(self, request):
+        self._element(request)
+        return await self.screenshot(request)
+
+    async def execute(self, request):
+        self._session(request)
+        data = await request.json()
+        if self.script_handler is not None:
+            return self.script_handler(data["script"], data["args"])
+        if self.script_result_size:
+            return "x" * self.script_result_size
+        return None
+
+    async def get_cookies(self, request):
+        return list(self._session(request).cookies.values())
+
+    async def add_cookie(self, request):
+        cookie = (await request.json())["cookie"]
+        self._session(request).cookies[cookie["name"]] = cookie
+
+    async def delete_cookies(self, request):
+        self._session(request).cookies.clear()
+
+    async def get_cookie(self, request):
+        try:
+            return self._session(request).cookies[request.match_info["name"]]
+        except KeyError:
+            raise FakeDriverError("no such cookie", "No such cookie")
+
+    async def delete_cookie(self, request):
+        self._session(request).cookies.pop(request.match_info["name"], None)
+
+    async def get_window(self, request):
+        return self._session(request).window
+
+    async def get_windows(self, request):
+        return list(self._session(request).windows)
+
+    async def switch_window(self, request):
+        session = self._session(request)
+        handle = (await request.json())["handle"]
+        if handle not in session.windows:
+            raise FakeDriverError("no such window", f"Unknown window {handle}")
+        session.window = handle
+
+    async def close_window(self, request):
+        session = self._session(request)
+        session.windows.remove(session.window)
+        return list(session.windows)
+
+    async def new_window(self, request):
+        session = self._session(request)
+        handle = f"window-{next(self._ids)}"
+        session.windows.append(handle)
+        return {"handle": handle, "type": (await request.json())["type"]}
+
+    async def get_window_rect(self, request):
+        return self._session(request).window_rect
+
+    async def set_window_rect(self, request):
+        session = self._session(request)
+        data = await request.json()
+        for key in ("x", "y", "width", "height"):
+            if data.get(key) is not None:
+                session.window_rect[key] = data[key]
+        return session.window_rect
+
+    async def upload_file(self, request):
+        self._session(request)
+        data = await request.json()
+        self.uploads.append(base64.b64decode(data["file"]))
+        return f"/tmp/fake-upload-{next(self._ids)}"
+
+
+@attr.s
+class FakeDriverService(Service):
+    """
+    Service running a :py:class:`FakeDriver` in the current event loop.
+    """
+
+    driver: FakeDriver = attr.ib(default=attr.Factory(FakeDriver))
+    codec: Optional[Codec] = attr.ib(default=None)
+    http: THTTP = attr.ib(default=None)
+    connection_class: Type[Connection] = attr.ib(default=Connection)
+
+    async def start(self) -> WebDriver:
+        closers = []
+        try:
+            url = await self.driver.start()
+            closers.append(self.driver.stop)
+            session, release = open_session(self.http)
+            closers.append(release)
+            return WebDriver(
+                self.connection_class(session, url, codec=self.codec), closers
+            )
+        except:
+            for closer in reversed(closers):
+                await closer()
+            raise
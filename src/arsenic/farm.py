@@ -0,0 +1,312 @@
+"""
+Farms of webdriver processes sharing the sessions of one test run, as a
+single driver process handles many of its commands one at a time.
+"""
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional
+
+import attr
+from aiohttp import ClientError
+from structlog import get_logger
+
+from arsenic.browsers import Browser
+from arsenic.errors import ArsenicError
+from arsenic.services import Service
+from arsenic.session import Session
+from arsenic.timeouts import deadline
+from arsenic.webdriver import WebDriver
+
+log = get_logger()
+
+# errors indicating a driver process is gone or broken
+DRIVER_ERRORS = (ArsenicError, ClientError)
+
+
+@attr.s
+class FarmStats:
+    started: int = attr.ib(default=0)
+    restarts: int = attr.ib(default=0)
+    failed_checks: int = attr.ib(default=0)
+    slow_checks: int = attr.ib(default=0)
+    failed_restarts: int = attr.ib(default=0)
+    sessions: int = attr.ib(default=0)
+    lost_sessions: int = attr.ib(default=0)
+    waits: int = attr.ib(default=0)
+    max_sessions: int = attr.ib(default=0)
+
+
+@attr.s
+class FarmDriver:
+    index: int = attr.ib()
+    driver: WebDriver = attr.ib()
+    alive: bool = attr.ib(default=True)
+    generation: int = attr.ib(default=0)
+    sessions: int = attr.ib(default=0)
+    placed: int = attr.ib(default=0)
+
+
+@attr.s
+class Placement:
+    member: FarmDriver = attr.ib()
+    generation: int = attr.ib()
+
+
+class DriverFarm:
+    """
+    Starts ``size`` drivers of ``service`` and places every new session on
+    the driver with the fewest open sessions, at most ``max_sessions`` per
+    driver.
+
+    Every ``check_interval`` seconds, drivers whose status request fails
+    are restarted. A driver which does not answer within ``check_timeout``
+    seconds is busy rather than broken, and kept. The sessions of a
+    restarted driver are lost.
+    """
+
+    def __init__(
+        self,
+        service: Service,
+        size: Optional[int] = None,
+        *,
+        max_sessions: Optional[int] = None,
+        check_interval: Optional[float] = 30,
+        check_timeout: float = 5,
+    ):
+        self.service = service
+        self.size = (os.cpu_count() or 1) if size is None else size
+        self.max_sessions = max_sessions
+        self.check_interval = check_interval
+        self.check_timeout = check_timeout
+        self.stats = FarmStats()
+        self.drivers: List[FarmDriver] = []
+        self._placements: Dict[int, Placement] = {}
+        self._waiters: List[asyncio.Future] = []
+        self._restarting: Dict[int, asyncio.Future] = {}
+        self._monitor: Optional[asyncio.Task] = None
+
+    @property
+    def sessions(self) -> int:
+        return sum(member.sessions for member in self.drivers)
+
+    def load(self) -> List[int]:
+        """
+        Returns the number of open sessions of every driver.
+        """
+        return [member.sessions for member in self.drivers]
+
+    async def start(self):
+        drivers = await asyncio.gather(
+            *(self.service.start() for _ in range(self.size)), return_exceptions=True
+        )
+        errors = [driver for driver in drivers if isinstance(driver, BaseException)]
+        if errors:
+            await asyncio.gather(
+                *(driver.close() for driver in drivers if isinstance(driver, WebDriver))
+            )
+            raise errors[0]
+        self.stats.started += len(drivers)
+        self.drivers = [
+            FarmDriver(index, driver) for index, driver in enumerate(drivers)
+        ]
+        if self.check_interval is not None:
+            self._monitor = asyncio.ensure_future(self._watch())
+
+    async def close(self):
+        if self._monitor is not None:
+            self._monitor.cancel()
+            await asyncio.gather(self._monitor, return_exceptions=True)
+            self._monitor = None
+        drivers, self.drivers = self.drivers, []
+        await asyncio.gather(*(member.driver.close() for member in drivers))
+        for waiter in self._waiters:
+            if not waiter.done():
+                waiter.set_exception(ArsenicError("Driver farm closed"))
+
+    async def __aenter__(self) -> "DriverFarm":
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    @asynccontextmanager
+    async def session(self, browser: Browser, bind: str = "") -> AsyncIterator[Session]:
+        session = await self.new_session(browser, bind)
+        try:
+            yield session
+        finally:
+            await self.close_session(session)
+
+    async def new_session(self, browser: Browser, bind: str = "", **kwargs) -> Session:
+        """
+        Starts a session on the least loaded driver, waiting for a session to
+        be closed if all drivers have ``max_sessions`` sessions. A driver
+        which cannot be reached is restarted and the next one is tried.
+        """
+        attempts = 0
+        while True:
+            member = self._least_loaded()
+            if member is None:
+                if not self._available():
+                    raise ArsenicError("No driver of the farm is running")
+                self.stats.waits += 1
+                await self._wait()
+                continue
+            member.sessions += 1
+            generation = member.generation
+            try:
+                session = await member.driver.new_session(browser, bind, **kwargs)
+            except ClientError:
+                self._closed(member, generation)
+                attempts += 1
+                if attempts >= len(self.drivers):
+                    raise
+                try:
+                    await self._restart(member, generation)
+                except Exception as exc:
+                    # the driver stays down until a check restarts it
+                    log.warning("farm-restart", driver=member.index, error=str(exc))
+                continue
+            except:
+                self._closed(member, generation)
+                raise
+            member.placed += 1
+            self._placements[id(session)] = Placement(member, generation)
+            self.stats.sessions += 1
+            self.stats.max_sessions = max(self.stats.max_sessions, self.sessions)
+            return session
+
+    async def close_session(self, session: Session):
+        placement = self._placements.pop(id(session))
+        if placement.generation != placement.member.generation:
+            # the driver was restarted since, taking the session with it
+            return
+        try:
+            await session.close()
+        finally:
+            self._closed(placement.member, placement.generation)
+
+    async def check(self):
+        """
+        Checks the status of all drivers, restarting those which fail.
+        """
+        await asyncio.gather(*(self._check(member) for member in self.drivers))
+
+    def _least_loaded(self) -> Optional[FarmDriver]:
+        candidates = [
+            member
+            for member in self.drivers
+            if member.alive
+            and member.index not in self._restarting
+            and (self.max_sessions is None or member.sessions < self.max_sessions)
+        ]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda member: (member.sessions, member.placed))
+
+    def _available(self) -> bool:
+        """
+        Whether any driver is running or being restarted.
+        """
+        return any(
+            member.alive or member.index in self._restarting for member in self.drivers
+        )
+
+    def _closed(self, member: FarmDriver, generation: int):
+        if generation == member.generation:
+            member.sessions -= 1
+            self._wake()
+
+    async def _watch(self):
+        while True:
+            await asyncio.sleep(self.check_interval)
+            try:
+                await self.check()
+            except Exception as exc:
+                # drivers which failed to restart are retried by the next check
+                log.warning("farm-restart", error=str(exc))
+
+    async def _check(self, member: FarmDriver):
+        if member.index in self._restarting:
+            return
+        generation = member.generation
+        if not member.alive:
+            # a previous restart failed
+            return await self._restart(member, generation)
+        try:
+            async with deadline(self.check_timeout):
+                status, data = await member.driver.connection.request(
+                    url="/status", method="GET"
+                )
+            ok = 200 <= status < 300
+        except asyncio.TimeoutError:
+            # a driver busy with many sessions can be slow to answer
+            log.info("farm-check-slow", driver=member.index)
+            self.stats.slow_checks += 1
+            return
+        except DRIVER_ERRORS as exc:
+            log.warning("farm-check", driver=member.index, error=str(exc))
+            ok = False
+        if not ok:
+            self.stats.failed_checks += 1
+            await self._restart(member, generation)
+
+    async def _restart(self, member: FarmDriver, generation: int):
+        """
+        Replaces the driver of ``member``, unless it was already replaced
+        since ``generation``. Concurrent restarts of a driver share one.
+        """
+        if member.index in self._restarting:
+            return await self._restarting[member.index]
+        if member.generation != generation:
+            return
+        future = asyncio.get_event_loop().create_future()
+        self._restarting[member.index] = future
+        try:
+            if member.alive:
+                member.alive = False
+                member.generation += 1
+                self.stats.lost_sessions += member.sessions
+                member.sessions = 0
+                try:
+                    await member.driver.close()
+                except Exception as exc:
+                    log.warning("farm-stop-driver", driver=member.index, error=str(exc))
+            try:
+                member.driver = await self.service.start()
+            except Exception:
+                self.stats.failed_restarts += 1
+                raise
+            member.alive = True
+            self.stats.restarts += 1
+            future.set_result(None)
+        except BaseException as exc:
+            future.set_exception(exc)
+            # nobody else may be waiting for the restart
+            future.exception()
+            raise
+        finally:
+            del self._restarting[member.index]
+            self._wake()
+
+    async def _wait(self):
+        waiter = asyncio.get_event_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self._wake()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+
+    def _wake(self):
+        while self._waiters:
+            waiter = self._waiters.pop(0)
+            if not waiter.done():
+                waiter.set_result(None)
+                return
@@ -1,8 +1,17 @@
 import abc
 import base64
-from typing import Dict
+import inspect
+import socket
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple, Union
 
 import attr
+from aiohttp import BaseConnector, ClientSession, TCPConnector, TraceConfig
+from structlog import get_logger
+
+log = get_logger()
+
+# socket factories are supported by aiohttp 3.12 and higher
+SOCKET_FACTORY = "socket_factory" in inspect.signature(TCPConnector).parameters
 
 
 class Auth(metaclass=abc.ABCMeta):
@@ -20,3 +29,188 @@ class BasicAuth(Auth):
         raw_token = f"{self.username}:{self.password}"
         token = base64.b64encode(raw_token.encode("ascii")).decode("ascii")
         return {"Authorization": f"Basic {token}"}
+
+
+@attr.s
+class HTTPStats:
+    requests: int = attr.ib(default=0)
+    connections_created: int = attr.ib(default=0)
+    connections_reused: int = attr.ib(default=0)
+    queued: int = attr.ib(default=0)
+    dns_cache_hits: int = attr.ib(default=0)
+    dns_cache_misses: int = attr.ib(default=0)
+
+    def trace_config(self) -> TraceConfig:
+        config = TraceConfig()
+        config.on_request_start.append(self._count("requests"))
+        config.on_connection_create_end.append(self._count("connections_created"))
+        config.on_connection_reuseconn.append(self._count("connections_reused"))
+        config.on_connection_queued_start.append(self._count("queued"))
+        config.on_dns_cache_hit.append(self._count("dns_cache_hits"))
+        config.on_dns_cache_miss.append(self._count("dns_cache_misses"))
+        return config
+
+    def _count(self, name: str):
+        async def callback(session, context, params):
+            setattr(self, name, getattr(self, name) + 1)
+
+        return callback
+
+
+@attr.s
+class PoolUsage:
+    limit: int = attr.ib()
+    limit_per_host: int = attr.ib()
+    acquired: int = attr.ib()
+    idle: int = attr.ib()
+
+
+def pool_usage(session: ClientSession) -> PoolUsage:
+    """
+    Returns how many connections of the connection pool of ``session`` are in
+    use and how many are idle.
+    """
+    connector = session.connector
+    # the pool is private to aiohttp, report it as empty if it changes
+    conns = getattr(connector, "_conns", None) or {}
+    acquired = getattr(connector, "_acquired", None) or ()
+    try:
+        idle = sum(len(idle) for idle in conns.values())
+    except (AttributeError, TypeError):
+        idle = 0
+    return PoolUsage(
+        limit=getattr(connector, "limit", 0),
+        limit_per_host=getattr(connector, "limit_per_host", 0),
+        acquired=len(acquired),
+        idle=idle,
+    )
+
+
+@attr.s
+class HTTPSettings:
+    """
+    Settings of the HTTP client used to talk to a webdriver.
+
+    If ``connector`` is given, it is used instead of creating a connector from
+    these settings, and it is not closed along with the webdriver. If
+    ``stats`` is given, statistics of all HTTP sessions created from these
+    settings are collected in it. Collecting them costs time on every
+    request, so it is off by default.
+    """
+
+    limit: int = attr.ib(default=100)
+    limit_per_host: int = attr.ib(default=0)
+    keepalive_timeout: Optional[float] = attr.ib(default=15)
+    force_close: bool = attr.ib(default=False)
+    use_dns_cache: bool = attr.ib(default=True)
+    ttl_dns_cache: Optional[int] = attr.ib(default=10)
+    socket_options: List[Tuple[int, int, int]] = attr.ib(default=attr.Factory(list))
+    connector: Optional[BaseConnector] = attr.ib(default=None)
+    stats: Optional[HTTPStats] = attr.ib(default=None)
+
+    def create_connector(self) -> TCPConnector:
+        kwargs = {}
+        if self.force_close:
+            kwargs["force_close"] = True
+        else:
+            kwargs["keepalive_timeout"] = self.keepalive_timeout
+        if self.socket_options:
+            if SOCKET_FACTORY:
+                kwargs["socket_factory"] = self._create_socket
+            else:
+                log.warning(
+                    "http-socket-options",
+                    error="socket options require aiohttp 3.12 or higher",
+                )
+        return TCPConnector(
+            limit=self.limit,
+            limit_per_host=self.limit_per_host,
+            use_dns_cache=self.use_dns_cache,
+            ttl_dns_cache=self.ttl_dns_cache,
+            **kwargs,
+        )
+
+    def create_session(self, headers: Optional[Dict[str, str]] = None) -> ClientSession:
+        if self.connector is not None:
+            connector, owner = self.connector, False
+        else:
+            connector, owner = self.create_connector(), True
+        trace_configs = []
+        if self.stats is not None:
+            trace_configs.append(self.stats.trace_config())
+        return ClientSession(
+            connector=connector,
+            connector_owner=owner,
+            headers=headers,
+            trace_configs=trace_configs,
+        )
+
+    def _create_socket(self, addr_info) -> socket.socket:
+        family, type_, proto, _, _ = addr_info
+        sock = socket.socket(family=family, type=type_, proto=proto)
+        for level, option, value in self.socket_options:
+            sock.setsockopt(level, option, value)
+        return sock
+
+
+class SharedSession:
+    """
+    An HTTP session shared by many webdrivers, so they share one connection
+    pool and DNS cache.
+
+    The session is created when it is first acquired and closed once every
+    reference to it has been released. Using the shared session as an async
+    context manager holds a reference for the duration of the block, so the
+    session survives webdrivers being closed inside of it::
+
+        async with SharedSession() as http:
+            drivers = [await Chromedriver(http=http).start() for _ in range(40)]
+    """
+
+    def __init__(self, settings: Optional[HTTPSettings] = None):
+        self.settings = HTTPSettings() if settings is None else settings
+        self.references = 0
+        self._session: Optional[ClientSession] = None
+
+    @property
+    def stats(self) -> Optional[HTTPStats]:
+        return self.settings.stats
+
+    @property
+    def session(self) -> Optional[ClientSession]:
+        return self._session
+
+    def acquire(self) -> ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = self.settings.create_session()
+        self.references += 1
+        return self._session
+
+    async def release(self):
+        if self.references <= 0:
+            raise RuntimeError("SharedSession released more often than acquired")
+        self.references -= 1
+        if self.references == 0 and self._session is not None:
+            session, self._session = self._session, None
+            await session.close()
+
+    async def __aenter__(self) -> "SharedSession":
+        self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.release()
+
+
+THTTP = Union[HTTPSettings, SharedSession, None]
+
+
+def open_session(http: THTTP) -> Tuple[ClientSession, Callable[[], Awaitable[None]]]:
+    """
+    Returns an HTTP session for a webdriver according to ``http`` and the
+    coroutine function to call once the webdriver is done with it.
+    """
+    if isinstance(http, SharedSession):
+        return http.acquire(), http.release
+    session = (http or HTTPSettings()).create_session()
+    return session, session.close
@@ -0,0 +1,83 @@
+"""
+Strategies deciding how long :py:meth:`arsenic.webdriver.WebDriver.wait`
+sleeps between two checks of its condition.
+"""
+import abc
+import random
+from typing import Iterator
+
+import attr
+
+
+class PollStrategy(metaclass=abc.ABCMeta):
+    @abc.abstractmethod
+    def intervals(self) -> Iterator[float]:
+        """
+        Returns an iterator over the seconds to sleep after each check of a
+        single wait.
+        """
+        raise NotImplementedError()
+
+
+@attr.s
+class Fixed(PollStrategy):
+    interval: float = attr.ib(default=0.2)
+
+    def intervals(self) -> Iterator[float]:
+        while True:
+            yield self.interval
+
+
+@attr.s
+class Exponential(PollStrategy):
+    initial: float = attr.ib(default=0.05)
+    factor: float = attr.ib(default=2)
+    maximum: float = attr.ib(default=1)
+
+    def intervals(self) -> Iterator[float]:
+        interval = self.initial
+        while True:
+            yield min(interval, self.maximum)
+            interval *= self.factor
+
+
+@attr.s
+class Jittered(PollStrategy):
+    """
+    Takes a random fraction of up to ``jitter`` off every interval of
+    ``strategy``, so waits started at the same time do not poll in lockstep.
+    """
+
+    strategy: PollStrategy = attr.ib(default=attr.Factory(Exponential))
+    jitter: float = attr.ib(default=0.5)
+
+    def intervals(self) -> Iterator[float]:
+        for interval in self.strategy.intervals():
+            yield interval * (1 - self.jitter * random.random())
+
+
+@attr.s
+class WaitStats:
+    waits: int = attr.ib(default=0)
+    timeouts: int = attr.ib(default=0)
+    attempts: int = attr.ib(default=0)
+    total_time: float = attr.ib(default=0)
+    max_time: float = attr.ib(default=0)
+
+    @property
+    def attempts_per_wait(self) -> float:
+        return self.attempts / self.waits if self.waits else 0
+
+    @property
+    def mean_time(self) -> float:
+        return self.total_time / self.waits if self.waits else 0
+
+    def record(self, attempts: int, elapsed: float, timed_out: bool):
+        self.waits += 1
+        self.timeouts += timed_out
+        self.attempts += attempts
+        self.total_time += elapsed
+        self.max_time = max(self.max_time, elapsed)
+
+
+default_strategy = Fixed()
@@ -0,0 +1,338 @@
+"""
+Pools of browser sessions, which are reset and reused rather than started
+anew for every user, as starting a session takes seconds.
+"""
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional, Set
+
+import attr
+from aiohttp import ClientError
+from structlog import get_logger
+
+from arsenic.browsers import Browser
+from arsenic.errors import ArsenicError
+from arsenic.session import Session
+from arsenic.timeouts import deadline
+from arsenic.webdriver import WebDriver
+
+log = get_logger()
+
+# errors of health checks and resets indicating a session is unusable
+SESSION_ERRORS = (ArsenicError, ClientError, asyncio.TimeoutError)
+
+CLEAR_STORAGE = """
+try { window.localStorage.clear(); } catch (e) {}
+try { window.sessionStorage.clear(); } catch (e) {}
+"""
+
+# shortest time in seconds between two looks for idle sessions to close
+REAP_INTERVAL = 0.1
+
+
+@attr.s
+class PoolStats:
+    created: int = attr.ib(default=0)
+    acquired: int = attr.ib(default=0)
+    reused: int = attr.ib(default=0)
+    waits: int = attr.ib(default=0)
+    recycled: int = attr.ib(default=0)
+    unhealthy: int = attr.ib(default=0)
+    reset_failures: int = attr.ib(default=0)
+    shrunk: int = attr.ib(default=0)
+    max_size: int = attr.ib(default=0)
+
+
+@attr.s
+class PooledSession:
+    session: Session = attr.ib()
+    window: str = attr.ib()
+    created: float = attr.ib()
+    used: float = attr.ib()
+    uses: int = attr.ib(default=0)
+
+
+class SessionPool:
+    """
+    Keeps up to ``max_size`` sessions of ``browser`` on ``driver``, at least
+    ``min_size`` of which are started ahead of time and kept warm.
+
+    Sessions are handed out by :py:meth:`session` and reset when they are
+    returned. Sessions are closed instead of reused after ``max_uses`` uses
+    or ``max_age`` seconds, if they fail their health check or do not reset
+    within ``reset_timeout`` seconds, and if they stay idle for
+    ``idle_timeout`` seconds while more than ``min_size`` sessions are open.
+    """
+
+    def __init__(
+        self,
+        driver: WebDriver,
+        browser: Browser,
+        *,
+        bind: str = "",
+        min_size: int = 1,
+        max_size: int = 4,
+        max_uses: Optional[int] = 100,
+        max_age: Optional[float] = 1800,
+        idle_timeout: Optional[float] = 60,
+        health_check: bool = True,
+        check_timeout: float = 5,
+        reset_timeout: float = 10,
+        reset_url: str = "about:blank",
+    ):
+        self.driver = driver
+        self.browser = browser
+        self.bind = bind
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_uses = max_uses
+        self.max_age = max_age
+        self.idle_timeout = idle_timeout
+        self.health_check = health_check
+        self.check_timeout = check_timeout
+        self.reset_timeout = reset_timeout
+        self.reset_url = reset_url
+        self.stats = PoolStats()
+        self.closed = False
+        self._idle: List[PooledSession] = []
+        self._busy: Dict[int, PooledSession] = {}
+        self._size = 0
+        self._waiters: List[asyncio.Future] = []
+        self._tasks: Set[asyncio.Task] = set()
+        self._reaper: Optional[asyncio.Task] = None
+
+    @property
+    def size(self) -> int:
+        """
+        Number of sessions open or being started.
+        """
+        return self._size
+
+    @property
+    def idle(self) -> int:
+        return len(self._idle)
+
+    async def start(self):
+        """
+        Starts ``min_size`` sessions and waits until they are ready.
+        """
+        await asyncio.gather(*(self._add() for _ in range(self._missing())))
+        if self.idle_timeout is not None and self._reaper is None:
+            self._reaper = asyncio.ensure_future(self._reap())
+
+    async def close(self):
+        """
+        Closes all idle sessions. Sessions in use are closed when returned.
+        """
+        self.closed = True
+        if self._reaper is not None:
+            self._reaper.cancel()
+            await asyncio.gather(self._reaper, return_exceptions=True)
+            self._reaper = None
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        idle, self._idle = self._idle, []
+        await asyncio.gather(*(self._discard(slot) for slot in idle))
+        for waiter in self._waiters:
+            if not waiter.done():
+                waiter.set_exception(ArsenicError("Session pool closed"))
+
+    async def __aenter__(self) -> "SessionPool":
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    @asynccontextmanager
+    async def session(self) -> AsyncIterator[Session]:
+        """
+        Async context manager acquiring a session and releasing it on exit.
+        """
+        session = await self.acquire()
+        try:
+            yield session
+        finally:
+            await self.release(session)
+
+    async def acquire(self) -> Session:
+        """
+        Returns a healthy session, starting a new one if none is idle and
+        fewer than ``max_size`` are open, waiting for one to be released
+        otherwise.
+        """
+        while True:
+            if self.closed:
+                raise ArsenicError("Session pool closed")
+            while self._idle:
+                # the most recently used session is the warmest one
+                slot = self._idle.pop()
+                if self._expired(slot):
+                    self.stats.recycled += 1
+                    await self._discard(slot)
+                elif self.health_check and not await self._healthy(slot):
+                    self.stats.unhealthy += 1
+                    await self._discard(slot)
+                else:
+                    self.stats.reused += 1
+                    return self._checkout(slot)
+            if len(self._tasks) > len(self._waiters):
+                # a session started in the background will be ready sooner
+                await self._wait()
+                continue
+            if self._size < self.max_size:
+                return self._checkout(await self._create())
+            self.stats.waits += 1
+            await self._wait()
+
+    async def release(self, session: Session, *, discard: bool = False):
+        """
+        Returns ``session`` to the pool, resetting it for the next user, or
+        closes it if ``discard`` is true.
+        """
+        slot = self._busy.pop(id(session))
+        if discard or self.closed:
+            await self._discard(slot)
+        elif self.max_uses is not None and slot.uses >= self.max_uses:
+            self.stats.recycled += 1
+            await self._discard(slot)
+        elif not await self._reset(slot):
+            self.stats.reset_failures += 1
+            await self._discard(slot)
+        else:
+            slot.used = asyncio.get_event_loop().time()
+            self._idle.append(slot)
+            self._wake()
+        await self._shrink()
+
+    def _checkout(self, slot: PooledSession) -> Session:
+        slot.uses += 1
+        self._busy[id(slot.session)] = slot
+        self.stats.acquired += 1
+        return slot.session
+
+    def _expired(self, slot: PooledSession) -> bool:
+        if self.max_age is None:
+            return False
+        return asyncio.get_event_loop().time() - slot.created > self.max_age
+
+    async def _create(self) -> PooledSession:
+        self._size += 1
+        self.stats.max_size = max(self.stats.max_size, self._size)
+        try:
+            session = await self.driver.new_session(self.browser, self.bind)
+            try:
+                window = await session.get_window_handle()
+            except:
+                await session.close()
+                raise
+        except:
+            self._size -= 1
+            self._wake()
+            raise
+        self.stats.created += 1
+        now = asyncio.get_event_loop().time()
+        return PooledSession(session, window, now, now)
+
+    async def _add(self):
+        slot = await self._create()
+        self._idle.insert(0, slot)
+        self._wake()
+
+    async def _discard(self, slot: PooledSession):
+        self._size -= 1
+        try:
+            await slot.session.close()
+        except SESSION_ERRORS as exc:
+            log.warning("pool-close-session", error=str(exc))
+        self._wake()
+        self._replenish()
+
+    def _missing(self) -> int:
+        return max(0, self.min_size - self._size)
+
+    def _replenish(self):
+        """
+        Starts sessions in the background until ``min_size`` are open again.
+        """
+        if self.closed:
+            return
+        for _ in range(self._missing()):
+            task = asyncio.ensure_future(self._add())
+            self._tasks.add(task)
+            task.add_done_callback(self._added)
+
+    def _added(self, task: asyncio.Task):
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            log.warning("pool-start-session", error=str(task.exception()))
+
+    async def _reap(self):
+        # closes idle sessions even if no session is released anymore
+        while True:
+            await asyncio.sleep(max(self.idle_timeout / 2, REAP_INTERVAL))
+            await self._shrink()
+
+    async def _shrink(self):
+        if self.idle_timeout is None:
+            return
+        now = asyncio.get_event_loop().time()
+        while (
+            self._size > self.min_size
+            and self._idle
+            and now - self._idle[0].used > self.idle_timeout
+        ):
+            self.stats.shrunk += 1
+            await self._discard(self._idle.pop(0))
+
+    async def _healthy(self, slot: PooledSession) -> bool:
+        try:
+            async with deadline(self.check_timeout):
+                await slot.session.get_url()
+        except SESSION_ERRORS as exc:
+            log.warning("pool-health-check", error=str(exc))
+            return False
+        return True
+
+    async def _reset(self, slot: PooledSession) -> bool:
+        session = slot.session
+        try:
+            async with deadline(self.reset_timeout):
+                for handle in await session.get_window_handles():
+                    if handle != slot.window:
+                        await session.switch_to_window(handle)
+                        await session.close_window()
+                await session.switch_to_window(slot.window)
+                # storage and cookies can only be cleared for the current page
+                await session.execute_script(CLEAR_STORAGE)
+                await session.delete_all_cookies()
+                # Session.get would prefix the url with the bind of the session
+                await session._request(
+                    url="/url", method="POST", data={"url": self.reset_url}
+                )
+        except SESSION_ERRORS as exc:
+            log.warning("pool-reset-session", error=str(exc))
+            return False
+        return True
+
+    async def _wait(self):
+        waiter = asyncio.get_event_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # pass the wake up on to the next waiter
+                self._wake()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+
+    def _wake(self):
+        while self._waiters:
+            waiter = self._waiters.pop(0)
+            if not waiter.done():
+                waiter.set_result(None)
+                return
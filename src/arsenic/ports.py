@@ -0,0 +1,144 @@
+"""
+Allocation of ports for locally started drivers, safe across processes.
+
+:py:func:`arsenic.utils.free_port` returns a port which is free when it is
+called, but many processes starting drivers at the same time can get the
+same port. A :py:class:`PortAllocator` reserves ports by locking a file per
+port, so no two processes using the same lock directory pick the same port.
+"""
+import os
+import random
+import socket
+import sys
+import tempfile
+from typing import Optional, Set
+
+import attr
+
+from arsenic.errors import ArsenicError
+
+if sys.platform == "win32":
+    import msvcrt
+
+    def lock_file(fd: int) -> bool:
+        try:
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+        except OSError:
+            return False
+        return True
+
+    def unlock_file(fd: int):
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+else:
+    import fcntl
+
+    def lock_file(fd: int) -> bool:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            return False
+        return True
+
+    def unlock_file(fd: int):
+        fcntl.flock(fd, fcntl.LOCK_UN)
+
+
+def port_is_free(port: int) -> bool:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        try:
+            sock.bind(("0.0.0.0", port))
+        except OSError:
+            return False
+    return True
+
+
+@attr.s
+class PortStats:
+    reserved: int = attr.ib(default=0)
+    locked_elsewhere: int = attr.ib(default=0)
+    in_use: int = attr.ib(default=0)
+
+
+class PortReservation:
+    """
+    A port reserved until :py:meth:`release` is called.
+    """
+
+    def __init__(self, allocator: "PortAllocator", port: int, fd: int):
+        self.allocator = allocator
+        self.port = port
+        self._fd: Optional[int] = fd
+
+    def release(self):
+        if self._fd is None:
+            return
+        fd, self._fd = self._fd, None
+        try:
+            unlock_file(fd)
+        finally:
+            os.close(fd)
+            self.allocator._reserved.discard(self.port)
+
+    async def close(self):
+        self.release()
+
+    def __enter__(self) -> "PortReservation":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
+
+
+class PortAllocator:
+    """
+    Reserves ports between ``start`` and ``end``, inclusive, which are free
+    and not reserved by any other allocator using ``lock_dir``.
+
+    The default range lies below the ephemeral ports of common operating
+    systems, so ports the system hands out to other programs do not
+    collide with it.
+    """
+
+    def __init__(
+        self, start: int = 20000, end: int = 29999, lock_dir: Optional[str] = None
+    ):
+        self.start = start
+        self.end = end
+        self.lock_dir = (
+            os.path.join(tempfile.gettempdir(), "arsenic-ports")
+            if lock_dir is None
+            else lock_dir
+        )
+        self.stats = PortStats()
+        self._reserved: Set[int] = set()
+
+    def reserve(self) -> PortReservation:
+        os.makedirs(self.lock_dir, exist_ok=True)
+        count = self.end - self.start + 1
+        # start at a random port, so processes rarely contend for the same
+        offset = random.randrange(count)
+        for index in range(count):
+            port = self.start + (offset + index) % count
+            if port in self._reserved:
+                continue
+            fd = os.open(
+                os.path.join(self.lock_dir, f"{port}.lock"), os.O_RDWR | os.O_CREAT
+            )
+            if not lock_file(fd):
+                os.close(fd)
+                self.stats.locked_elsewhere += 1
+                continue
+            if not port_is_free(port):
+                unlock_file(fd)
+                os.close(fd)
+                self.stats.in_use += 1
+                continue
+            self._reserved.add(port)
+            self.stats.reserved += 1
+            return PortReservation(self, port, fd)
+        raise ArsenicError(f"No free port between {self.start} and {self.end}")
+
+
+default_allocator = PortAllocator()
@@ -0,0 +1,104 @@
+"""
+Retrying of webdriver commands which failed for transient reasons, such as a
+load balancer in front of a Selenium Grid dropping a connection.
+"""
+import asyncio
+import random
+import re
+from collections import Counter
+from typing import Awaitable, Callable, FrozenSet, Optional, Tuple, Type, TypeVar
+
+import attr
+from aiohttp import ClientConnectionError
+from structlog import get_logger
+
+log = get_logger()
+
+T = TypeVar("T")
+
+# element lookups, on the session or on an element, have no side effects
+IDEMPOTENT_POST = re.compile(r"/elements?$")
+
+
+class TransientStatus(Exception):
+    """
+    Raised by a connection if a response has a status the retry policy
+    considers transient. Holds the response, so it can be turned into the
+    proper error if the policy gives up.
+    """
+
+    def __init__(self, status: int, body: bytes):
+        self.status = status
+        self.body = body
+        super().__init__(status)
+
+
+@attr.s
+class RetryStats:
+    attempts: int = attr.ib(default=0)
+    retries: int = attr.ib(default=0)
+    gave_up: int = attr.ib(default=0)
+    reasons: Counter = attr.ib(default=attr.Factory(Counter))
+
+
+@attr.s
+class RetryPolicy:
+    """
+    Retries idempotent commands up to ``attempts`` times in total if they fail
+    with one of ``exceptions`` or a response status in ``statuses``.
+
+    The n-th retry waits ``backoff * 2 ** (n - 1)`` seconds, at most
+    ``max_backoff``, of which a random fraction of up to ``jitter`` is taken
+    off, so retries of concurrent commands spread out. No retry is started if
+    it would wait past ``deadline`` seconds after the first attempt.
+    """
+
+    attempts: int = attr.ib(default=3)
+    backoff: float = attr.ib(default=0.1)
+    max_backoff: float = attr.ib(default=2)
+    jitter: float = attr.ib(default=0.5)
+    deadline: Optional[float] = attr.ib(default=10)
+    statuses: FrozenSet[int] = attr.ib(default=frozenset({502, 503, 504}))
+    exceptions: Tuple[Type[BaseException], ...] = attr.ib(
+        default=(ClientConnectionError,)
+    )
+    stats: RetryStats = attr.ib(default=attr.Factory(RetryStats))
+
+    def is_idempotent(self, method: str, url: str) -> bool:
+        if method == "GET":
+            return True
+        return method == "POST" and IDEMPOTENT_POST.search(url) is not None
+
+    def delay(self, retry: int) -> float:
+        delay = min(self.max_backoff, self.backoff * 2 ** (retry - 1))
+        return delay * (1 - self.jitter * random.random())
+
+    async def run(self, attempt: Callable[[], Awaitable[T]]) -> T:
+        """
+        Calls ``attempt`` until it succeeds or the policy gives up, in which
+        case the error of the last attempt is raised.
+        """
+        loop = asyncio.get_event_loop()
+        deadline = None if self.deadline is None else loop.time() + self.deadline
+        retry = 0
+        while True:
+            self.stats.attempts += 1
+            try:
+                return await attempt()
+            except (TransientStatus,) + self.exceptions as exc:
+                reason = (
+                    str(exc.status)
+                    if isinstance(exc, TransientStatus)
+                    else type(exc).__name__
+                )
+                retry += 1
+                delay = self.delay(retry)
+                if retry >= self.attempts or (
+                    deadline is not None and loop.time() + delay > deadline
+                ):
+                    self.stats.gave_up += 1
+                    raise
+                self.stats.retries += 1
+                self.stats.reasons[reason] += 1
+                log.info("retry", reason=reason, retry=retry, delay=delay)
+                await asyncio.sleep(delay)
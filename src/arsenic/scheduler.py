@@ -0,0 +1,142 @@
+"""
+Scheduling of the commands of a session shared by many tasks.
+"""
+import asyncio
+import enum
+import itertools
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Awaitable, Callable, Dict, List, Optional, TypeVar
+
+import attr
+
+T = TypeVar("T")
+
+
+class Priority(enum.IntEnum):
+    interactive = 0
+    normal = 1
+    background = 2
+
+
+_priority: ContextVar[Priority] = ContextVar(
+    "arsenic_priority", default=Priority.normal
+)
+
+
+@contextmanager
+def priority(level: Priority):
+    """
+    Context manager setting the priority of all commands sent within it,
+    including those sent by tasks created within it.
+    """
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority() -> Priority:
+    return _priority.get()
+
+
+@attr.s
+class PriorityStats:
+    dispatched: int = attr.ib(default=0)
+    total_wait: float = attr.ib(default=0)
+    max_wait: float = attr.ib(default=0)
+
+    @property
+    def mean_wait(self) -> float:
+        return self.total_wait / self.dispatched if self.dispatched else 0
+
+
+@attr.s
+class SchedulerStats:
+    depth: int = attr.ib(default=0)
+    max_depth: int = attr.ib(default=0)
+    in_flight: int = attr.ib(default=0)
+    priorities: Dict[Priority, PriorityStats] = attr.ib(
+        default=attr.Factory(lambda: {level: PriorityStats() for level in Priority})
+    )
+
+
+@attr.s
+class Waiter:
+    priority: Priority = attr.ib()
+    enqueued: float = attr.ib()
+    order: int = attr.ib()
+    future: asyncio.Future = attr.ib()
+
+
+class CommandScheduler:
+    """
+    Queues the commands of a session so at most ``concurrency`` of them are
+    sent to the webdriver at a time.
+
+    Queued commands are dispatched by priority, then in order of arrival. A
+    command gains one priority class for every ``aging`` seconds it waits,
+    so background commands are delayed, but never starved.
+    """
+
+    def __init__(self, concurrency: int = 1, aging: Optional[float] = 1.0):
+        self.concurrency = concurrency
+        self.aging = aging
+        self.stats = SchedulerStats()
+        self._waiters: List[Waiter] = []
+        self._order = itertools.count()
+
+    async def run(self, func: Callable[[], Awaitable[T]]) -> T:
+        await self.acquire()
+        try:
+            return await func()
+        finally:
+            self.release()
+
+    async def acquire(self):
+        loop = asyncio.get_event_loop()
+        level = current_priority()
+        enqueued = loop.time()
+        if self.stats.in_flight < self.concurrency and not self._waiters:
+            self.stats.in_flight += 1
+            self._dispatched(level, 0)
+            return
+        waiter = Waiter(level, enqueued, next(self._order), loop.create_future())
+        self._waiters.append(waiter)
+        self.stats.depth += 1
+        self.stats.max_depth = max(self.stats.max_depth, self.stats.depth)
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.cancelled():
+                self._waiters.remove(waiter)
+                self.stats.depth -= 1
+            else:
+                # the slot was handed over just before the cancellation
+                self.release()
+            raise
+        self._dispatched(level, loop.time() - enqueued)
+
+    def release(self):
+        if not self._waiters:
+            self.stats.in_flight -= 1
+            return
+        waiter = min(self._waiters, key=self._rank)
+        self._waiters.remove(waiter)
+        self.stats.depth -= 1
+        # the slot passes on to the waiter, so in_flight is unchanged
+        waiter.future.set_result(None)
+
+    def _rank(self, waiter: Waiter):
+        level = float(waiter.priority)
+        if self.aging:
+            now = asyncio.get_event_loop().time()
+            level -= (now - waiter.enqueued) // self.aging
+        return level, waiter.order
+
+    def _dispatched(self, level: Priority, waited: float):
+        stats = self.stats.priorities[level]
+        stats.dispatched += 1
+        stats.total_wait += waited
+        stats.max_wait = max(stats.max_wait, waited)
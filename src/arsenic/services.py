@@ -4,24 +4,43 @@ import re
 import sys
 from distutils.version import StrictVersion
 from functools import partial
-from typing import List, TextIO, Optional
+from typing import Awaitable, Callable, List, Pattern, TextIO, Optional
 
 import aiohttp.client_exceptions
 import attr
 from aiohttp import ClientSession
 
+from arsenic.codec import Codec
 from arsenic.connection import Connection, RemoteConnection
-from arsenic.http import Auth, BasicAuth
+from arsenic.http import THTTP, Auth, BasicAuth, open_session
+from arsenic.ports import PortAllocator, default_allocator
+from arsenic.retry import RetryPolicy
 from arsenic.subprocess import get_subprocess_impl
-from arsenic.utils import free_port
+from arsenic.uploads import UploadCache
+from arsenic.versions import VersionCache, default_cache
 from arsenic.webdriver import WebDriver
-from arsenic.errors import ArsenicError
+from arsenic.errors import ArsenicError, ServiceExited
+
+
+# seconds to wait for a service announcing its readiness in its output
+# before falling back to polling its status
+STATUS_FALLBACK_DELAY = 1
 
 
 async def tasked(coro):
     return await asyncio.get_event_loop().create_task(coro)
 
 
+@attr.s
+class StartupTimings:
+    version_check: float = attr.ib(default=0)
+    spawn: float = attr.ib(default=0)
+    ready: float = attr.ib(default=0)
+    total: float = attr.ib(default=0)
+    ready_by: Optional[str] = attr.ib(default=None)
+    status_checks: int = attr.ib(default=0)
+
+
 async def check_service_status(session: ClientSession, url: str) -> bool:
     async with session.get(url + "/status") as response:
         return 200 <= response.status < 300
@@ -32,39 +51,126 @@ async def subprocess_based_service(
     service_url: str,
     log_file: TextIO,
     start_timeout: float = 15,
+    codec: Optional[Codec] = None,
+    http: THTTP = None,
+    ready: Optional[Pattern[str]] = None,
 ) -> WebDriver:
+    loop = asyncio.get_event_loop()
+    timings = StartupTimings()
+    started = loop.time()
+    announced = loop.create_future()
+
+    def on_output(line: str):
+        if not announced.done() and ready.search(line):
+            announced.set_result(None)
+
     closers = []
     try:
         impl = get_subprocess_impl()
-        process = await impl.start_process(cmd, log_file)
+        process = await impl.start_process(
+            cmd, log_file, None if ready is None else on_output
+        )
         closers.append(partial(impl.stop_process, process))
-        session = ClientSession()
-        closers.append(session.close)
-        count = 0
+        spawned = loop.time()
+        timings.spawn = spawned - started
+        session, release = open_session(http)
+        closers.append(release)
 
         async def wait_service():
+            if ready is not None:
+                await asyncio.sleep(STATUS_FALLBACK_DELAY)
             # Wait for service with exponential back-off
             for i in range(-10, 9999):
+                timings.status_checks += 1
                 try:
                     ok = await tasked(check_service_status(session, service_url))
                 except aiohttp.client_exceptions.ClientConnectorError:
                     # We possibly checked too quickly
                     ok = False
                 if ok:
+                    timings.ready_by = "status"
                     return
                 await asyncio.sleep(start_timeout * 2**i)
 
+        async def wait_output():
+            await announced
+            timings.ready_by = "output"
+
+        async def wait_exit():
+            raise ServiceExited(await impl.wait_process(process))
+
+        waiters = [
+            asyncio.ensure_future(wait_service()),
+            asyncio.ensure_future(wait_exit()),
+        ]
+        if ready is not None:
+            waiters.append(asyncio.ensure_future(wait_output()))
         try:
-            await asyncio.wait_for(wait_service(), timeout=start_timeout)
-        except asyncio.TimeoutError:
+            done, pending = await asyncio.wait(
+                waiters, timeout=start_timeout, return_when=asyncio.FIRST_COMPLETED
+            )
+        finally:
+            for waiter in waiters:
+                waiter.cancel()
+            # waits for the cancelled waiters, so they are not destroyed
+            # while pending
+            await asyncio.gather(*waiters, return_exceptions=True)
+        if not done:
             raise ArsenicError("not starting?")
-        return WebDriver(Connection(session, service_url), closers)
+        for waiter in done:
+            waiter.result()
+        now = loop.time()
+        timings.ready = now - spawned
+        timings.total = now - started
+        driver = WebDriver(Connection(session, service_url, codec=codec), closers)
+        driver.startup = timings
+        return driver
     except:
         for closer in reversed(closers):
             await closer()
         raise
 
 
+async def start_on_port(
+    start: Callable[[int], Awaitable[WebDriver]],
+    ports: Optional[PortAllocator] = None,
+    attempts: int = 3,
+) -> WebDriver:
+    """
+    Calls ``start`` with a port reserved from ``ports`` until it returns a
+    driver, up to ``attempts`` times if the service exits while starting,
+    as it does if another program took the port in the meantime. The port
+    stays reserved until the driver is closed.
+    """
+    allocator = default_allocator if ports is None else ports
+    for attempt in range(1, attempts + 1):
+        reservation = allocator.reserve()
+        try:
+            driver = await start(reservation.port)
+        except ServiceExited:
+            reservation.release()
+            if attempt == attempts:
+                raise
+            continue
+        except:
+            reservation.release()
+            raise
+        # closers run in reverse, so the port is released after the process
+        # has stopped
+        driver.closers.insert(0, reservation.close)
+        return driver
+
+
+async def probe_version(
+    binary: str, pattern: Pattern[str], cache: Optional[VersionCache] = None
+) -> Optional[str]:
+    """
+    Returns the version of ``binary`` found by ``pattern`` in the output of
+    ``binary --version``, which is only run if ``cache`` does not know it.
+    """
+    return await (default_cache if cache is None else cache).version(binary, pattern)
+
+
 class Service(metaclass=abc.ABCMeta):
     @abc.abstractmethod
     async def start(self) -> WebDriver:
@@ -77,21 +183,26 @@ class Geckodriver(Service):
     binary = attr.ib(default="geckodriver")
     version_check = attr.ib(default=True)
     start_timeout = attr.ib(default=15)
+    codec: Optional[Codec] = attr.ib(default=None)
+    http: THTTP = attr.ib(default=None)
+    ports: Optional[PortAllocator] = attr.ib(default=None)
+    version_cache: Optional[VersionCache] = attr.ib(default=None)
 
     _version_re = re.compile(r"geckodriver (\d+\.\d+)")
+    _ready_re = re.compile(r"Listening on ")
+
+    async def version(self) -> Optional[str]:
+        return await probe_version(self.binary, self._version_re, self.version_cache)
 
     async def _check_version(self):
         if self.version_check:
-            impl = get_subprocess_impl()
-            output = await impl.run_process([self.binary, "--version"])
-            match = self._version_re.search(output)
-            if not match:
+            version_str = await self.version()
+            if version_str is None:
                 raise ValueError(
                     "Could not determine version of geckodriver. To "
                     "disable version checking, set `version_check` to "
                     "`False`."
                 )
-            version_str = match.group(1)
             version = StrictVersion(version_str)
             if version < StrictVersion("0.16.1"):
                 raise ValueError(
@@ -101,13 +212,27 @@ class Geckodriver(Service):
                 )
 
     async def start(self):
-        port = free_port()
+        loop = asyncio.get_event_loop()
+        started = loop.time()
         await self._check_version()
+        checked = loop.time() - started
+        driver = await start_on_port(self._start, self.ports)
+        driver.startup.version_check = checked
+        driver.startup.total += checked
+        return driver
+
+    def command(self, port: int) -> List[str]:
+        return [self.binary, "--port", str(port)]
+
+    async def _start(self, port: int) -> WebDriver:
         return await subprocess_based_service(
-            [self.binary, "--port", str(port)],
+            self.command(port),
             f"http://localhost:{port}",
             self.log_file,
             start_timeout=self.start_timeout,
+            codec=self.codec,
+            http=self.http,
+            ready=self._ready_re,
         )
 
 
@@ -116,14 +241,32 @@ class Chromedriver(Service):
     log_file = attr.ib(default=sys.stdout)
     binary = attr.ib(default="chromedriver")
     start_timeout = attr.ib(default=15)
+    codec: Optional[Codec] = attr.ib(default=None)
+    http: THTTP = attr.ib(default=None)
+    ports: Optional[PortAllocator] = attr.ib(default=None)
+    version_cache: Optional[VersionCache] = attr.ib(default=None)
+
+    _version_re = re.compile(r"ChromeDriver (\d+(?:\.\d+)+)")
+    _ready_re = re.compile(r"ChromeDriver was started successfully")
+
+    async def version(self) -> Optional[str]:
+        return await probe_version(self.binary, self._version_re, self.version_cache)
 
     async def start(self):
-        port = free_port()
+        return await start_on_port(self._start, self.ports)
+
+    def command(self, port: int) -> List[str]:
+        return [self.binary, f"--port={port}"]
+
+    async def _start(self, port: int) -> WebDriver:
         return await subprocess_based_service(
-            [self.binary, f"--port={port}"],
+            self.command(port),
             f"http://localhost:{port}",
             self.log_file,
             start_timeout=self.start_timeout,
+            codec=self.codec,
+            http=self.http,
+            ready=self._ready_re,
         )
 
 
@@ -132,14 +275,34 @@ class MSEdgeDriver(Service):
     log_file = attr.ib(default=sys.stdout)
     binary = attr.ib(default="msedgedriver")
     start_timeout = attr.ib(default=15)
+    codec: Optional[Codec] = attr.ib(default=None)
+    http: THTTP = attr.ib(default=None)
+    ports: Optional[PortAllocator] = attr.ib(default=None)
+    version_cache: Optional[VersionCache] = attr.ib(default=None)
+
+    _version_re = re.compile(
+        r"(?:Microsoft Edge WebDriver|MSEdgeDriver) (\d+(?:\.\d+)+)"
+    )
+    _ready_re = re.compile(r"WebDriver was started successfully")
+
+    async def version(self) -> Optional[str]:
+        return await probe_version(self.binary, self._version_re, self.version_cache)
 
     async def start(self):
-        port = free_port()
+        return await start_on_port(self._start, self.ports)
+
+    def command(self, port: int) -> List[str]:
+        return [self.binary, f"--port={port}"]
+
+    async def _start(self, port: int) -> WebDriver:
         return await subprocess_based_service(
-            [self.binary, f"--port={port}"],
+            self.command(port),
             f"http://localhost:{port}",
             self.log_file,
             start_timeout=self.start_timeout,
+            codec=self.codec,
+            http=self.http,
+            ready=self._ready_re,
         )
 
 
@@ -161,6 +324,10 @@ class Remote(Service):
     auth: Optional[Auth] = attr.ib(
         default=None, converter=attr.converters.optional(auth_or_string)
     )
+    codec: Optional[Codec] = attr.ib(default=None)
+    http: THTTP = attr.ib(default=None)
+    upload_cache: Optional[UploadCache] = attr.ib(default=None)
+    retry: Optional[RetryPolicy] = attr.ib(default=None)
 
     async def start(self):
         closers = []
@@ -168,9 +335,17 @@ class Remote(Service):
         if self.auth:
             headers.update(self.auth.get_headers())
         try:
-            session = ClientSession(headers=headers)
-            closers.append(session.close)
-            return WebDriver(RemoteConnection(session, self.url), closers)
+            session, release = open_session(self.http)
+            closers.append(release)
+            connection = RemoteConnection(
+                session,
+                self.url,
+                codec=self.codec,
+                headers=headers,
+                retry=self.retry,
+                upload_cache=self.upload_cache,
+            )
+            return WebDriver(connection, closers)
         except:
             for closer in reversed(closers):
                 await closer()
@@ -183,12 +358,25 @@ class IEDriverServer(Service):
     binary = attr.ib(default="IEDriverServer.exe")
     log_level = attr.ib(default="FATAL")
     start_timeout = attr.ib(default=15)
+    codec: Optional[Codec] = attr.ib(default=None)
+    http: THTTP = attr.ib(default=None)
+    ports: Optional[PortAllocator] = attr.ib(default=None)
+
+    _ready_re = re.compile(r"Listening on port")
 
     async def start(self):
-        port = free_port()
+        return await start_on_port(self._start, self.ports)
+
+    def command(self, port: int) -> List[str]:
+        return [self.binary, f"/port={port}", f"/log-level={self.log_level}"]
+
+    async def _start(self, port: int) -> WebDriver:
         return await subprocess_based_service(
-            [self.binary, f"/port={port}", f"/log-level={self.log_level}"],
+            self.command(port),
             f"http://localhost:{port}",
             self.log_file,
             start_timeout=self.start_timeout,
+            codec=self.codec,
+            http=self.http,
+            ready=self._ready_re,
         )
@@ -1,19 +1,83 @@
-import base64
-from functools import partial
+import asyncio
 from io import BytesIO
 from pathlib import Path
-from typing import Awaitable, Callable, Any, List, Dict, Tuple, Iterator
+from typing import (
+    TYPE_CHECKING,
+    Awaitable,
+    AsyncIterator,
+    Callable,
+    Any,
+    List,
+    Dict,
+    Iterable,
+    Optional,
+    Tuple,
+    Iterator,
+)
 
 import attr
 
 from arsenic import constants
 from arsenic.connection import Connection, unwrap
 from arsenic.constants import SelectorType, WindowType
-from arsenic.errors import NoSuchElement, OperationNotSupported
+from arsenic.elementcache import ElementCache
+from arsenic.errors import (
+    ERROR_CLASSES,
+    JavascriptError,
+    OperationNotSupported,
+    StaleElementReference,
+    UnknownCommand,
+    UnsupportedOperation,
+)
+from arsenic.streaming import (
+    TBinaryTarget,
+    TTextTarget,
+    read_base64,
+    write_base64,
+    write_text,
+)
 from arsenic.utils import Rect
+from arsenic.waits import Absent, Condition, Present, wait_for
+
+if TYPE_CHECKING:
+    from arsenic.batch import Batch
 
 UNSET = object()
 
+FETCH_SCRIPT = """
+var options = arguments[1];
+return arguments[0].map(function (element) {
+    var row = [], style = null;
+    if (options.text) row.push(element.innerText);
+    options.attrs.forEach(function (name) { row.push(element.getAttribute(name)); });
+    options.props.forEach(function (name) { row.push(element[name]); });
+    if (options.css.length || options.displayed) {
+        style = window.getComputedStyle(element);
+    }
+    options.css.forEach(function (name) { row.push(style.getPropertyValue(name)); });
+    if (options.rect) {
+        var rect = element.getBoundingClientRect();
+        row.push([
+            rect.left + window.pageXOffset, rect.top + window.pageYOffset,
+            rect.width, rect.height
+        ]);
+    }
+    if (options.displayed) {
+        row.push(element.getClientRects().length > 0
+            && style.visibility !== "hidden" && style.display !== "none");
+    }
+    if (options.enabled) row.push(!element.disabled);
+    return row;
+});
+"""
+
+# errors indicating the webdriver cannot run the fetch script at all
+FETCH_SCRIPT_UNSUPPORTED = (UnknownCommand, UnsupportedOperation)
+# errors of a single run of the fetch script, which can be transient
+FETCH_SCRIPT_ERRORS = ERROR_CLASSES + (JavascriptError,)
+# failed runs in a row after which the fetch script is no longer tried
+FETCH_SCRIPT_MAX_FAILURES = 3
+
 
 def escape_value(value: str) -> str:
     if '"' in value and "'" in value:
@@ -33,13 +97,30 @@ def escape_value(value: str) -> str:
         return f'"{value}"'
 
 
+def changes_page(method: str, url: str) -> bool:
+    return method != "GET" and url not in ("/element", "/elements")
+
+
 class RequestHelpers:
+    @property
+    def _element_cache(self) -> Optional[ElementCache]:
+        return None
+
     async def _request(
         self, *, url: str, method: str, data=None, raw=False, timeout=None
     ):
-        status, data = await self.connection.request(
-            url=url, method=method, data=data, timeout=timeout
-        )
+        cache = self._element_cache
+        invalidate = cache is not None and changes_page(method, url)
+        if invalidate:
+            cache.invalidate()
+        try:
+            status, data = await self.connection.request(
+                url=url, method=method, data=data, timeout=timeout
+            )
+        finally:
+            if invalidate:
+                # lookups may have been answered while the command ran
+                cache.invalidate()
         if raw:
             return data
         if data:
@@ -52,12 +133,88 @@ class RequestHelpers:
         """
         return unwrap(value)
 
+    async def _find(
+        self,
+        session: "Session",
+        parent_id: Optional[str],
+        selector: str,
+        selector_type: SelectorType,
+        many: bool,
+        cached: bool = True,
+    ):
+        cache = self._element_cache if cached else None
+        if cache is not None:
+            key = (selector, selector_type, many, parent_id)
+            found = cache.get(key)
+            if found is not None:
+                return list(found) if many else found
+            generation = cache.generation
+        result = await self._request(
+            url="/elements" if many else "/element",
+            method="POST",
+            data={"using": selector_type.value, "value": selector},
+        )
+        if many:
+            found = [session.create_element(element_id) for element_id in result]
+        else:
+            found = session.create_element(result)
+        if cache is not None:
+            if many:
+                for index, element in enumerate(found):
+                    element._locator = (self, selector, selector_type, index)
+            else:
+                found._locator = (self, selector, selector_type, None)
+            cache.put(key, list(found) if many else found, generation)
+        return found
+
 
 class Element(RequestHelpers):
     def __init__(self, id: str, connection: Connection, session: "Session"):
         self.id = id
         self.connection = connection
         self.session = session
+        self._locator: Optional[
+            Tuple[RequestHelpers, str, SelectorType, Optional[int]]
+        ] = None
+
+    @property
+    def _element_cache(self) -> Optional[ElementCache]:
+        return self.session.element_cache
+
+    async def _request(self, **kwargs):
+        try:
+            return await super()._request(**kwargs)
+        except StaleElementReference:
+            if self._locator is None or self._element_cache is None:
+                raise
+            if not await self._relocate():
+                raise
+            return await super()._request(**kwargs)
+
+    async def _relocate(self) -> bool:
+        """
+        Looks up an element found through the element cache again after the
+        page changed underneath it. Elements of a list are looked up by their
+        position in it. Returns whether the element was found.
+        """
+        parent, selector, selector_type, index = self._locator
+        parent_id = getattr(parent, "id", None)
+        found = await parent._find(
+            self.session,
+            parent_id,
+            selector,
+            selector_type,
+            index is not None,
+            cached=False,
+        )
+        if index is not None:
+            if index >= len(found):
+                return False
+            found = found[index]
+        self.id = found.id
+        self.connection = found.connection
+        self._element_cache.stats.relocations += 1
+        return True
 
     async def get_text(self) -> str:
         return await self._request(url="/text", method="GET")
@@ -100,32 +257,90 @@ class Element(RequestHelpers):
     async def get_element(
         self, selector: str, selector_type: SelectorType = SelectorType.css_selector
     ) -> "Element":
-        element_id = await self._request(
-            url="/element",
-            method="POST",
-            data={"using": selector_type.value, "value": selector},
-        )
-        return self.session.create_element(element_id)
+        return await self._find(self.session, self.id, selector, selector_type, False)
 
     async def get_elements(
         self, selector: str, selector_type: SelectorType = SelectorType.css_selector
     ) -> List["Element"]:
-        element_ids = await self._request(
-            url="/elements",
-            method="POST",
-            data={"using": selector_type.value, "value": selector},
-        )
-        return [self.session.create_element(element_id) for element_id in element_ids]
+        return await self._find(self.session, self.id, selector, selector_type, True)
 
     async def get_rect(self):
         data = await self._request(url="/rect", method="GET")
         return Rect(data["x"], data["y"], data["width"], data["height"])
 
-    async def get_screenshot(self):
-        return BytesIO(
-            base64.b64decode(await self._request(url="/screenshot", method="GET"))
+    async def get_screenshot(self) -> BytesIO:
+        fobj = BytesIO()
+        await self.save_screenshot(fobj)
+        fobj.seek(0)
+        return fobj
+
+    async def save_screenshot(self, target: TBinaryTarget) -> int:
+        return await write_base64(
+            self.connection.stream_value(url="/screenshot"), target
         )
 
+    async def get_screenshot_view(self) -> memoryview:
+        return await read_base64(self.connection.stream_value(url="/screenshot"))
+
+
+@attr.s
+class ElementData:
+    element: Element = attr.ib()
+    text: Optional[str] = attr.ib(default=None)
+    attrs: Dict[str, Optional[str]] = attr.ib(default=attr.Factory(dict))
+    props: Dict[str, Any] = attr.ib(default=attr.Factory(dict))
+    css: Dict[str, str] = attr.ib(default=attr.Factory(dict))
+    rect: Optional[Rect] = attr.ib(default=None)
+    displayed: Optional[bool] = attr.ib(default=None)
+    enabled: Optional[bool] = attr.ib(default=None)
+
+
+@attr.s
+class FetchOptions:
+    text: bool = attr.ib()
+    attrs: Tuple[str, ...] = attr.ib(converter=tuple)
+    props: Tuple[str, ...] = attr.ib(converter=tuple)
+    css: Tuple[str, ...] = attr.ib(converter=tuple)
+    rect: bool = attr.ib()
+    displayed: bool = attr.ib()
+    enabled: bool = attr.ib()
+
+    def calls(self, element: Element) -> List[Awaitable[Any]]:
+        """
+        Returns the coroutines reading the values of ``element`` one command
+        at a time, in the order :py:meth:`build` expects them.
+        """
+        calls = []
+        if self.text:
+            calls.append(element.get_text())
+        calls.extend(element.get_attribute(name) for name in self.attrs)
+        calls.extend(element.get_property(name) for name in self.props)
+        calls.extend(element.get_css_value(name) for name in self.css)
+        if self.rect:
+            calls.append(element.get_rect())
+        if self.displayed:
+            calls.append(element.is_displayed())
+        if self.enabled:
+            calls.append(element.is_enabled())
+        return calls
+
+    def build(self, element: Element, row: List[Any]) -> ElementData:
+        values = iter(row)
+        data = ElementData(element)
+        if self.text:
+            data.text = next(values)
+        data.attrs = {name: next(values) for name in self.attrs}
+        data.props = {name: next(values) for name in self.props}
+        data.css = {name: next(values) for name in self.css}
+        if self.rect:
+            rect = next(values)
+            data.rect = rect if isinstance(rect, Rect) else Rect(*rect)
+        if self.displayed:
+            data.displayed = next(values)
+        if self.enabled:
+            data.enabled = next(values)
+        return data
+
 
 TCallback = Callable[..., Awaitable[Any]]
 TWaiter = Callable[[int, TCallback], Awaitable[Any]]
@@ -142,6 +357,15 @@ class Session(RequestHelpers):
         self.wait = wait
         self.driver = driver
         self.browser = browser
+        self.element_cache: Optional[ElementCache] = None
+        self.fetch_script = True
+        self.fetch_failures = 0
+        self.browser_waits = False
+        self.wait_slice = 5.0
+
+    @property
+    def _element_cache(self) -> Optional[ElementCache]:
+        return self.element_cache
 
     async def request(
         self, url: str, method: str = "GET", data: Dict[str, Any] = UNSET
@@ -159,25 +383,91 @@ class Session(RequestHelpers):
     async def get_page_source(self) -> str:
         return await self._request(url="/source", method="GET")
 
+    def iter_page_source(self) -> AsyncIterator[str]:
+        return self.connection.stream_value(url="/source")
+
+    async def save_page_source(self, target: TTextTarget) -> int:
+        return await write_text(self.iter_page_source(), target)
+
     async def get_element(
         self, selector: str, selector_type: SelectorType = SelectorType.css_selector
     ) -> Element:
-        element_id = await self._request(
-            url="/element",
-            method="POST",
-            data={"using": selector_type.value, "value": selector},
-        )
-        return self.create_element(element_id)
+        return await self._find(self, None, selector, selector_type, False)
 
     async def get_elements(
         self, selector: str, selector_type: SelectorType = SelectorType.css_selector
     ) -> List[Element]:
-        result = await self._request(
-            url="/elements",
-            method="POST",
-            data={"using": selector_type.value, "value": selector},
+        return await self._find(self, None, selector, selector_type, True)
+
+    async def fetch(
+        self,
+        elements: Iterable[Element],
+        *,
+        text: bool = False,
+        attrs: Iterable[str] = (),
+        props: Iterable[str] = (),
+        css: Iterable[str] = (),
+        rect: bool = False,
+        displayed: bool = False,
+        enabled: bool = False,
+    ) -> List[ElementData]:
+        elements = list(elements)
+        options = FetchOptions(text, attrs, props, css, rect, displayed, enabled)
+        if not elements:
+            return []
+        rows = await self._fetch_script(elements, options)
+        if rows is not None:
+            return [options.build(elem, row) for elem, row in zip(elements, rows)]
+        rows = await asyncio.gather(
+            *(asyncio.gather(*options.calls(element)) for element in elements)
         )
-        return [self.create_element(element_id) for element_id in result]
+        return [options.build(elem, row) for elem, row in zip(elements, rows)]
+
+    def batch(self, concurrency: int = 8, coalesce: bool = False) -> "Batch":
+        # imported here, as the batch module depends on this one
+        from arsenic.batch import Batch
+
+        return Batch(self, concurrency, coalesce)
+
+    async def _fetch_script(
+        self, elements: List[Element], options: FetchOptions
+    ) -> Optional[List[List[Any]]]:
+        """
+        Reads the values using the fetch script, returns ``None`` if the
+        webdriver cannot run it this time.
+
+        The script is disabled for good if the webdriver does not support it,
+        or after it failed ``FETCH_SCRIPT_MAX_FAILURES`` times in a row, as a
+        single failure may just be a page navigating or a flaky grid.
+        """
+        if not self.fetch_script:
+            return None
+        try:
+            # sent directly, as reading values does not invalidate the element cache
+            status, data = await self.connection.request(
+                url="/execute/sync",
+                method="POST",
+                data={
+                    "script": FETCH_SCRIPT,
+                    "args": [
+                        [{constants.WEB_ELEMENT: element.id} for element in elements],
+                        attr.asdict(options),
+                    ],
+                },
+            )
+        except FETCH_SCRIPT_UNSUPPORTED:
+            self.fetch_script = False
+            return None
+        except FETCH_SCRIPT_ERRORS:
+            self.fetch_failures += 1
+            if self.fetch_failures >= FETCH_SCRIPT_MAX_FAILURES:
+                self.fetch_script = False
+            return None
+        self.fetch_failures = 0
+        return data["value"]
+
+    async def wait_for(self, timeout: float, condition: Condition) -> Any:
+        return await wait_for(self, timeout, condition)
 
     async def wait_for_element(
         self,
@@ -185,9 +475,7 @@ class Session(RequestHelpers):
         selector: str,
         selector_type: SelectorType = SelectorType.css_selector,
     ) -> Element:
-        return await self.wait(
-            timeout, partial(self.get_element, selector, selector_type), NoSuchElement
-        )
+        return await self.wait_for(timeout, Present(selector, selector_type))
 
     async def wait_for_element_gone(
         self,
@@ -195,15 +483,7 @@ class Session(RequestHelpers):
         selector: str,
         selector_type: SelectorType = SelectorType.css_selector,
     ):
-        async def callback():
-            try:
-                await self.get_element(selector, selector_type)
-            except NoSuchElement:
-                return True
-            else:
-                return False
-
-        return await self.wait(timeout, callback)
+        return await self.wait_for(timeout, Absent(selector, selector_type))
 
     async def add_cookie(
         self,
@@ -295,10 +575,19 @@ class Session(RequestHelpers):
         return await self._request(url="/actions", method="POST", data=actions)
 
     async def get_screenshot(self) -> BytesIO:
-        return BytesIO(
-            base64.b64decode(await self._request(url="/screenshot", method="GET"))
+        fobj = BytesIO()
+        await self.save_screenshot(fobj)
+        fobj.seek(0)
+        return fobj
+
+    async def save_screenshot(self, target: TBinaryTarget) -> int:
+        return await write_base64(
+            self.connection.stream_value(url="/screenshot"), target
         )
 
+    async def get_screenshot_view(self) -> memoryview:
+        return await read_base64(self.connection.stream_value(url="/screenshot"))
+
     async def close(self):
         await self._request(url="", method="DELETE")
 
@@ -323,6 +612,9 @@ class Session(RequestHelpers):
             url="/window/new", method="POST", data={"type": window_type.value}
         )
 
+    async def close_window(self) -> List[str]:
+        return await self._request(url="/window", method="DELETE")
+
 
 def _pointer_down(device, action):
     del action["duration"]
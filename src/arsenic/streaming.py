@@ -0,0 +1,285 @@
+"""
+Helpers to process large values in webdriver responses, such as screenshots,
+without holding the whole response in memory.
+"""
+import base64
+import codecs
+import inspect
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import IO, Any, AsyncIterator, Awaitable, Callable, List, Optional, Union
+
+ESCAPES = {
+    ord('"'): '"',
+    ord("\\"): "\\",
+    ord("/"): "/",
+    ord("b"): "\b",
+    ord("f"): "\f",
+    ord("n"): "\n",
+    ord("r"): "\r",
+    ord("t"): "\t",
+}
+WHITESPACE = b" \t\r\n"
+
+PREFIX, STRING, DONE, NOT_STRING = range(4)
+
+
+class ValueStream:
+    """
+    Incrementally extracts the top level ``"value"`` string from a JSON
+    response body.
+
+    Feed the body to :py:meth:`feed` chunk by chunk, which returns the pieces
+    of the decoded string found so far. If the value turns out to not be a
+    string, :py:attr:`is_string` becomes ``False`` and :py:attr:`consumed`
+    holds everything fed so far, so the caller can fall back to decoding the
+    whole body.
+    """
+
+    def __init__(self):
+        self.state = PREFIX
+        self.consumed = bytearray()
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._string_start = 0
+        self._expect_key = False
+        self._key: Optional[bytes] = None
+        self._after_colon = False
+        self._pending = b""
+        self._high_surrogate: Optional[int] = None
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+
+    @property
+    def is_string(self) -> bool:
+        return self.state != NOT_STRING
+
+    @property
+    def done(self) -> bool:
+        return self.state in (DONE, NOT_STRING)
+
+    def feed(self, chunk: bytes) -> List[str]:
+        if self.state == PREFIX:
+            start = len(self.consumed)
+            self.consumed += chunk
+            index = self._scan_prefix(start)
+            if self.state != STRING:
+                return []
+            chunk = bytes(self.consumed[index:])
+            self.consumed = bytearray()
+        if self.state == STRING:
+            return self._feed_string(chunk)
+        if self.state == NOT_STRING:
+            self.consumed += chunk
+        return []
+
+    def _scan_prefix(self, index: int) -> int:
+        data = self.consumed
+        while index < len(data):
+            char = data[index]
+            index += 1
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == 0x5C:  # backslash
+                    self._escaped = True
+                elif char == 0x22:  # quote
+                    self._in_string = False
+                    if self._depth == 1 and self._expect_key:
+                        self._key = bytes(data[self._string_start : index - 1])
+                        self._expect_key = False
+                continue
+            if char in WHITESPACE:
+                continue
+            if self._after_colon:
+                self._after_colon = False
+                if self._key == b"value":
+                    self.state = STRING if char == 0x22 else NOT_STRING
+                    return index
+            if char == 0x22:
+                self._in_string = True
+                self._string_start = index
+            elif char in b"{[":
+                self._depth += 1
+                self._expect_key = self._depth == 1 and char == 0x7B
+            elif char in b"}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    self.state = NOT_STRING
+                    return index
+            elif char == 0x2C and self._depth == 1:  # comma
+                self._expect_key = True
+            elif char == 0x3A and self._depth == 1:  # colon
+                self._after_colon = True
+        return index
+
+    def _feed_string(self, chunk: bytes) -> List[str]:
+        if self._pending:
+            chunk = self._pending + chunk
+            self._pending = b""
+        pieces = []
+        index = 0
+        length = len(chunk)
+        quote = chunk.find(b'"')
+        backslash = chunk.find(b"\\")
+        while index < length:
+            if quote != -1 and quote < index:
+                quote = chunk.find(b'"', index)
+            if backslash != -1 and backslash < index:
+                backslash = chunk.find(b"\\", index)
+            if backslash != -1 and (quote == -1 or backslash < quote):
+                self._emit(pieces, chunk[index:backslash])
+                index = self._unescape(pieces, chunk, backslash)
+                if index == -1:
+                    self._pending = chunk[backslash:]
+                    return pieces
+            elif quote != -1:
+                self._emit(pieces, chunk[index:quote])
+                self._flush_surrogate(pieces)
+                tail = self._utf8.decode(b"", final=True)
+                if tail:
+                    pieces.append(tail)
+                self.state = DONE
+                return pieces
+            else:
+                self._emit(pieces, chunk[index:])
+                index = length
+        return pieces
+
+    def _emit(self, pieces: List[str], data: bytes):
+        if data:
+            self._flush_surrogate(pieces)
+            text = self._utf8.decode(data)
+            if text:
+                pieces.append(text)
+
+    def _flush_surrogate(self, pieces: List[str]):
+        if self._high_surrogate is not None:
+            pieces.append(chr(self._high_surrogate))
+            self._high_surrogate = None
+
+    def _unescape(self, pieces: List[str], chunk: bytes, index: int) -> int:
+        """
+        Decodes the escape sequence at ``index`` and returns the index after
+        it, or ``-1`` if the chunk ends before the escape sequence does.
+        """
+        if index + 1 >= len(chunk):
+            return -1
+        kind = chunk[index + 1]
+        if kind != ord("u"):
+            if kind not in ESCAPES:
+                raise ValueError(f"Invalid escape sequence {chunk[index:index + 2]!r}")
+            self._flush_surrogate(pieces)
+            pieces.append(ESCAPES[kind])
+            return index + 2
+        if index + 6 > len(chunk):
+            return -1
+        code = int(chunk[index + 2 : index + 6], 16)
+        if 0xD800 <= code < 0xDC00:
+            self._flush_surrogate(pieces)
+            self._high_surrogate = code
+        elif 0xDC00 <= code < 0xE000 and self._high_surrogate is not None:
+            high = self._high_surrogate
+            self._high_surrogate = None
+            pieces.append(chr(0x10000 + ((high - 0xD800) << 10) + (code - 0xDC00)))
+        else:
+            self._flush_surrogate(pieces)
+            pieces.append(chr(code))
+        return index + 6
+
+
+class Base64Decoder:
+    """
+    Decodes base64 encoded text which is fed in pieces of arbitrary length.
+    """
+
+    def __init__(self):
+        self._remainder = ""
+
+    def feed(self, text: str) -> bytes:
+        if "\n" in text or "\r" in text:
+            text = text.replace("\n", "").replace("\r", "")
+        text = self._remainder + text
+        usable = len(text) - len(text) % 4
+        self._remainder = text[usable:]
+        return base64.b64decode(text[:usable])
+
+    def close(self) -> bytes:
+        remainder, self._remainder = self._remainder, ""
+        if remainder:
+            return base64.b64decode(remainder + "=" * (-len(remainder) % 4))
+        return b""
+
+
+@asynccontextmanager
+async def aclosing(pieces: AsyncIterator[str]) -> AsyncIterator[AsyncIterator[str]]:
+    """
+    Async context manager closing ``pieces`` on exit, so a stream which is
+    not read to the end releases its connection right away.
+    """
+    try:
+        yield pieces
+    finally:
+        close = getattr(pieces, "aclose", None)
+        if close is not None:
+            await close()
+
+
+TBinaryTarget = Union[str, Path, IO[bytes]]
+
+
+async def write_base64(pieces: AsyncIterator[str], target: TBinaryTarget) -> int:
+    """
+    Decodes the base64 encoded ``pieces`` into ``target``, which is either a
+    path or a binary file object, and returns the number of bytes written.
+    """
+    if isinstance(target, (str, Path)):
+        with open(target, "wb") as fobj:
+            return await write_base64(pieces, fobj)
+    decoder = Base64Decoder()
+    written = 0
+    async with aclosing(pieces):
+        async for piece in pieces:
+            data = decoder.feed(piece)
+            target.write(data)
+            written += len(data)
+    data = decoder.close()
+    target.write(data)
+    return written + len(data)
+
+
+async def read_base64(pieces: AsyncIterator[str]) -> memoryview:
+    """
+    Decodes the base64 encoded ``pieces`` into a single buffer.
+    """
+    buffer = bytearray()
+    decoder = Base64Decoder()
+    async with aclosing(pieces):
+        async for piece in pieces:
+            buffer += decoder.feed(piece)
+    buffer += decoder.close()
+    return memoryview(buffer)
+
+
+TTextTarget = Union[str, Path, IO[str], Callable[[str], Optional[Awaitable[Any]]]]
+
+
+async def write_text(pieces: AsyncIterator[str], target: TTextTarget) -> int:
+    """
+    Writes the ``pieces`` of text to ``target`` and returns the number of
+    characters written. ``target`` is a path, which is written as UTF-8, an
+    object with a ``write`` method or a callable, either of which may return
+    an awaitable.
+    """
+    if isinstance(target, (str, Path)):
+        with open(target, "w", encoding="utf-8", newline="") as fobj:
+            return await write_text(pieces, fobj)
+    write = getattr(target, "write", target)
+    written = 0
+    async with aclosing(pieces):
+        async for piece in pieces:
+            result = write(piece)
+            if inspect.isawaitable(result):
+                await result
+            written += len(piece)
+    return written
@@ -3,8 +3,9 @@ import asyncio
 import os
 import subprocess
 import sys
-from typing import List, TypeVar
-from asyncio.subprocess import DEVNULL, PIPE
+import threading
+from typing import Callable, Dict, List, Optional, TypeVar
+from asyncio.subprocess import DEVNULL, PIPE, STDOUT
 
 from structlog import get_logger
 
@@ -13,6 +14,32 @@ log = get_logger()
 
 P = TypeVar("P")
 
+TOutput = Callable[[str], None]
+
+# longest line of output read from a process
+MAX_LINE = 2**20
+
+
+def tee(log_file, line: bytes):
+    """
+    Writes a line of process output to the log file the process would have
+    written it to, which may be a text or binary file or a file descriptor.
+    """
+    if log_file is None or log_file is os.devnull or log_file == DEVNULL:
+        return
+    if isinstance(log_file, int):
+        os.write(log_file, line)
+        return
+    if hasattr(log_file, "encoding"):
+        log_file.write(line.decode("utf-8", errors="replace"))
+    else:
+        log_file.write(line)
+    log_file.flush()
+
+
+def decode_line(line: bytes) -> str:
+    return line.decode("utf-8", errors="replace").rstrip("\r\n")
+
 
 def check_event_loop():
     if sys.platform == "win32" and isinstance(
@@ -29,15 +56,31 @@ class BaseSubprocessImpl(metaclass=abc.ABCMeta):
         raise NotImplementedError()
 
     @abc.abstractmethod
-    async def start_process(self, cmd: List[str], log_file) -> P:
-        pass
+    async def start_process(
+        self, cmd: List[str], log_file, on_output: Optional[TOutput] = None
+    ) -> P:
+        """
+        Starts ``cmd`` writing its output to ``log_file``. If ``on_output``
+        is given, the output is read through a pipe instead, every line of it
+        is passed to ``on_output`` in the event loop and then written to
+        ``log_file``.
+        """
 
     @abc.abstractmethod
     async def stop_process(self, process: P) -> None:
         pass
 
+    @abc.abstractmethod
+    async def wait_process(self, process: P) -> int:
+        """
+        Waits for ``process`` to exit and returns its exit code.
+        """
+
 
 class AsyncioSubprocessImpl(BaseSubprocessImpl):
+    def __init__(self):
+        self._readers: Dict[int, asyncio.Task] = {}
+
     async def run_process(self, cmd: List[str]) -> str:
         check_event_loop()
         process = await asyncio.create_subprocess_exec(
@@ -49,24 +92,83 @@ class AsyncioSubprocessImpl(BaseSubprocessImpl):
         else:
             return out.decode("utf-8")
 
-    async def start_process(self, cmd: List[str], log_file):
+    async def start_process(
+        self, cmd: List[str], log_file, on_output: Optional[TOutput] = None
+    ):
         check_event_loop()
         if log_file is os.devnull:
             log_file = DEVNULL
-        return await asyncio.create_subprocess_exec(
-            *cmd, stdout=log_file, stderr=log_file, stdin=DEVNULL
+        if on_output is None:
+            return await asyncio.create_subprocess_exec(
+                *cmd, stdout=log_file, stderr=log_file, stdin=DEVNULL
+            )
+        process = await asyncio.create_subprocess_exec(
+            *cmd, stdout=PIPE, stderr=STDOUT, stdin=DEVNULL, limit=MAX_LINE
+        )
+        self._readers[process.pid] = asyncio.ensure_future(
+            self._read_output(process, log_file, on_output)
         )
+        return process
+
+    async def _read_output(self, process, log_file, on_output: TOutput):
+        # keeps reading until the process exits, so it never blocks on a
+        # full pipe
+        stream = process.stdout
+        truncated = False
+        while True:
+            try:
+                line = await stream.readuntil(b"\n")
+            except asyncio.IncompleteReadError as exc:
+                # the process closed its output
+                line = exc.partial
+                if not line:
+                    break
+            except asyncio.LimitOverrunError as exc:
+                # lines longer than MAX_LINE are written to the log file in
+                # chunks, only their start is passed to on_output
+                line = await stream.read(exc.consumed)
+                if not truncated:
+                    self._output(on_output, line)
+                truncated = True
+                tee(log_file, line)
+                continue
+            if not truncated:
+                self._output(on_output, line)
+            truncated = False
+            tee(log_file, line)
+
+    def _output(self, on_output: TOutput, line: bytes):
+        try:
+            on_output(decode_line(line))
+        except Exception:
+            log.exception("process output callback failed")
 
     async def stop_process(self, process):
-        process.terminate()
         try:
-            await asyncio.wait_for(process.communicate(), 1)
-        except asyncio.futures.TimeoutError:
+            process.terminate()
+        except ProcessLookupError:
+            # the process exited already
+            pass
+        try:
+            await asyncio.wait_for(process.wait(), 1)
+        except asyncio.TimeoutError:
             process.kill()
         try:
-            await asyncio.wait_for(process.communicate(), 1)
-        except asyncio.futures.TimeoutError:
+            await asyncio.wait_for(process.wait(), 1)
+        except asyncio.TimeoutError:
             log.warn("could not terminate process", process=process, impl=self)
+        reader = self._readers.pop(process.pid, None)
+        if reader is not None:
+            try:
+                await asyncio.wait_for(reader, 1)
+            except asyncio.TimeoutError:
+                # a child of the process may still hold the pipe open
+                pass
+            except Exception:
+                log.exception("reading process output failed", process=process)
+
+    async def wait_process(self, process) -> int:
+        return await process.wait()
 
 
 class ThreadedSubprocessImpl(BaseSubprocessImpl):
@@ -80,31 +182,59 @@ class ThreadedSubprocessImpl(BaseSubprocessImpl):
             cmd, stderr=subprocess.DEVNULL, stdin=subprocess.DEVNULL
         ).decode("utf-8")
 
-    async def start_process(self, cmd: List[str], log_file):
+    async def start_process(
+        self, cmd: List[str], log_file, on_output: Optional[TOutput] = None
+    ):
         if log_file is os.devnull:
             log_file = subprocess.DEVNULL
-        return await asyncio.get_event_loop().run_in_executor(
-            None, self._start_process, cmd, log_file
+        loop = asyncio.get_event_loop()
+        if on_output is None:
+            return await loop.run_in_executor(None, self._start_process, cmd, log_file)
+        process = await loop.run_in_executor(
+            None, self._start_process, cmd, subprocess.PIPE
         )
+        threading.Thread(
+            target=self._read_output,
+            args=(process, log_file, loop, on_output),
+            daemon=True,
+        ).start()
+        return process
 
     def _start_process(self, cmd: List[str], log_file):
         return subprocess.Popen(
             cmd, stdout=log_file, stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL
         )
 
+    def _read_output(self, process: subprocess.Popen, log_file, loop, on_output):
+        for line in process.stdout:
+            try:
+                loop.call_soon_threadsafe(on_output, decode_line(line))
+            except RuntimeError:
+                # the event loop is closed, nobody is listening any more
+                pass
+            tee(log_file, line)
+        process.stdout.close()
+
     async def stop_process(self, process):
         return await asyncio.get_event_loop().run_in_executor(
             None, self._stop_process, process
         )
 
+    async def wait_process(self, process: subprocess.Popen) -> int:
+        # waiting in a thread would block it until the process exits, even
+        # if the wait is cancelled
+        while process.poll() is None:
+            await asyncio.sleep(0.05)
+        return process.returncode
+
     def _stop_process(self, process: subprocess.Popen):
         process.terminate()
         try:
-            process.communicate(timeout=1)
+            process.wait(timeout=1)
         except subprocess.TimeoutExpired:
             process.kill()
         try:
-            process.communicate(timeout=1)
+            process.wait(timeout=1)
         except subprocess.TimeoutExpired:
             log.warn("could not terminate process", process=process, impl=self)
 
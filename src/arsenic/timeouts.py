@@ -0,0 +1,91 @@
+"""
+Default timeouts of webdriver commands and deadlines shared by all commands
+run within a block of code.
+"""
+import asyncio
+import re
+from contextvars import ContextVar, Token
+from typing import Optional
+
+import attr
+
+NAVIGATION = re.compile(r"/(url|back|forward|refresh)$")
+SCRIPT = re.compile(r"/execute/(sync|async)$")
+LOOKUP = re.compile(r"/elements?$")
+
+_deadline: ContextVar[Optional[float]] = ContextVar("arsenic_deadline", default=None)
+
+
+@attr.s
+class CommandTimeouts:
+    """
+    Default timeouts, in seconds, of webdriver commands by kind of command.
+    ``None`` means no timeout.
+    """
+
+    default: Optional[float] = attr.ib(default=60)
+    new_session: Optional[float] = attr.ib(default=120)
+    navigation: Optional[float] = attr.ib(default=120)
+    script: Optional[float] = attr.ib(default=120)
+    lookup: Optional[float] = attr.ib(default=60)
+    upload: Optional[float] = attr.ib(default=None)
+
+    def for_command(self, method: str, url: str) -> Optional[float]:
+        if method == "POST":
+            if url == "/session":
+                return self.new_session
+            if url == "/file":
+                return self.upload
+            if NAVIGATION.search(url):
+                return self.navigation
+            if SCRIPT.search(url):
+                return self.script
+            if LOOKUP.search(url):
+                return self.lookup
+        return self.default
+
+
+class Deadline:
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.when: Optional[float] = None
+        self._token: Optional[Token] = None
+
+    @property
+    def remaining(self) -> Optional[float]:
+        if self.when is None:
+            return None
+        return self.when - asyncio.get_event_loop().time()
+
+    async def __aenter__(self) -> "Deadline":
+        when = asyncio.get_event_loop().time() + self.seconds
+        outer = _deadline.get()
+        if outer is not None:
+            when = min(when, outer)
+        self.when = when
+        self._token = _deadline.set(when)
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        _deadline.reset(self._token)
+        self._token = None
+
+
+def deadline(seconds: float) -> Deadline:
+    """
+    Async context manager limiting all webdriver commands run within it to
+    finish within ``seconds`` seconds in total. Nested deadlines can only
+    shorten the time left.
+    """
+    return Deadline(seconds)
+
+
+def remaining() -> Optional[float]:
+    """
+    Returns the number of seconds left until the current deadline, or
+    ``None`` if there is no deadline.
+    """
+    when = _deadline.get()
+    if when is None:
+        return None
+    return when - asyncio.get_event_loop().time()
@@ -0,0 +1,103 @@
+"""
+Wire tracing of the commands sent to and responses received from a webdriver.
+"""
+import json
+import logging
+import logging.handlers
+import random
+from typing import Any, Optional, Union
+
+import attr
+from structlog import get_logger
+
+from arsenic.utils import strip_auth
+
+log = get_logger()
+
+
+def truncate(body: Union[str, bytes, None], max_size: Optional[int]):
+    if body is None:
+        return None
+    if isinstance(body, (bytes, bytearray, memoryview)):
+        size = len(body)
+        if max_size is not None and size > max_size:
+            body = body[:max_size]
+        text = bytes(body).decode("utf-8", errors="replace")
+    else:
+        size = len(body)
+        text = body if max_size is None or size <= max_size else body[:max_size]
+    if max_size is not None and size > max_size:
+        return f"{text}...<{size - max_size} more>"
+    return text
+
+
+class FileSink:
+    """
+    Writes trace events as JSON lines to a rotating log file.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 10 * 1024 * 1024, backups: int = 3):
+        self.handler = logging.handlers.RotatingFileHandler(
+            path, maxBytes=max_bytes, backupCount=backups, encoding="utf-8"
+        )
+        self.logger = logging.Logger(f"arsenic.wire:{path}")
+        self.logger.addHandler(self.handler)
+        self.logger.propagate = False
+
+    def info(self, event: str, **kwargs: Any):
+        self.logger.info(json.dumps({"event": event, **kwargs}, default=str))
+
+    error = info
+
+    def close(self):
+        self.logger.removeHandler(self.handler)
+        self.handler.close()
+
+
+@attr.s
+class WireTracer:
+    """
+    Decides which commands get traced and how much of them gets logged.
+
+    ``sample_rate`` is the fraction of commands traced, bodies are cut off
+    after ``max_body_size`` characters. Responses with an error status are
+    traced regardless of sampling. Events go to ``sink``, which defaults to
+    the structlog logger of arsenic.
+    """
+
+    enabled: bool = attr.ib(default=True)
+    sample_rate: float = attr.ib(default=1.0)
+    max_body_size: Optional[int] = attr.ib(default=4096)
+    sink: Any = attr.ib(default=None)
+
+    def should_trace(self) -> bool:
+        if not self.enabled:
+            return False
+        if self.sample_rate >= 1:
+            return True
+        return random.random() < self.sample_rate
+
+    @property
+    def _sink(self):
+        return log if self.sink is None else self.sink
+
+    def request(self, *, url: str, method: str, header, body):
+        self._sink.info(
+            "request",
+            url=strip_auth(url),
+            method=method,
+            header=header,
+            body=truncate(body, self.max_body_size),
+        )
+
+    def response(self, *, url: str, method: str, status: int, body):
+        self._sink.info(
+            "response",
+            url=strip_auth(url),
+            method=method,
+            status=status,
+            body=truncate(body, self.max_body_size),
+        )
+
+
+default_tracer = WireTracer()
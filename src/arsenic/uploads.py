@@ -0,0 +1,128 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Hashable, Optional, Tuple
+
+import attr
+
+
+def file_digest(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as fobj:
+        for chunk in iter(lambda: fobj.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+@attr.s
+class UploadCacheStats:
+    hits: int = attr.ib(default=0)
+    misses: int = attr.ib(default=0)
+    evictions: int = attr.ib(default=0)
+    bytes_saved: int = attr.ib(default=0)
+
+
+@attr.s
+class UploadCacheEntry:
+    remote_path: Path = attr.ib()
+    size: int = attr.ib()
+    created: float = attr.ib()
+
+
+class UploadCache:
+    """
+    Remembers the remote paths of files uploaded to a webdriver, keyed by the
+    content of the files, so uploading the same content again is free.
+
+    At most ``max_entries`` entries are kept, which together represent at most
+    ``max_bytes`` of files. Entries older than ``ttl`` seconds are discarded.
+    The least recently used entries are evicted first.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 256,
+        max_bytes: Optional[int] = None,
+        ttl: Optional[float] = None,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.stats = UploadCacheStats()
+        self._entries: "OrderedDict[Hashable, UploadCacheEntry]" = OrderedDict()
+        self._total_bytes = 0
+        self._digests: "OrderedDict[Tuple[str, int, int], str]" = OrderedDict()
+        # digests are computed in executor threads
+        self._digests_lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def digest(self, path: Path) -> str:
+        """
+        Returns the SHA-256 digest of the file at ``path``. Digests of up to
+        ``max_entries`` files are remembered until the size or modification
+        time of the file changes. This does blocking IO, so call it in an
+        executor. It is safe to call from many threads at once.
+        """
+        stat = os.stat(path)
+        key = (os.path.realpath(path), stat.st_size, stat.st_mtime_ns)
+        with self._digests_lock:
+            digest = self._digests.get(key, None)
+            if digest is not None:
+                self._digests.move_to_end(key)
+                return digest
+        digest = file_digest(path)
+        with self._digests_lock:
+            self._digests[key] = digest
+            while len(self._digests) > self.max_entries:
+                self._digests.popitem(last=False)
+        return digest
+
+    def get(self, key: Hashable) -> Optional[Path]:
+        entry = self._entries.get(key, None)
+        if entry is not None and self._expired(entry):
+            self._remove(key)
+            entry = None
+        if entry is None:
+            self.stats.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.stats.hits += 1
+        self.stats.bytes_saved += entry.size
+        return entry.remote_path
+
+    def put(self, key: Hashable, remote_path: Path, size: int):
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = UploadCacheEntry(remote_path, size, time.monotonic())
+        self._total_bytes += size
+        while self._entries and (
+            len(self._entries) > self.max_entries
+            or (self.max_bytes is not None and self._total_bytes > self.max_bytes)
+        ):
+            self._remove(next(iter(self._entries)))
+            self.stats.evictions += 1
+
+    def discard(self, predicate):
+        """
+        Removes all entries for which ``predicate(key)`` is true.
+        """
+        for key in [key for key in self._entries if predicate(key)]:
+            self._remove(key)
+
+    def clear(self):
+        self._entries.clear()
+        self._total_bytes = 0
+        with self._digests_lock:
+            self._digests.clear()
+
+    def _expired(self, entry: UploadCacheEntry) -> bool:
+        return self.ttl is not None and time.monotonic() - entry.created > self.ttl
+
+    def _remove(self, key: Hashable):
+        entry = self._entries.pop(key)
+        self._total_bytes -= entry.size
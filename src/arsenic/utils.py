@@ -1,5 +1,6 @@
 import socket
 from typing import Union
+from urllib.parse import urlparse, urlunparse
 
 import attr
 
@@ -11,6 +12,16 @@ def free_port() -> int:
         return sock.getsockname()[1]
 
 
+def strip_auth(url: str) -> str:
+    pr = urlparse(url)
+    safe_netloc = pr.hostname
+    if pr.port:
+        safe_netloc = f"{safe_netloc}:{pr.port}"
+    return urlunparse(
+        (pr.scheme, safe_netloc, pr.path, pr.params, pr.query, pr.fragment)
+    )
+
+
 def px_to_number(value: str) -> Union[int, float]:
     original = value
     if value.endswith("px"):
@@ -0,0 +1,120 @@
+"""
+Caching of the ``--version`` output of driver binaries, so probing the
+version of a driver spawns a process only the first time.
+"""
+import json
+import os
+import shutil
+import tempfile
+from typing import Dict, Optional, Pattern
+
+import attr
+from structlog import get_logger
+
+from arsenic.subprocess import get_subprocess_impl
+
+log = get_logger()
+
+
+@attr.s
+class VersionCacheStats:
+    hits: int = attr.ib(default=0)
+    disk_hits: int = attr.ib(default=0)
+    probes: int = attr.ib(default=0)
+
+
+def binary_key(binary: str) -> Optional[str]:
+    """
+    Returns a key identifying the current build of ``binary``, made of its
+    resolved path, size and modification time, or ``None`` if it cannot be
+    found.
+    """
+    path = shutil.which(binary)
+    if path is None:
+        return None
+    path = os.path.realpath(path)
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return f"{path}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+class VersionCache:
+    """
+    Remembers the ``--version`` output of binaries in memory and, if ``path``
+    is given, in a JSON file shared by all processes using it. Entries are
+    keyed by the path, size and modification time of the binary, so
+    replacing a binary invalidates its entry.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.stats = VersionCacheStats()
+        self._entries: Dict[str, str] = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    async def output(self, binary: str) -> str:
+        """
+        Returns the output of ``binary --version``.
+        """
+        key = binary_key(binary)
+        if key is not None:
+            if key in self._entries:
+                self.stats.hits += 1
+                return self._entries[key]
+            stored = self._load().get(key, None)
+            if stored is not None:
+                self.stats.disk_hits += 1
+                self._entries[key] = stored
+                return stored
+        self.stats.probes += 1
+        output = await get_subprocess_impl().run_process([binary, "--version"])
+        if key is not None:
+            self._entries[key] = output
+            self._store(key, output)
+        return output
+
+    async def version(self, binary: str, pattern: Pattern[str]) -> Optional[str]:
+        """
+        Returns the first group of ``pattern`` in the output of
+        ``binary --version``, or ``None`` if it does not match.
+        """
+        match = pattern.search(await self.output(binary))
+        return None if match is None else match.group(1)
+
+    def clear(self):
+        self._entries.clear()
+        if self.path is not None and os.path.exists(self.path):
+            os.remove(self.path)
+
+    def _load(self) -> Dict[str, str]:
+        if self.path is None:
+            return {}
+        try:
+            with open(self.path, encoding="utf-8") as fobj:
+                data = json.load(fobj)
+        except (OSError, ValueError):
+            return {}
+        return data if isinstance(data, dict) else {}
+
+    def _store(self, key: str, output: str):
+        if self.path is None:
+            return
+        # merge with entries other processes stored in the meantime
+        data = self._load()
+        data[key] = output
+        directory = os.path.dirname(os.path.abspath(self.path))
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, temp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as fobj:
+                json.dump(data, fobj)
+            os.replace(temp, self.path)
+        except OSError as exc:
+            log.warning("version-cache-store", path=self.path, error=str(exc))
+
+
+default_cache = VersionCache()
@@ -0,0 +1,256 @@
+"""
+Waiting for conditions on the page inside the browser, so a wait takes a
+single round trip per slice of time rather than polling the webdriver.
+"""
+import asyncio
+from typing import TYPE_CHECKING, Any, Dict, Optional
+
+import attr
+
+from arsenic.connection import unwrap
+from arsenic.constants import SelectorType
+from arsenic.errors import (
+    ERROR_CLASSES,
+    ArsenicTimeout,
+    JavascriptError,
+    NoSuchElement,
+    ScriptTimeout,
+    UnknownCommand,
+    UnsupportedOperation,
+)
+
+if TYPE_CHECKING:
+    from arsenic.session import Session
+
+WAIT_SCRIPT = """
+var spec = arguments[0], slice = arguments[1];
+var done = arguments[arguments.length - 1];
+var finished = false, observer = null, frame = null, timer = null;
+
+function find() {
+    if (spec.using === "xpath") {
+        return document.evaluate(
+            spec.value, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null
+        ).singleNodeValue;
+    }
+    return document.querySelector(spec.value);
+}
+
+function visible(element) {
+    var style = window.getComputedStyle(element);
+    return element.getClientRects().length > 0
+        && style.visibility !== "hidden" && style.display !== "none";
+}
+
+function check() {
+    var element = find();
+    if (spec.kind === "absent") return element ? null : {element: null};
+    if (!element) return null;
+    if (spec.kind === "visible" && !visible(element)) return null;
+    if (spec.kind === "text" && element.innerText.indexOf(spec.text) === -1) {
+        return null;
+    }
+    if (spec.kind === "attribute"
+            && element.getAttribute(spec.name) !== spec.expected) {
+        return null;
+    }
+    return {element: element};
+}
+
+function finish(result) {
+    if (finished) return;
+    finished = true;
+    if (observer !== null) observer.disconnect();
+    if (frame !== null) window.cancelAnimationFrame(frame);
+    window.clearTimeout(timer);
+    done(result);
+}
+
+function poll() {
+    var found = check();
+    if (found) finish({satisfied: true, element: found.element});
+    return found;
+}
+
+function tick() {
+    frame = poll() ? null : window.requestAnimationFrame(tick);
+}
+
+if (!poll()) {
+    timer = window.setTimeout(function () { finish({satisfied: false}); }, slice);
+    observer = new MutationObserver(poll);
+    observer.observe(document, {
+        childList: true, subtree: true, attributes: true, characterData: true
+    });
+    // visibility can change through style sheets, which no mutation reports
+    if (spec.kind === "visible") frame = window.requestAnimationFrame(tick);
+}
+"""
+
+# selector types the wait script can evaluate
+BROWSER_SELECTORS = {
+    SelectorType.css_selector: "css",
+    SelectorType.tag_name: "css",
+    SelectorType.xpath: "xpath",
+}
+
+# errors indicating the webdriver cannot run the wait script at all
+UNAVAILABLE_ERRORS = (UnknownCommand, UnsupportedOperation)
+# errors of a single run of the wait script, which can be transient
+SCRIPT_ERRORS = ERROR_CLASSES + (JavascriptError,)
+
+MIN_SLICE = 0.1
+# longest slice if the session has a command scheduler, so other commands
+# can be sent between two slices
+SCHEDULED_SLICE = 0.5
+
+
+class Condition:
+    """
+    A condition on the first element matching a selector, which can be
+    checked inside the browser or by polling the webdriver.
+    """
+
+    kind: str
+    selector: str
+    selector_type: SelectorType
+
+    def spec(self) -> Dict[str, Any]:
+        return {
+            "kind": self.kind,
+            "using": BROWSER_SELECTORS[self.selector_type],
+            "value": self.selector,
+        }
+
+    async def check(self, session: "Session") -> Any:
+        """
+        Returns a truthy value if the condition holds, using regular commands.
+        """
+        try:
+            element = await session.get_element(self.selector, self.selector_type)
+        except NoSuchElement:
+            return None
+        if await self.check_element(element):
+            return element
+        return None
+
+    async def check_element(self, element) -> bool:
+        return True
+
+
+@attr.s
+class Present(Condition):
+    selector: str = attr.ib()
+    selector_type: SelectorType = attr.ib(default=SelectorType.css_selector)
+    kind = "present"
+
+
+@attr.s
+class Absent(Condition):
+    selector: str = attr.ib()
+    selector_type: SelectorType = attr.ib(default=SelectorType.css_selector)
+    kind = "absent"
+
+    async def check(self, session: "Session") -> Any:
+        try:
+            await session._find(
+                session, None, self.selector, self.selector_type, False, False
+            )
+        except NoSuchElement:
+            return True
+        return False
+
+
+@attr.s
+class Visible(Condition):
+    selector: str = attr.ib()
+    selector_type: SelectorType = attr.ib(default=SelectorType.css_selector)
+    kind = "visible"
+
+    async def check_element(self, element) -> bool:
+        return await element.is_displayed()
+
+
+@attr.s
+class Text(Condition):
+    selector: str = attr.ib()
+    text: str = attr.ib()
+    selector_type: SelectorType = attr.ib(default=SelectorType.css_selector)
+    kind = "text"
+
+    def spec(self) -> Dict[str, Any]:
+        return {**super().spec(), "text": self.text}
+
+    async def check_element(self, element) -> bool:
+        return self.text in await element.get_text()
+
+
+@attr.s
+class Attribute(Condition):
+    selector: str = attr.ib()
+    name: str = attr.ib()
+    value: Optional[str] = attr.ib()
+    selector_type: SelectorType = attr.ib(default=SelectorType.css_selector)
+    kind = "attribute"
+
+    def spec(self) -> Dict[str, Any]:
+        return {**super().spec(), "name": self.name, "expected": self.value}
+
+    async def check_element(self, element) -> bool:
+        return await element.get_attribute(self.name) == self.value
+
+
+async def wait_for(session: "Session", timeout: float, condition: Condition) -> Any:
+    """
+    Waits up to ``timeout`` seconds for ``condition`` to hold and returns the
+    matching element, or ``True`` for :py:class:`Absent`.
+
+    If ``session.browser_waits`` is set, the condition is evaluated inside
+    the browser, which answers as soon as it holds. Every round trip lasts at
+    most ``session.wait_slice`` seconds, so it stays within the script
+    timeout of the session, and at most ``SCHEDULED_SLICE`` seconds if the
+    session has a command scheduler. Otherwise, and if the script fails or
+    the selector type is not supported by it, the condition is polled using
+    regular commands.
+    """
+
+    async def poll(left: float) -> Any:
+        return await session.wait(left, lambda: condition.check(session))
+
+    if not session.browser_waits or condition.selector_type not in BROWSER_SELECTORS:
+        return await poll(timeout)
+    loop = asyncio.get_event_loop()
+    deadline = loop.time() + timeout
+    spec = condition.spec()
+    max_slice = session.wait_slice
+    if session.connection.scheduler is not None:
+        max_slice = min(max_slice, SCHEDULED_SLICE)
+    while True:
+        left = deadline - loop.time()
+        if left <= 0:
+            raise ArsenicTimeout()
+        duration = min(left, max_slice)
+        try:
+            result = await session.execute_async_script(
+                WAIT_SCRIPT, spec, int(duration * 1000)
+            )
+        except ScriptTimeout:
+            # the script timeout of the session is shorter than the slice
+            max_slice /= 2
+            if max_slice < MIN_SLICE:
+                return await poll(left)
+            continue
+        except UNAVAILABLE_ERRORS:
+            session.browser_waits = False
+            return await poll(left)
+        except SCRIPT_ERRORS:
+            # the page may have unloaded while waiting, poll for the rest
+            return await poll(left)
+        if not isinstance(result, dict) or "satisfied" not in result:
+            session.browser_waits = False
+            return await poll(left)
+        if result["satisfied"]:
+            element_id = unwrap(result.get("element", None))
+            if element_id is None:
+                return True
+            return session.create_element(element_id)
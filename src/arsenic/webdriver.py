@@ -1,23 +1,38 @@
 import asyncio
-from typing import Awaitable, Callable, List, Any, Union, Type
-
-import time
+from typing import TYPE_CHECKING, Awaitable, Callable, List, Any, Optional, Union, Type
 
 from arsenic.browsers import Browser
 from arsenic.connection import Connection
 from arsenic.errors import ArsenicError, ArsenicTimeout, SessionStartError
+from arsenic.polling import PollStrategy, WaitStats, default_strategy
+from arsenic.scheduler import CommandScheduler
 from arsenic.session import Session
+from arsenic.timeouts import CommandTimeouts
+
+if TYPE_CHECKING:
+    from arsenic.services import StartupTimings
 
 
 class SessionContext:
-    def __init__(self, driver: "WebDriver", browser: Browser, bind: str):
+    def __init__(
+        self,
+        driver: "WebDriver",
+        browser: Browser,
+        bind: str,
+        timeouts: Optional[CommandTimeouts] = None,
+        scheduler: Optional[CommandScheduler] = None,
+    ):
         self.driver = driver
         self.browser = browser
         self.bind = bind
+        self.timeouts = timeouts
+        self.scheduler = scheduler
         self.session: Session = None
 
     async def __aenter__(self) -> Session:
-        self.session = await self.driver.new_session(self.browser, self.bind)
+        self.session = await self.driver.new_session(
+            self.browser, self.bind, timeouts=self.timeouts, scheduler=self.scheduler
+        )
         return self.session
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
@@ -32,15 +47,38 @@ class WebDriver:
     def __init__(self, connection: Connection, closers: TClosers):
         self.connection = connection
         self.closers = closers
+        self.poll: PollStrategy = default_strategy
+        self.wait_stats = WaitStats()
+        self.startup: Optional["StartupTimings"] = None
 
-    def session(self, browser: Browser, bind="") -> SessionContext:
-        return SessionContext(self, browser, bind)
+    def session(
+        self,
+        browser: Browser,
+        bind="",
+        *,
+        timeouts: Optional[CommandTimeouts] = None,
+        scheduler: Optional[CommandScheduler] = None,
+    ) -> SessionContext:
+        return SessionContext(self, browser, bind, timeouts, scheduler)
 
-    async def new_session(self, browser: Browser, bind="") -> Session:
+    async def new_session(
+        self,
+        browser: Browser,
+        bind="",
+        *,
+        timeouts: Optional[CommandTimeouts] = None,
+        scheduler: Optional[CommandScheduler] = None,
+    ) -> Session:
+        timeout = None
+        if timeouts is not None:
+            # the session is started through the connection of the driver,
+            # which does not know the timeouts of the session
+            timeout = timeouts.for_command("POST", "/session")
         status, response = await self.connection.request(
             url="/session",
             method="POST",
             data={"capabilities": {"alwaysMatch": browser.capabilities}},
+            timeout=timeout,
         )
         original_response = response
         if "sessionId" not in response:
@@ -56,8 +94,13 @@ class WebDriver:
                 err_resp["error"], err_resp.get("message", ""), original_response
             )
         session_id = response["sessionId"]
+        connection = self.connection.prefixed(f"/session/{session_id}")
+        if timeouts is not None:
+            connection.timeouts = timeouts
+        if scheduler is not None:
+            connection.scheduler = scheduler
         return browser.session_class(
-            connection=self.connection.prefixed(f"/session/{session_id}"),
+            connection=connection,
             bind=bind,
             wait=self.wait,
             driver=self,
@@ -73,17 +116,27 @@ class WebDriver:
         timeout: Union[float, int],
         func: Callable[[], Awaitable[Any]],
         *exceptions: Exception,
+        poll: Optional[PollStrategy] = None,
     ) -> Any:
-        deadline = time.time() + timeout
+        loop = asyncio.get_event_loop()
+        start = loop.time()
+        deadline = start + timeout
+        intervals = (self.poll if poll is None else poll).intervals()
+        attempts = 0
         err = None
-        while deadline > time.time():
+        while True:
+            attempts += 1
             try:
                 result = await func()
                 if result:
+                    self.wait_stats.record(attempts, loop.time() - start, False)
                     return result
-                else:
-                    await asyncio.sleep(0.2)
             except exceptions as exc:
                 err = exc
-                await asyncio.sleep(0.2)
+            left = deadline - loop.time()
+            if left <= 0:
+                break
+            # the last sleep ends at the deadline, for one final attempt
+            await asyncio.sleep(min(next(intervals), left))
+        self.wait_stats.record(attempts, loop.time() - start, True)
         raise ArsenicTimeout() from err
@@ -9,6 +9,7 @@ from asyncio_extras import async_contextmanager
 from aiohttp.web import TCPSite, AppRunner
 
 from arsenic import Session, browsers, get_session, services
+from arsenic.fakedriver import FakeDriver, FakeDriverService
 from tests.utils import find_binary
 from .app import build_app
 from .utils import null_context
@@ -132,3 +133,52 @@ async def root_url(event_loop):
         yield f"http://{host}:{port}"
     finally:
         await runner.cleanup()
+
+
+@pytest.fixture
+def fake_driver_options() -> Dict[str, Any]:
+    """
+    Keyword arguments of the fake driver. Override this fixture in a module,
+    or parametrize it, to configure the fake driver of its tests.
+    """
+    return {}
+
+
+@pytest.fixture
+def fake_service_options() -> Dict[str, Any]:
+    """
+    Keyword arguments of the service of the fake driver, used by
+    ``fake_webdriver`` and ``fake_session``. Override or parametrize it like
+    ``fake_driver_options``.
+    """
+    return {}
+
+
+@pytest.fixture
+async def fake_driver(fake_driver_options) -> FakeDriver:
+    return FakeDriver(**fake_driver_options)
+
+
+@pytest.fixture
+async def fake_driver_server(fake_driver) -> FakeDriver:
+    """
+    The fake driver, serving requests without a service.
+    """
+    async with fake_driver:
+        yield fake_driver
+
+
+@pytest.fixture
+async def fake_webdriver(fake_driver, fake_service_options):
+    webdriver = await FakeDriverService(fake_driver, **fake_service_options).start()
+    try:
+        yield webdriver
+    finally:
+        await webdriver.close()
+
+
+@pytest.fixture
+async def fake_session(fake_driver, fake_service_options) -> Session:
+    service = FakeDriverService(fake_driver, **fake_service_options)
+    async with get_session(service, browsers.Chrome(), "http://fake") as session:
+        yield session
@@ -0,0 +1,89 @@
+import asyncio
+
+import pytest
+
+from arsenic.errors import NoSuchElement
+from arsenic.utils import Rect
+
+from .utils import disabled_handler, fetch_handler
+
+pytestmark = [pytest.mark.asyncio]
+
+
+async def read_everything(session, **kwargs):
+    elements = await session.get_elements("li")
+    async with session.batch(**kwargs) as batch:
+        url = batch.add(session.get_url)
+        cookies = batch.add(session.get_all_cookies)
+        handle = batch.add(session.get_window_handle)
+        texts = [batch.add(element.get_text) for element in elements]
+        ids = [batch.add(element.get_attribute, "id") for element in elements]
+        rect = batch.add(elements[0].get_rect)
+        value = batch.add(elements[1].get_property, name="value")
+    assert url.result() == "about:blank"
+    assert cookies.result() == []
+    assert handle.result() == "window-1"
+    assert [text.result() for text in texts] == [
+        f"text of {element.id}" for element in elements
+    ]
+    assert [id.result() for id in ids] == [
+        f"id of {element.id}" for element in elements
+    ]
+    assert rect.result() == Rect(1, 2, 3, 4)
+    assert value.result() == f"value of {elements[1].id}"
+
+
+@pytest.fixture
+def fake_driver_options():
+    return {"script_handler": fetch_handler}
+
+
+async def count_commands(driver, session, **kwargs):
+    count = len(driver.commands) + 1
+    await read_everything(session, **kwargs)
+    return len(driver.commands) - count
+
+
+async def test_batch_coalesces_element_reads(fake_driver, fake_session):
+    assert await count_commands(fake_driver, fake_session, coalesce=True) == 4
+
+
+async def test_batch_without_coalescing(fake_driver, fake_session):
+    # reads are not coalesced by default
+    assert await count_commands(fake_driver, fake_session) == 3 + 3 + 3 + 2
+
+
+async def test_batch_without_scripts(fake_driver, fake_session):
+    fake_driver.script_handler = disabled_handler
+    # the failed script makes the batch fall back to reading one by one
+    count = await count_commands(fake_driver, fake_session, coalesce=True)
+    assert count == 3 + 1 + 3 + 3 + 2
+
+
+async def test_batch_concurrency(fake_driver, fake_session):
+    latency = 0.05
+    fake_driver.latency = latency
+    loop = asyncio.get_event_loop()
+    started = loop.time()
+    async with fake_session.batch(concurrency=10) as batch:
+        futures = [batch.add(fake_session.get_url) for _ in range(10)]
+    elapsed = loop.time() - started
+    fake_driver.latency = 0
+    assert all(future.result() == "about:blank" for future in futures)
+    assert min(fake_driver.server_times[-10:]) >= latency
+    # sent one after the other, the batch would take ten times the latency
+    assert elapsed < 4 * latency
+
+
+async def test_batch_errors(fake_session):
+    with pytest.raises(NoSuchElement):
+        async with fake_session.batch() as batch:
+            url = batch.add(fake_session.get_url)
+            missing = batch.add(fake_session.get_element, "#missing")
+    assert url.result() == "about:blank"
+    assert isinstance(missing.exception(), NoSuchElement)
+    with pytest.raises(KeyError):
+        async with fake_session.batch() as batch:
+            url = batch.add(fake_session.get_url)
+            raise KeyError()
+    assert url.cancelled()
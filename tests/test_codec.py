@@ -0,0 +1,43 @@
+import pytest
+
+from arsenic.codec import JSONCodec, MsgspecCodec, OrjsonCodec, fastest_codec
+
+
+def codec_or_skip(codec_class):
+    try:
+        return codec_class()
+    except ImportError:
+        raise pytest.skip(f"{codec_class.__name__} not available")
+
+
+@pytest.fixture(params=[JSONCodec, OrjsonCodec, MsgspecCodec])
+def codec(request):
+    return codec_or_skip(request.param)
+
+
+def test_roundtrip(codec):
+    data = {"value": [{"a": 1, "b": "ü"}, None, True, 1.5]}
+    body = codec.encode(data)
+    assert isinstance(body, bytes)
+    assert codec.decode(body) == data
+
+
+def test_invalid_body(codec):
+    with pytest.raises(ValueError):
+        codec.decode(b"<html>not json</html>")
+
+
+def test_fastest_codec():
+    assert fastest_codec() is not None
+
+
+@pytest.fixture
+def fake_service_options(codec):
+    return {"codec": codec}
+
+
+@pytest.mark.asyncio
+async def test_service_codec(codec, fake_session):
+    assert fake_session.connection.codec is codec
+    await fake_session.get("/")
+    assert await fake_session.get_url() == "http://fake/"
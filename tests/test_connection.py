@@ -0,0 +1,99 @@
+import asyncio
+import base64
+import copy
+import os
+import pickle
+import tempfile
+from io import BytesIO
+from zipfile import ZipFile
+
+import pytest
+
+from arsenic import connection
+from arsenic.connection import LazyScreen, RemoteConnection, ensure_task
+from arsenic.errors import NoSuchElement
+
+pytestmark = [pytest.mark.asyncio]
+
+
+async def test_ensure_task_reuses_current_task():
+    @ensure_task
+    async def current():
+        return asyncio.current_task()
+
+    assert await current() is asyncio.current_task()
+
+
+async def test_shielded_request_survives_cancellation(fake_driver, fake_session):
+    fake_session.connection.shielded = True
+    fake_driver.latency = 0.1
+    task = asyncio.ensure_future(fake_session.get("/page"))
+    await asyncio.sleep(0.02)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    await asyncio.sleep(0.2)
+    fake_driver.latency = 0
+    assert await fake_session.get_url() == "http://fake/page"
+
+
+async def test_error_screens_are_decoded_lazily(fake_driver, fake_session):
+    fake_driver.error_screen_size = 1000
+    with pytest.raises(NoSuchElement) as exc_info:
+        await fake_session.get_element("#missing")
+    screen = exc_info.value.screen
+    assert isinstance(screen, LazyScreen)
+    assert isinstance(screen, BytesIO)
+    assert repr(screen) == "<LazyScreen encoded=1340>"
+    assert screen.read() == b"\x89PNG" + b"\0" * 1000
+    fake_session.connection.drop_error_screens = True
+    with pytest.raises(NoSuchElement) as exc_info:
+        await fake_session.get_element("#missing")
+    assert exc_info.value.screen is None
+
+
+async def test_lazy_screen_copy_and_pickle():
+    png = b"\x89PNG" + b"\0" * 100
+    screen = LazyScreen(base64.b64encode(png).decode("ascii"))
+    copied = copy.copy(screen)
+    restored = pickle.loads(pickle.dumps(screen))
+    assert screen.encoded is not None
+    assert copied.getvalue() == png
+    assert restored.getvalue() == png
+    assert screen.read() == png
+    assert repr(screen) == "<LazyScreen decoded=104>"
+    restored = pickle.loads(pickle.dumps(screen))
+    assert restored.getvalue() == png
+    assert copy.copy(screen).getvalue() == png
+
+
+@pytest.mark.parametrize("size", [0, 1, 2, 3, 1_000_000])
+@pytest.mark.parametrize(
+    "fake_service_options", [{"connection_class": RemoteConnection}]
+)
+async def test_remote_upload_file(
+    fake_driver, fake_session, tmp_path, monkeypatch, size
+):
+    path = tmp_path / "fixture.bin"
+    content = os.urandom(size)
+    path.write_bytes(content)
+    # keep the temporary archives where the test can see them
+    archives = tmp_path / "archives"
+    archives.mkdir()
+    monkeypatch.setattr(tempfile, "tempdir", str(archives))
+    created = []
+    original = connection.zip_file
+
+    def zip_file(path):
+        archive = original(path)
+        created.append(archive)
+        return archive
+
+    monkeypatch.setattr(connection, "zip_file", zip_file)
+    fake_session.connection.upload_chunk_size = 3 * 1024
+    remote_path = await fake_session.connection.upload_file(path)
+    assert str(remote_path).startswith("/tmp/fake-upload-")
+    with ZipFile(BytesIO(fake_driver.uploads[0])) as zf:
+        assert zf.read("fixture.bin") == content
+    assert [os.path.dirname(archive) for archive in created] == [str(archives)]
+    assert list(archives.iterdir()) == []
@@ -0,0 +1,98 @@
+import asyncio
+import os
+import sys
+from typing import List
+
+import attr
+import pytest
+
+from arsenic.daemon import SharedDriver, pid_alive, read_state
+from arsenic.services import Geckodriver, Service
+
+from .test_services import DRIVER_SCRIPT
+
+pytestmark = [
+    pytest.mark.asyncio,
+    pytest.mark.skipif(sys.platform == "win32", reason="Not supported on windows"),
+]
+
+
+@attr.s
+class ScriptService(Service):
+    script: str = attr.ib()
+
+    def command(self, port: int) -> List[str]:
+        return [sys.executable, self.script, str(port)]
+
+    async def start(self):
+        raise NotImplementedError()
+
+
+@pytest.fixture
+def shared(tmpdir):
+    script = tmpdir.join("driver.py")
+    script.write(DRIVER_SCRIPT)
+
+    def factory(**kwargs):
+        return SharedDriver(
+            ScriptService(str(script)), name="test", runtime_dir=str(tmpdir), **kwargs
+        )
+
+    return factory
+
+
+async def wait_stopped(shared: SharedDriver, pid: int):
+    for _ in range(100):
+        if read_state(shared.state_path) is None and not pid_alive(pid):
+            return
+        await asyncio.sleep(0.1)
+    raise AssertionError("daemon did not stop")
+
+
+async def test_last_user_stops(shared):
+    first = await shared(idle_timeout=0).start()
+    second = await shared(idle_timeout=0).start()
+    assert first.connection.prefix == second.connection.prefix
+    state = read_state(shared().state_path)
+    assert state["users"] == [os.getpid(), os.getpid()]
+    status, data = await second.connection.request(url="/status", method="GET")
+    assert data == {"value": {"ready": True}}
+    await first.close()
+    assert read_state(shared().state_path)["users"] == [os.getpid()]
+    await second.close()
+    await wait_stopped(shared(), state["pid"])
+
+
+async def test_reuse_while_idle(shared):
+    driver = await shared().start()
+    state = read_state(shared().state_path)
+    await driver.close()
+    await asyncio.sleep(0.6)
+    driver = await shared().start()
+    assert read_state(shared().state_path)["pid"] == state["pid"]
+    await driver.close()
+    await shared().stop()
+    await wait_stopped(shared(), state["pid"])
+
+
+async def test_key_ignores_directory(tmpdir, monkeypatch):
+    binary = tmpdir.mkdir("bin").join("driver")
+    binary.write("#!/bin/sh\n")
+    binary.chmod(0o755)
+    monkeypatch.setenv("PATH", str(binary.dirpath()))
+    keys = set()
+    for directory in [tmpdir, binary.dirpath()]:
+        monkeypatch.chdir(directory)
+        keys.add(SharedDriver(Geckodriver(binary="driver")).key)
+    keys.add(SharedDriver(Geckodriver(binary=str(binary))).key)
+    assert len(keys) == 1
+
+
+async def test_version_check(tmpdir):
+    binary = tmpdir.join("geckodriver")
+    binary.write(f'#!{sys.executable}\nprint("geckodriver 0.1")')
+    binary.chmod(0o755)
+    driver = SharedDriver(Geckodriver(binary=str(binary)), runtime_dir=str(tmpdir))
+    with pytest.raises(ValueError):
+        await driver.start()
+    assert read_state(driver.state_path) is None
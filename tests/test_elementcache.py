@@ -0,0 +1,100 @@
+import pytest
+
+from arsenic.elementcache import ElementCache
+from arsenic.errors import ArsenicTimeout, StaleElementReference
+
+pytestmark = [pytest.mark.asyncio]
+
+
+@pytest.fixture
+async def fake_session(fake_session):
+    fake_session.element_cache = ElementCache()
+    return fake_session
+
+
+def lookups(driver):
+    return sum(
+        command.endswith(("/element", "/elements")) for command in driver.commands
+    )
+
+
+async def test_hits_and_misses(fake_driver, fake_session):
+    cache = fake_session.element_cache
+    first = await fake_session.get_element("h1")
+    assert await fake_session.get_element("h1") is first
+    elements = await fake_session.get_elements("li")
+    assert await fake_session.get_elements("li") == elements
+    child = await first.get_element("span")
+    assert await first.get_element("span") is child
+    assert await fake_session.get_element("span") is not child
+    assert lookups(fake_driver) == 4
+    assert (cache.stats.hits, cache.stats.misses) == (3, 4)
+
+
+async def test_invalidation(fake_driver, fake_session):
+    cache = fake_session.element_cache
+    element = await fake_session.get_element("h1")
+    await element.get_text()
+    await fake_session.get_url()
+    assert len(cache) == 1
+    await element.click()
+    assert len(cache) == 0
+    await fake_session.get_element("h1")
+    await fake_session.execute_script("return 1")
+    assert len(cache) == 0
+    await fake_session.get_element("h1")
+    await fake_session.get("/")
+    assert len(cache) == 0
+    assert cache.stats.invalidations == 3
+
+
+async def test_lookup_during_command_not_cached(fake_session):
+    cache = fake_session.element_cache
+    generation = cache.generation
+    cache.invalidate()
+    cache.put("key", "value", generation)
+    assert len(cache) == 0
+
+
+async def test_relocation(fake_driver, fake_session):
+    cache = fake_session.element_cache
+    element = await fake_session.get_element("h1")
+    child = await element.get_element("span")
+    old_id = child.id
+    for state in fake_driver.sessions.values():
+        state.invalidate_elements()
+    assert await child.get_text() == f"text of {child.id}"
+    assert child.id != old_id
+    assert cache.stats.relocations == 2
+    assert await fake_session.get_element("h1") is element
+
+
+async def test_list_relocation(fake_driver, fake_session):
+    cache = fake_session.element_cache
+    elements = await fake_session.get_elements("li")
+    old_ids = [element.id for element in elements]
+    for state in fake_driver.sessions.values():
+        state.invalidate_elements()
+    assert await elements[1].get_text() == f"text of {elements[1].id}"
+    assert elements[1].id not in old_ids
+    assert cache.stats.relocations == 1
+    fake_driver.elements_count = 1
+    for state in fake_driver.sessions.values():
+        state.invalidate_elements()
+    with pytest.raises(StaleElementReference):
+        await elements[1].get_text()
+
+
+async def test_no_relocation_without_cache(fake_driver, fake_session):
+    element = await fake_session.get_element("h1")
+    fake_session.element_cache = None
+    await fake_session.get("/")
+    with pytest.raises(StaleElementReference):
+        await element.get_text()
+
+
+async def test_wait_for_element_gone_bypasses_cache(fake_session):
+    await fake_session.get_element("h1")
+    with pytest.raises(ArsenicTimeout):
+        await fake_session.wait_for_element_gone(0.3, "h1")
+    assert fake_session.element_cache.stats.hits == 0
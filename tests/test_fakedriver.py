@@ -0,0 +1,40 @@
+import pytest
+
+from arsenic.errors import NoSuchElement
+
+pytestmark = [pytest.mark.asyncio]
+
+
+async def test_navigation(fake_session):
+    await fake_session.get("/page")
+    assert await fake_session.get_url() == "http://fake/page"
+
+
+async def test_elements(fake_session):
+    element = await fake_session.get_element("h1")
+    assert await element.get_text() == f"text of {element.id}"
+    assert await element.get_attribute("id") == f"id of {element.id}"
+    assert await element.is_displayed()
+    elements = await fake_session.get_elements("li")
+    assert len(elements) == 3
+    with pytest.raises(NoSuchElement):
+        await fake_session.get_element("#missing")
+
+
+async def test_payload_sizes(fake_driver, fake_session):
+    fake_driver.page_source_size = 10_000
+    fake_driver.screenshot_size = 5_000
+    assert len(await fake_session.get_page_source()) == 10_013
+    assert len((await fake_session.get_screenshot()).getvalue()) == 5_004
+
+
+async def test_script_handler(fake_driver, fake_session):
+    fake_driver.script_handler = lambda script, args: [script, args]
+    assert await fake_session.execute_script("return 1", 2) == ["return 1", [2]]
+
+
+async def test_server_times(fake_driver, fake_session):
+    fake_driver.latency = 0.01
+    await fake_session.get_url()
+    assert fake_driver.server_times[-1] >= 0.01
+    assert fake_driver.commands[-1].startswith("GET /session/")
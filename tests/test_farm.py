@@ -0,0 +1,118 @@
+import asyncio
+from typing import List
+
+import attr
+import pytest
+
+from arsenic import browsers
+from arsenic.errors import ArsenicError
+from arsenic.farm import DriverFarm
+from arsenic.fakedriver import FakeDriver, FakeDriverService
+from arsenic.services import Service
+
+pytestmark = [pytest.mark.asyncio]
+
+
+@attr.s
+class FakeFarmService(Service):
+    drivers: List[FakeDriver] = attr.ib(default=attr.Factory(list))
+
+    async def start(self):
+        driver = FakeDriver()
+        self.drivers.append(driver)
+        return await FakeDriverService(driver).start()
+
+
+async def test_placement():
+    service = FakeFarmService()
+    async with DriverFarm(service, 3, check_interval=None) as farm:
+        sessions = [await farm.new_session(browsers.Firefox()) for _ in range(5)]
+        assert farm.load() == [2, 2, 1]
+        assert [len(driver.sessions) for driver in service.drivers] == [2, 2, 1]
+        await farm.close_session(sessions[0])
+        await farm.close_session(sessions[3])
+        assert farm.load() == [0, 2, 1]
+        async with farm.session(browsers.Firefox()) as session:
+            assert await session.get_url() == "about:blank"
+            assert farm.load() == [1, 2, 1]
+        assert farm.stats.sessions == 6
+        assert farm.stats.max_sessions == 5
+
+
+async def test_max_sessions():
+    async with DriverFarm(
+        FakeFarmService(), 2, max_sessions=1, check_interval=None
+    ) as farm:
+        first = await farm.new_session(browsers.Firefox())
+        await farm.new_session(browsers.Firefox())
+        third = asyncio.ensure_future(farm.new_session(browsers.Firefox()))
+        await asyncio.sleep(0.01)
+        assert not third.done()
+        await farm.close_session(first)
+        await third
+        assert farm.load() == [1, 1]
+        assert farm.stats.waits == 1
+
+
+async def test_restart():
+    service = FakeFarmService()
+    async with DriverFarm(service, 2, check_interval=0.01) as farm:
+        session = await farm.new_session(browsers.Firefox())
+        await service.drivers[0].stop()
+        for _ in range(100):
+            if farm.stats.restarts:
+                break
+            await asyncio.sleep(0.01)
+        assert farm.stats.restarts == 1
+        assert farm.stats.failed_checks == 1
+        assert farm.stats.lost_sessions == 1
+        assert farm.load() == [0, 0]
+        await farm.close_session(session)
+        assert farm.load() == [0, 0]
+        await farm.new_session(browsers.Firefox())
+        await farm.new_session(browsers.Firefox())
+        assert len(service.drivers[2].sessions) == 1
+
+
+async def test_restart_on_new_session():
+    service = FakeFarmService()
+    async with DriverFarm(service, 2, check_interval=None) as farm:
+        await service.drivers[0].stop()
+        await farm.new_session(browsers.Firefox())
+        assert farm.stats.restarts == 1
+        assert farm.load() == [1, 0]
+        assert len(service.drivers[2].sessions) == 1
+
+
+@attr.s
+class FailingFarmService(FakeFarmService):
+    failing: bool = attr.ib(default=False)
+
+    async def start(self):
+        if self.failing:
+            raise ArsenicError("Cannot start driver")
+        return await super().start()
+
+
+async def test_failed_restart_tries_next_driver():
+    service = FailingFarmService()
+    async with DriverFarm(service, 2, check_interval=None) as farm:
+        service.failing = True
+        await service.drivers[0].stop()
+        await farm.new_session(browsers.Firefox())
+        assert farm.stats.failed_restarts == 1
+        assert farm.load() == [0, 1]
+        await service.drivers[1].stop()
+        with pytest.raises(ArsenicError):
+            await farm.new_session(browsers.Firefox())
+        assert farm.stats.failed_restarts == 2
+
+
+async def test_slow_driver_is_kept():
+    service = FakeFarmService()
+    async with DriverFarm(service, 2, check_interval=None, check_timeout=0.05) as farm:
+        service.drivers[0].latency = 0.2
+        await farm.check()
+        assert farm.stats.slow_checks == 1
+        assert farm.stats.failed_checks == 0
+        assert farm.stats.restarts == 0
@@ -0,0 +1,118 @@
+import pytest
+
+from arsenic.session import FETCH_SCRIPT_MAX_FAILURES
+from arsenic.utils import Rect
+
+from .utils import disabled_handler, fetch_handler, flaky_handler, unsupported_handler
+
+pytestmark = [pytest.mark.asyncio]
+
+
+@pytest.fixture
+def fake_driver_options():
+    return {"script_handler": fetch_handler}
+
+
+async def fetch_all(driver, session):
+    elements = await session.get_elements("li")
+    count = len(driver.commands)
+    data = await session.fetch(
+        elements,
+        text=True,
+        attrs=["id", "class"],
+        props=["value"],
+        css=["color"],
+        rect=True,
+        displayed=True,
+        enabled=True,
+    )
+    commands = driver.commands[count:]
+    assert [item.element for item in data] == elements
+    for item in data:
+        element_id = item.element.id
+        assert item.text == f"text of {element_id}"
+        assert item.attrs == {
+            "id": f"id of {element_id}",
+            "class": f"class of {element_id}",
+        }
+        assert item.props == {"value": f"value of {element_id}"}
+        assert item.css == {"color": f"color of {element_id}"}
+        assert item.rect == Rect(1, 2, 3, 4)
+        assert item.displayed is True
+        assert item.enabled is True
+    assert await session.fetch([], text=True) == []
+    return commands
+
+
+async def test_fetch_with_script(fake_driver, fake_session):
+    commands = await fetch_all(fake_driver, fake_session)
+    assert len(commands) == 1
+    assert fake_session.fetch_script
+
+
+async def test_fetch_without_script(fake_driver, fake_session):
+    fake_driver.elements_count = 5
+    fake_driver.script_handler = disabled_handler
+    commands = await fetch_all(fake_driver, fake_session)
+    assert len(commands) == 1 + 5 * 8
+    # a single failure only falls back for that call
+    assert fake_session.fetch_script
+    assert fake_session.fetch_failures == 1
+
+
+async def test_fetch_unsupported(fake_driver, fake_session):
+    fake_driver.elements_count = 5
+    fake_driver.script_handler = unsupported_handler
+    commands = await fetch_all(fake_driver, fake_session)
+    assert len(commands) == 1 + 5 * 8
+    assert not fake_session.fetch_script
+
+
+async def test_fetch_transient_failure(fake_driver, fake_session):
+    fake_driver.script_handler = flaky_handler(1)
+    element = await fake_session.get_element("h1")
+    first = await fake_session.fetch([element], text=True)
+    count = len(fake_driver.commands)
+    second = await fake_session.fetch([element], text=True)
+    assert first == second
+    assert len(fake_driver.commands) == count + 1
+    assert fake_session.fetch_script
+    assert fake_session.fetch_failures == 0
+
+
+async def test_fetch_repeated_failures(fake_driver, fake_session):
+    fake_driver.script_handler = flaky_handler(FETCH_SCRIPT_MAX_FAILURES)
+    element = await fake_session.get_element("h1")
+    for _ in range(FETCH_SCRIPT_MAX_FAILURES):
+        assert fake_session.fetch_script
+        await fake_session.fetch([element], text=True)
+    assert not fake_session.fetch_script
+    count = len(fake_driver.commands)
+    await fake_session.fetch([element], text=True)
+    # the script is not tried anymore
+    assert len(fake_driver.commands) == count + 1
+
+
+async def test_fetch_paths_agree(fake_driver, fake_session):
+    fake_driver.elements_count = 3
+    options = dict(
+        text=True,
+        attrs=["id"],
+        props=["value"],
+        css=["color"],
+        rect=True,
+        displayed=True,
+        enabled=True,
+    )
+    elements = await fake_session.get_elements("li")
+    scripted = await fake_session.fetch(elements, **options)
+    fake_session.fetch_script = False
+    assert await fake_session.fetch(elements, **options) == scripted
+
+
+async def test_fetch_partial(fake_session):
+    element = await fake_session.get_element("h1")
+    [data] = await fake_session.fetch([element], attrs=["href"])
+    assert data.attrs == {"href": f"href of {element.id}"}
+    assert data.text is None
+    assert data.rect is None
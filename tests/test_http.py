@@ -0,0 +1,118 @@
+import socket
+
+import pytest
+from aiohttp import TCPConnector
+
+from arsenic import browsers, get_session
+from arsenic.fakedriver import FakeDriver, FakeDriverService
+from arsenic.http import (
+    BasicAuth,
+    HTTPSettings,
+    HTTPStats,
+    SharedSession,
+    pool_usage,
+)
+from arsenic.services import Remote
+
+pytestmark = [pytest.mark.asyncio]
+
+
+@pytest.fixture
+def http_settings():
+    return HTTPSettings(
+        limit=4,
+        socket_options=[(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)],
+        stats=HTTPStats(),
+    )
+
+
+@pytest.fixture
+def fake_service_options(http_settings):
+    return {"http": http_settings}
+
+
+@pytest.fixture
+def without_socket_factory(monkeypatch):
+    monkeypatch.setattr("arsenic.http.SOCKET_FACTORY", False)
+
+
+async def test_stats_and_usage(http_settings, fake_session):
+    for _ in range(5):
+        await fake_session.get_url()
+    usage = pool_usage(fake_session.connection.session)
+    assert usage.limit == 4
+    assert usage.acquired == 0
+    assert usage.idle == 1
+    assert http_settings.stats.requests == 6
+    assert http_settings.stats.connections_created == 1
+    assert http_settings.stats.connections_reused == 5
+
+
+@pytest.mark.usefixtures("without_socket_factory")
+async def test_socket_options_unsupported(http_settings, fake_session):
+    await fake_session.get_url()
+    assert http_settings.stats.requests == 2
+
+
+async def test_no_stats_by_default():
+    session = HTTPSettings().create_session()
+    try:
+        assert session.trace_configs == []
+    finally:
+        await session.close()
+
+
+async def test_usage_without_private_pool():
+    class Connector:
+        limit = 4
+        limit_per_host = 0
+
+    class Session:
+        connector = Connector()
+
+    usage = pool_usage(Session())
+    assert usage.limit == 4
+    assert usage.acquired == 0
+    assert usage.idle == 0
+
+
+async def test_shared_connector_outlives_driver(fake_driver):
+    connector = TCPConnector()
+    settings = HTTPSettings(connector=connector)
+    try:
+        # one driver after the other, both using the connector
+        for _ in range(2):
+            service = FakeDriverService(fake_driver, http=settings)
+            async with get_session(service, browsers.Chrome()) as session:
+                await session.get_url()
+            assert not connector.closed
+    finally:
+        await connector.close()
+
+
+async def test_shared_session():
+    async with SharedSession() as http:
+        drivers = [
+            await FakeDriverService(FakeDriver(), http=http).start() for _ in range(3)
+        ]
+        sessions = {driver.connection.session for driver in drivers}
+        assert len(sessions) == 1
+        assert http.references == 4
+        await drivers[0].close()
+        async with drivers[1].session(browsers.Chrome()) as session:
+            await session.get_url()
+        for driver in drivers[1:]:
+            await driver.close()
+        assert http.references == 1
+        assert not http.session.closed
+    assert http.references == 0
+    assert sessions.pop().closed
+
+
+async def test_remote_auth_with_shared_session(fake_driver_server):
+    async with SharedSession() as http:
+        service = Remote(fake_driver_server.url, auth="user:pass", http=http)
+        async with get_session(service, browsers.Chrome()) as session:
+            assert session.connection.headers == BasicAuth("user", "pass").get_headers()
+            await session.get_url()
+        assert http.session.headers.get("Authorization") is None
@@ -0,0 +1,72 @@
+import asyncio
+from itertools import islice
+
+import pytest
+
+from arsenic.errors import ArsenicTimeout
+from arsenic.polling import Exponential, Fixed, Jittered, WaitStats
+from arsenic.webdriver import WebDriver
+
+
+def test_fixed():
+    assert list(islice(Fixed(0.5).intervals(), 3)) == [0.5, 0.5, 0.5]
+
+
+def test_exponential():
+    intervals = Exponential(initial=0.1, factor=3, maximum=1).intervals()
+    assert list(islice(intervals, 4)) == pytest.approx([0.1, 0.3, 0.9, 1])
+
+
+def test_jittered():
+    intervals = Jittered(Fixed(1), jitter=0.25).intervals()
+    assert all(0.75 <= interval <= 1 for interval in islice(intervals, 100))
+
+
+def test_wait_stats():
+    stats = WaitStats()
+    assert stats.attempts_per_wait == stats.mean_time == 0
+    stats.record(3, 1.5, False)
+    stats.record(5, 0.5, True)
+    assert stats.waits == 2
+    assert stats.timeouts == 1
+    assert stats.attempts_per_wait == 4
+    assert stats.mean_time == 1
+    assert stats.max_time == 1.5
+
+
+@pytest.mark.asyncio
+async def test_wait_clips_last_sleep_to_deadline():
+    driver = WebDriver(None, [])
+    loop = asyncio.get_event_loop()
+    calls = []
+
+    async def never():
+        calls.append(loop.time())
+        return False
+
+    start = loop.time()
+    with pytest.raises(ArsenicTimeout):
+        await driver.wait(0.15, never, poll=Fixed(0.1))
+    elapsed = loop.time() - start
+    assert len(calls) == 3
+    assert calls[-1] - start == pytest.approx(0.15, abs=0.05)
+    assert elapsed < 0.25
+    assert driver.wait_stats.timeouts == 1
+    assert driver.wait_stats.attempts == 3
+
+
+@pytest.mark.asyncio
+async def test_wait_returns_result_and_ignores_exceptions():
+    driver = WebDriver(None, [])
+    driver.poll = Exponential(initial=0.01)
+    results = iter([KeyError(), None, "done"])
+
+    async def check():
+        result = next(results)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    assert await driver.wait(1, check, KeyError) == "done"
+    assert driver.wait_stats.attempts == 3
+    assert driver.wait_stats.timeouts == 0
@@ -0,0 +1,121 @@
+import asyncio
+
+import pytest
+
+from arsenic import browsers
+from arsenic.pool import SessionPool
+
+pytestmark = [pytest.mark.asyncio]
+
+
+async def test_reuse_and_reset(fake_driver, fake_webdriver):
+    async with SessionPool(fake_webdriver, browsers.Firefox(), min_size=2) as pool:
+        assert len(fake_driver.sessions) == 2
+        async with pool.session() as session:
+            await session.get("http://example.com")
+            await session.add_cookie("name", "value")
+            await session.new_window()
+            await session.new_window()
+            first = session
+        state = fake_driver.sessions[first.connection.prefix.rsplit("/", 1)[-1]]
+        assert state.url == "about:blank"
+        assert state.cookies == {}
+        assert state.windows == [state.window]
+        async with pool.session() as session:
+            assert session is first
+        assert pool.stats.created == 2
+        assert pool.stats.reused == 2
+    assert fake_driver.sessions == {}
+
+
+async def test_reset_with_bind(fake_driver, fake_webdriver):
+    pool = SessionPool(fake_webdriver, browsers.Firefox(), bind="http://app")
+    async with pool:
+        async with pool.session() as session:
+            await session.get("/page")
+            state = fake_driver.sessions[session.connection.prefix.rsplit("/", 1)[-1]]
+            assert state.url == "http://app/page"
+            first = session
+        assert state.url == "about:blank"
+        async with pool.session() as session:
+            assert session is first
+        assert pool.stats.reset_failures == 0
+
+
+async def test_grow_and_wait(fake_driver, fake_webdriver):
+    pool = SessionPool(fake_webdriver, browsers.Firefox(), min_size=0, max_size=2)
+    first = await pool.acquire()
+    second = await pool.acquire()
+    assert pool.size == 2
+    third = asyncio.ensure_future(pool.acquire())
+    await asyncio.sleep(0.01)
+    assert not third.done()
+    await pool.release(first)
+    assert await third is first
+    assert pool.stats.waits == 1
+    assert pool.stats.max_size == 2
+    await pool.release(first)
+    await pool.release(second)
+    await pool.close()
+    assert fake_driver.sessions == {}
+
+
+async def test_recycle(fake_webdriver):
+    async with SessionPool(fake_webdriver, browsers.Firefox(), max_uses=2) as pool:
+        for _ in range(3):
+            async with pool.session():
+                pass
+        assert pool.stats.recycled == 1
+        assert pool.stats.created == 2
+        pool.max_age = 0.05
+        await asyncio.sleep(0.1)
+        async with pool.session():
+            pass
+        assert pool.stats.recycled == 2
+
+
+async def test_health_check(fake_driver, fake_webdriver):
+    async with SessionPool(fake_webdriver, browsers.Firefox()) as pool:
+        fake_driver.sessions.clear()
+        async with pool.session() as session:
+            assert await session.get_url() == "about:blank"
+        assert pool.stats.unhealthy == 1
+        assert len(fake_driver.sessions) == 1
+
+
+async def test_shrink(fake_driver, fake_webdriver):
+    async with SessionPool(fake_webdriver, browsers.Firefox(), idle_timeout=0) as pool:
+        first = await pool.acquire()
+        second = await pool.acquire()
+        await pool.release(first)
+        await asyncio.sleep(0.01)
+        await pool.release(second)
+        assert pool.size == 1
+        assert pool.stats.shrunk == 1
+        assert len(fake_driver.sessions) == 1
+
+
+async def test_shrink_without_use(fake_driver, fake_webdriver):
+    async with SessionPool(
+        fake_webdriver, browsers.Firefox(), idle_timeout=0.2
+    ) as pool:
+        first = await pool.acquire()
+        second = await pool.acquire()
+        await pool.release(first)
+        await pool.release(second)
+        assert pool.size == 2
+        await asyncio.sleep(0.5)
+        assert pool.size == 1
+        assert pool.stats.shrunk == 1
+        assert len(fake_driver.sessions) == 1
+
+
+async def test_reset_timeout(fake_driver, fake_webdriver):
+    async with SessionPool(
+        fake_webdriver, browsers.Firefox(), reset_timeout=0.1
+    ) as pool:
+        session = await pool.acquire()
+        fake_driver.latency = 0.2
+        await pool.release(session)
+        fake_driver.latency = 0
+        assert pool.stats.reset_failures == 1
@@ -0,0 +1,67 @@
+import socket
+
+import pytest
+
+from arsenic.errors import ArsenicError, ServiceExited
+from arsenic.fakedriver import FakeDriverService
+from arsenic.ports import PortAllocator
+from arsenic.services import start_on_port
+from arsenic.utils import free_port
+
+
+def test_reserve(tmpdir):
+    port = free_port()
+    first = PortAllocator(port, port, str(tmpdir))
+    second = PortAllocator(port, port, str(tmpdir))
+    reservation = first.reserve()
+    assert reservation.port == port
+    with pytest.raises(ArsenicError):
+        first.reserve()
+    with pytest.raises(ArsenicError):
+        second.reserve()
+    assert second.stats.locked_elsewhere == 1
+    reservation.release()
+    with second.reserve() as reservation:
+        assert reservation.port == port
+    assert second.stats.reserved == 1
+
+
+def test_port_in_use(tmpdir):
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("0.0.0.0", 0))
+        sock.listen(1)
+        port = sock.getsockname()[1]
+        allocator = PortAllocator(port, port, str(tmpdir))
+        with pytest.raises(ArsenicError):
+            allocator.reserve()
+        assert allocator.stats.in_use == 1
+
+
+@pytest.mark.asyncio
+async def test_start_on_port(tmpdir):
+    port = free_port()
+    allocator = PortAllocator(port, port + 1, str(tmpdir))
+    ports = []
+
+    async def start(port):
+        ports.append(port)
+        if len(ports) == 1:
+            raise ServiceExited(1)
+        return await FakeDriverService().start()
+
+    driver = await start_on_port(start, allocator)
+    assert len(ports) == 2
+    with allocator.reserve():
+        # the driver holds the other port
+        with pytest.raises(ArsenicError):
+            allocator.reserve()
+    await driver.close()
+    with allocator.reserve(), allocator.reserve():
+        pass
+
+    async def exit(port):
+        raise ServiceExited(1)
+
+    with pytest.raises(ServiceExited):
+        await start_on_port(exit, allocator, attempts=2)
+    assert allocator._reserved == set()
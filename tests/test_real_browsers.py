@@ -61,6 +61,25 @@ async def test_displayed(session):
     assert await session.wait(5, div.is_displayed)
 
 
+async def test_fetch_paths_agree(session):
+    await session.get("/selectors/")
+    await session.wait_for_element(5, "h2")
+    elements = await session.get_elements("div, a, h2")
+    options = dict(
+        text=True,
+        attrs=["class"],
+        props=["tagName"],
+        css=["display"],
+        rect=True,
+        displayed=True,
+        enabled=True,
+    )
+    scripted = await session.fetch(elements, **options)
+    assert session.fetch_script
+    session.fetch_script = False
+    assert await session.fetch(elements, **options) == scripted
+
+
 async def test_execute_script(session):
     await session.get("/js/")
     div = await session.wait_for_element(5, "div")
@@ -0,0 +1,96 @@
+import pytest
+from aiohttp import ClientConnectorError
+
+from arsenic import browsers, errors, get_session
+from arsenic.retry import RetryPolicy
+from arsenic.services import Remote
+
+
+def policy(**kwargs):
+    return RetryPolicy(backoff=0, **kwargs)
+
+
+def test_idempotent():
+    retry = RetryPolicy()
+    assert retry.is_idempotent("GET", "/url")
+    assert retry.is_idempotent("POST", "/element")
+    assert retry.is_idempotent("POST", "/elements")
+    assert not retry.is_idempotent("POST", "/click")
+    assert not retry.is_idempotent("POST", "/url")
+    assert not retry.is_idempotent("DELETE", "")
+
+
+def test_delay():
+    retry = RetryPolicy(backoff=1, max_backoff=3, jitter=0)
+    assert [retry.delay(n) for n in range(1, 5)] == [1, 2, 3, 3]
+    retry.jitter = 0.5
+    assert all(0.5 <= retry.delay(1) <= 1 for _ in range(100))
+
+
+@pytest.mark.asyncio
+async def test_retries_idempotent_commands(fake_driver_server):
+    retry = policy()
+    async with get_session(
+        Remote(fake_driver_server.url, retry=retry), browsers.Chrome()
+    ) as s:
+        fake_driver_server.failures.extend([502, 503])
+        await s.get_url()
+        fake_driver_server.failures.append(504)
+        await s.get_element("h1")
+    assert retry.stats.retries == 3
+    assert retry.stats.reasons == {"502": 1, "503": 1, "504": 1}
+    assert retry.stats.gave_up == 0
+
+
+@pytest.mark.asyncio
+async def test_gives_up(fake_driver_server):
+    retry = policy(attempts=2)
+    async with get_session(
+        Remote(fake_driver_server.url, retry=retry), browsers.Chrome()
+    ) as s:
+        fake_driver_server.failures.extend([503, 503, 503])
+        with pytest.raises(errors.UnknownArsenicError):
+            await s.get_url()
+        assert fake_driver_server.failures == [503]
+        fake_driver_server.failures.clear()
+    assert retry.stats.retries == 1
+    assert retry.stats.gave_up == 1
+
+
+@pytest.mark.asyncio
+async def test_deadline(fake_driver_server):
+    retry = RetryPolicy(backoff=1, jitter=0, deadline=0.5)
+    async with get_session(
+        Remote(fake_driver_server.url, retry=retry), browsers.Chrome()
+    ) as s:
+        fake_driver_server.failures.append(502)
+        with pytest.raises(errors.UnknownArsenicError):
+            await s.get_url()
+    assert retry.stats.retries == 0
+    assert retry.stats.gave_up == 1
+
+
+@pytest.mark.asyncio
+async def test_no_retry_for_commands_with_side_effects(fake_driver_server):
+    retry = policy()
+    async with get_session(
+        Remote(fake_driver_server.url, retry=retry), browsers.Chrome()
+    ) as s:
+        element = await s.get_element("h1")
+        fake_driver_server.failures.append(503)
+        with pytest.raises(errors.UnknownArsenicError):
+            await element.click()
+    assert retry.stats.retries == 0
+
+
+@pytest.mark.asyncio
+async def test_retries_connection_errors(fake_driver_server):
+    retry = policy()
+    service = Remote(fake_driver_server.url, retry=retry)
+    async with get_session(service, browsers.Chrome()) as s:
+        url = fake_driver_server.url
+        await fake_driver_server.stop()
+        with pytest.raises(ClientConnectorError):
+            await s.get_url()
+        assert retry.stats.reasons["ClientConnectorError"] == 2
+        await fake_driver_server.start(port=int(url.rsplit(":", 1)[1]))
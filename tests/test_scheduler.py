@@ -0,0 +1,146 @@
+import asyncio
+
+import pytest
+
+from arsenic import browsers
+from arsenic.connection import RemoteConnection
+from arsenic.scheduler import CommandScheduler, Priority, current_priority, priority
+from arsenic.streaming import aclosing
+
+pytestmark = [pytest.mark.asyncio]
+
+
+async def occupy(scheduler: CommandScheduler, release: asyncio.Event):
+    await scheduler.run(release.wait)
+
+
+async def record(scheduler: CommandScheduler, level: Priority, order: list):
+    async def command():
+        order.append(level)
+
+    with priority(level):
+        await scheduler.run(command)
+
+
+async def test_priority():
+    scheduler = CommandScheduler(aging=None)
+    release = asyncio.Event()
+    order = []
+    holder = asyncio.ensure_future(occupy(scheduler, release))
+    await asyncio.sleep(0)
+    jobs = [
+        asyncio.ensure_future(record(scheduler, level, order))
+        for level in (Priority.background, Priority.normal, Priority.interactive)
+    ]
+    await asyncio.sleep(0)
+    assert scheduler.stats.depth == 3
+    release.set()
+    await asyncio.gather(holder, *jobs)
+    assert order == [Priority.interactive, Priority.normal, Priority.background]
+    assert scheduler.stats.depth == 0
+    assert scheduler.stats.max_depth == 3
+    assert scheduler.stats.in_flight == 0
+    stats = scheduler.stats.priorities
+    assert stats[Priority.normal].dispatched == 2
+    assert stats[Priority.background].dispatched == 1
+    assert stats[Priority.background].max_wait >= stats[Priority.interactive].max_wait
+    assert current_priority() == Priority.normal
+
+
+async def test_aging():
+    scheduler = CommandScheduler(aging=0.01)
+    release = asyncio.Event()
+    order = []
+    holder = asyncio.ensure_future(occupy(scheduler, release))
+    await asyncio.sleep(0)
+    background = asyncio.ensure_future(record(scheduler, Priority.background, order))
+    await asyncio.sleep(0.05)
+    interactive = asyncio.ensure_future(record(scheduler, Priority.interactive, order))
+    await asyncio.sleep(0)
+    release.set()
+    await asyncio.gather(holder, background, interactive)
+    assert order == [Priority.background, Priority.interactive]
+
+
+async def test_cancel_waiter():
+    scheduler = CommandScheduler()
+    release = asyncio.Event()
+    order = []
+    holder = asyncio.ensure_future(occupy(scheduler, release))
+    await asyncio.sleep(0)
+    waiter = asyncio.ensure_future(record(scheduler, Priority.normal, order))
+    await asyncio.sleep(0)
+    assert scheduler.stats.depth == 1
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+    assert scheduler.stats.depth == 0
+    release.set()
+    await holder
+    assert scheduler.stats.in_flight == 0
+    assert order == []
+
+
+async def test_session_scheduler(fake_driver, fake_webdriver):
+    fake_driver.latency = 0.01
+    scheduler = CommandScheduler(concurrency=2)
+    async with fake_webdriver.session(
+        browsers.Chrome(), scheduler=scheduler
+    ) as session:
+        await session.get("http://example.com")
+        await asyncio.gather(*(session.get_url() for _ in range(6)))
+        element = await session.get_element("h1")
+        await element.get_text()
+        assert [piece async for piece in session.iter_page_source()]
+        assert scheduler.stats.max_depth == 4
+        assert scheduler.stats.in_flight == 0
+        assert scheduler.stats.priorities[Priority.normal].dispatched == 10
+
+
+class FailingTracer:
+    enabled = True
+
+    def should_trace(self):
+        return True
+
+    def request(self, **kwargs):
+        raise RuntimeError("tracer failed")
+
+
+async def test_stream_releases_slot(fake_webdriver):
+    scheduler = CommandScheduler()
+    async with fake_webdriver.session(
+        browsers.Chrome(), scheduler=scheduler
+    ) as session:
+        pieces = session.iter_page_source()
+        async with aclosing(pieces):
+            async for _ in pieces:
+                assert scheduler.stats.in_flight == 1
+                break
+        assert scheduler.stats.in_flight == 0
+        session.connection.tracer = FailingTracer()
+        with pytest.raises(RuntimeError):
+            await session.get_page_source()
+        assert scheduler.stats.in_flight == 0
+        with pytest.raises(RuntimeError):
+            await session.save_page_source(lambda piece: None)
+        assert scheduler.stats.in_flight == 0
+        session.connection.tracer = None
+
+
+@pytest.mark.parametrize(
+    "fake_service_options", [{"connection_class": RemoteConnection}]
+)
+async def test_upload_is_scheduled(fake_webdriver, tmp_path):
+    path = tmp_path / "upload.txt"
+    path.write_text("content")
+    scheduler = CommandScheduler()
+    async with fake_webdriver.session(
+        browsers.Chrome(), scheduler=scheduler
+    ) as session:
+        stats = scheduler.stats.priorities[Priority.normal]
+        dispatched = stats.dispatched
+        with priority(Priority.background):
+            await session.connection.upload_file(path)
+        assert stats.dispatched == dispatched
+        assert scheduler.stats.priorities[Priority.background].dispatched == 1
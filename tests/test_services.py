@@ -1,7 +1,12 @@
-import pytest
+import re
 import sys
 
+import pytest
+
+from arsenic import services
+from arsenic.errors import ServiceExited
 from arsenic.services import Geckodriver
+from arsenic.utils import free_port
 
 pytestmark = [pytest.mark.asyncio]
 
@@ -21,3 +26,65 @@ async def test_geckodriver_version_ok(tmpdir, version, check, result):
     else:
         with pytest.raises(ValueError):
             await driver._check_version()
+
+
+DRIVER_SCRIPT = """
+import sys
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+
+class Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = b'{"value": {"ready": true}}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+server = HTTPServer(("localhost", int(sys.argv[1])), Handler)
+print("Listening on port", sys.argv[1], flush=True)
+server.serve_forever()
+"""
+
+
+@pytest.mark.parametrize(
+    "pattern,ready_by", [("Listening on port", "output"), ("never printed", "status")]
+)
+async def test_subprocess_service_ready(tmpdir, monkeypatch, pattern, ready_by):
+    monkeypatch.setattr(services, "STATUS_FALLBACK_DELAY", 0.05)
+    script = tmpdir.join("driver.py")
+    script.write(DRIVER_SCRIPT)
+    port = free_port()
+    log_path = tmpdir.join("log.txt")
+    with open(str(log_path), "w") as log_file:
+        driver = await services.subprocess_based_service(
+            [sys.executable, str(script), str(port)],
+            f"http://localhost:{port}",
+            log_file,
+            ready=re.compile(pattern),
+        )
+        try:
+            assert driver.startup.ready_by == ready_by
+            assert driver.startup.total >= driver.startup.ready > 0
+            status, data = await driver.connection.request(url="/status", method="GET")
+            assert data == {"value": {"ready": True}}
+        finally:
+            await driver.close()
+    assert log_path.read() == f"Listening on port {port}\n"
+
+
+async def test_subprocess_service_exit():
+    port = free_port()
+    with pytest.raises(ServiceExited) as info:
+        await services.subprocess_based_service(
+            [sys.executable, "-c", "raise SystemExit(3)"],
+            f"http://localhost:{port}",
+            sys.stdout,
+            start_timeout=30,
+        )
+    assert info.value.returncode == 3
@@ -0,0 +1,99 @@
+import base64
+import json
+import random
+from io import BytesIO, StringIO
+
+import pytest
+
+from arsenic.errors import StaleElementReference
+from arsenic.streaming import Base64Decoder, ValueStream
+
+SAMPLES = ["", "plain", 'quo"te', "back\\slash", "new\nline", "ünï", "😀", "\ud800x"]
+
+
+def feed_in_chunks(stream, body, size):
+    pieces = []
+    for index in range(0, len(body), size):
+        pieces.extend(stream.feed(body[index : index + size]))
+    return "".join(pieces)
+
+
+@pytest.mark.parametrize("value", SAMPLES)
+@pytest.mark.parametrize("ensure_ascii", [True, False])
+@pytest.mark.parametrize("size", [1, 3, 1024])
+def test_value_stream(value, ensure_ascii, size):
+    if not ensure_ascii and "\ud800" in value:
+        raise pytest.skip("lone surrogates are not valid UTF-8")
+    document = {"sessionId": {"value": "nested", "list": ["}"]}, "value": value}
+    body = json.dumps(document, ensure_ascii=ensure_ascii).encode("utf-8")
+    stream = ValueStream()
+    assert feed_in_chunks(stream, body, size) == value
+    assert stream.done
+    assert stream.is_string
+
+
+@pytest.mark.parametrize(
+    "body", [b'{"value": null}', b'{"status": 7, "value": {"message": "m"}}', b"{}"]
+)
+def test_value_stream_not_a_string(body):
+    stream = ValueStream()
+    assert feed_in_chunks(stream, body, 2) == ""
+    assert not stream.is_string
+    assert bytes(stream.consumed) == body
+
+
+def test_base64_decoder():
+    data = bytes(random.getrandbits(8) for _ in range(1000))
+    encoded = base64.b64encode(data).decode("ascii")
+    decoder = Base64Decoder()
+    pieces = [encoded[i : i + 7] for i in range(0, len(encoded), 7)]
+    decoded = b"".join(decoder.feed(piece) for piece in pieces) + decoder.close()
+    assert decoded == data
+
+
+@pytest.fixture
+def fake_driver_options():
+    return {"screenshot_size": 100_000, "page_source_size": 200_000}
+
+
+@pytest.mark.asyncio
+async def test_save_screenshot(fake_session, tmp_path):
+    expected = b"\x89PNG" + b"\0" * 100_000
+    path = tmp_path / "screen.png"
+    assert await fake_session.save_screenshot(path) == len(expected)
+    assert path.read_bytes() == expected
+    fobj = BytesIO()
+    await fake_session.save_screenshot(fobj)
+    assert fobj.getvalue() == expected
+    assert (await fake_session.get_screenshot()).read() == expected
+    assert await fake_session.get_screenshot_view() == expected
+
+
+@pytest.mark.asyncio
+async def test_element_screenshot_error(fake_session):
+    element = await fake_session.get_element("h1")
+    assert len(await element.get_screenshot_view()) == 100_004
+    await fake_session.get("/")
+    with pytest.raises(StaleElementReference):
+        await element.get_screenshot_view()
+
+
+@pytest.mark.asyncio
+async def test_save_page_source(fake_session, tmp_path):
+    expected = await fake_session.get_page_source()
+    assert len(expected) > 200_000
+    path = tmp_path / "source.html"
+    assert await fake_session.save_page_source(path) == len(expected)
+    assert path.read_text(encoding="utf-8") == expected
+    fobj = StringIO()
+    await fake_session.save_page_source(fobj)
+    assert fobj.getvalue() == expected
+    received = []
+
+    async def sink(piece):
+        received.append(piece)
+
+    await fake_session.save_page_source(sink)
+    assert "".join(received) == expected
+    pieces = [piece async for piece in fake_session.iter_page_source()]
+    assert "".join(pieces) == expected
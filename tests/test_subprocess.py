@@ -63,6 +63,53 @@ async def test_start_stop_process(impl, unused_tcp_port):
             await asyncio.sleep(0.5)
 
 
+async def test_process_output(impl, tmpdir):
+    lines = []
+    log_path = tmpdir.join("log.txt")
+    with open(str(log_path), "w") as log_file:
+        proc = await impl.start_process(
+            [sys.executable, "-c", 'print("one"); print("two", flush=True)'],
+            log_file,
+            lines.append,
+        )
+        for _ in range(50):
+            if len(lines) == 2:
+                break
+            await asyncio.sleep(0.1)
+        await impl.stop_process(proc)
+    assert lines == ["one", "two"]
+    assert log_path.read().splitlines() == ["one", "two"]
+
+
+LONG_OUTPUT = """
+import sys
+sys.stdout.write("x" * 10000 + "\\n")
+for i in range(200):
+    sys.stdout.write(str(i) * 1000 + "\\n")
+sys.stdout.write("done\\n")
+sys.stdout.flush()
+"""
+
+
+async def test_long_output_lines(impl, tmpdir, monkeypatch):
+    monkeypatch.setattr("arsenic.subprocess.MAX_LINE", 1024)
+    lines = []
+    log_path = tmpdir.join("log.txt")
+    with open(str(log_path), "w") as log_file:
+        proc = await impl.start_process(
+            [sys.executable, "-c", LONG_OUTPUT], log_file, lines.append
+        )
+        for _ in range(50):
+            if lines and lines[-1] == "done":
+                break
+            await asyncio.sleep(0.1)
+        await impl.stop_process(proc)
+    assert lines[-1] == "done"
+    assert len(lines) == 202
+    assert lines[0].startswith("x")
+    assert log_path.read().splitlines()[0] == "x" * 10000
+
+
 def main(port):
     sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     sock.bind(("localhost", port))
@@ -0,0 +1,74 @@
+import asyncio
+
+import pytest
+
+from arsenic import browsers
+from arsenic.errors import ArsenicTimeout, CommandTimeout
+from arsenic.timeouts import CommandTimeouts, deadline, remaining
+
+
+def test_for_command():
+    timeouts = CommandTimeouts(
+        default=1, new_session=2, navigation=3, script=4, lookup=5, upload=6
+    )
+    assert timeouts.for_command("GET", "/url") == 1
+    assert timeouts.for_command("POST", "/session") == 2
+    assert timeouts.for_command("POST", "/url") == 3
+    assert timeouts.for_command("POST", "/back") == 3
+    assert timeouts.for_command("POST", "/execute/async") == 4
+    assert timeouts.for_command("POST", "/element") == 5
+    assert timeouts.for_command("POST", "/element/abc/elements") == 5
+    assert timeouts.for_command("POST", "/file") == 6
+    assert timeouts.for_command("POST", "/element/abc/click") == 1
+
+
+@pytest.mark.asyncio
+async def test_session_timeouts(fake_driver, fake_webdriver):
+    timeouts = CommandTimeouts(default=0.05, navigation=None)
+    async with fake_webdriver.session(browsers.Chrome(), timeouts=timeouts) as session:
+        fake_driver.latency = 0.2
+        with pytest.raises(CommandTimeout) as info:
+            await session.get_url()
+        assert isinstance(info.value, ArsenicTimeout)
+        assert isinstance(info.value, asyncio.TimeoutError)
+        element = await session.get_element("h1")
+        with pytest.raises(CommandTimeout):
+            await element.get_text()
+        with pytest.raises(CommandTimeout):
+            await session.get("/", timeout=0.05)
+        await session.get("/")
+        fake_driver.latency = 0
+
+
+@pytest.mark.asyncio
+async def test_new_session_timeout(fake_driver, fake_webdriver):
+    fake_driver.latency = 0.2
+    with pytest.raises(CommandTimeout):
+        await fake_webdriver.new_session(
+            browsers.Chrome(), timeouts=CommandTimeouts(new_session=0.05)
+        )
+    session = await fake_webdriver.new_session(
+        browsers.Chrome(), timeouts=CommandTimeouts(default=0.05, new_session=None)
+    )
+    fake_driver.latency = 0
+    await session.close()
+
+
+@pytest.mark.asyncio
+async def test_deadline(fake_driver, fake_session):
+    fake_driver.latency = 0.1
+    assert remaining() is None
+    async with deadline(0.15) as outer:
+        await fake_session.get_url()
+        async with deadline(10):
+            assert outer.remaining <= 0.05
+            assert remaining() <= 0.05
+            with pytest.raises(CommandTimeout):
+                await fake_session.get_url()
+        count = len(fake_driver.commands)
+        with pytest.raises(CommandTimeout):
+            await fake_session.get_url()
+        assert len(fake_driver.commands) == count
+    assert remaining() is None
+    fake_driver.latency = 0
+    await fake_session.get_url()
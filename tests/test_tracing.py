@@ -0,0 +1,79 @@
+import json
+
+import pytest
+
+from arsenic.errors import NoSuchElement
+from arsenic.tracing import FileSink, WireTracer, truncate
+
+
+class ListSink:
+    def __init__(self):
+        self.events = []
+
+    def info(self, event, **kwargs):
+        self.events.append((event, kwargs))
+
+
+@pytest.mark.parametrize(
+    "body,max_size,result",
+    [
+        (None, 3, None),
+        ("abc", 3, "abc"),
+        ("abcdef", 3, "abc...<3 more>"),
+        (b"abcdef", 4, "abcd...<2 more>"),
+        ("abcdef", None, "abcdef"),
+    ],
+)
+def test_truncate(body, max_size, result):
+    assert truncate(body, max_size) == result
+
+
+@pytest.fixture
+def fake_driver_options():
+    return {"page_source_size": 10_000}
+
+
+@pytest.mark.asyncio
+async def test_trace_truncates_bodies(fake_session):
+    sink = ListSink()
+    fake_session.connection.tracer = WireTracer(max_body_size=100, sink=sink)
+    await fake_session.get_page_source()
+    event, data = sink.events[-1]
+    assert event == "response"
+    assert data["status"] == 200
+    assert data["body"].endswith("...<9926 more>")
+
+
+@pytest.mark.asyncio
+async def test_unsampled_errors_are_traced(fake_session):
+    sink = ListSink()
+    fake_session.connection.tracer = WireTracer(sample_rate=0, sink=sink)
+    await fake_session.get_url()
+    assert sink.events == []
+    with pytest.raises(NoSuchElement):
+        await fake_session.get_element("#missing")
+    assert [event for event, _ in sink.events] == ["response"]
+    assert sink.events[0][1]["status"] == 404
+
+
+@pytest.mark.asyncio
+async def test_disabled_tracer(fake_session):
+    sink = ListSink()
+    fake_session.connection.tracer = WireTracer(enabled=False, sink=sink)
+    await fake_session.get_url()
+    with pytest.raises(NoSuchElement):
+        await fake_session.get_element("#missing")
+    assert sink.events == []
+
+
+def test_file_sink(tmp_path):
+    path = tmp_path / "wire.log"
+    sink = FileSink(str(path), max_bytes=200, backups=1)
+    try:
+        for i in range(10):
+            sink.info("request", url=f"http://example.com/{i}")
+    finally:
+        sink.close()
+    lines = path.read_text().splitlines()
+    assert json.loads(lines[-1]) == {"event": "request", "url": "http://example.com/9"}
+    assert (tmp_path / "wire.log.1").exists()
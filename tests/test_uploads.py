@@ -0,0 +1,116 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+from arsenic import browsers, get_session
+from arsenic.connection import RemoteConnection
+from arsenic.services import Remote
+from arsenic.uploads import UploadCache, file_digest
+
+
+def test_lru_eviction():
+    cache = UploadCache(max_entries=2)
+    cache.put("a", Path("/a"), 1)
+    cache.put("b", Path("/b"), 1)
+    assert cache.get("a") == Path("/a")
+    cache.put("c", Path("/c"), 1)
+    assert cache.get("b") is None
+    assert cache.get("a") == Path("/a")
+    assert cache.stats.evictions == 1
+
+
+def test_size_eviction():
+    cache = UploadCache(max_bytes=10)
+    cache.put("a", Path("/a"), 6)
+    cache.put("b", Path("/b"), 6)
+    assert len(cache) == 1
+    assert cache.get("b") == Path("/b")
+
+
+def test_ttl(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("arsenic.uploads.time.monotonic", lambda: now[0])
+    cache = UploadCache(ttl=5)
+    cache.put("a", Path("/a"), 1)
+    now[0] += 4
+    assert cache.get("a") == Path("/a")
+    now[0] += 2
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_digest_follows_content(tmp_path):
+    cache = UploadCache()
+    path = tmp_path / "file.txt"
+    path.write_text("one")
+    first = cache.digest(path)
+    assert cache.digest(path) == first
+    path.write_text("two!")
+    assert cache.digest(path) != first
+
+
+def test_digests_are_bounded(tmp_path):
+    cache = UploadCache(max_entries=2)
+    paths = []
+    for index in range(4):
+        path = tmp_path / f"file{index}.txt"
+        path.write_text(str(index))
+        paths.append(path)
+        cache.digest(path)
+    assert len(cache._digests) == 2
+    cache.digest(paths[2])
+    cache.digest(paths[0])
+    assert [key[0] for key in cache._digests] == [
+        os.path.realpath(paths[2]),
+        os.path.realpath(paths[0]),
+    ]
+
+
+def test_digests_from_many_threads(tmp_path):
+    cache = UploadCache(max_entries=2)
+    paths = []
+    for index in range(8):
+        path = tmp_path / f"file{index}.txt"
+        path.write_text(str(index))
+        paths.append(path)
+    with ThreadPoolExecutor(8) as executor:
+        digests = list(executor.map(cache.digest, paths * 50))
+    assert digests == [file_digest(path) for path in paths * 50]
+    assert len(cache._digests) == 2
+
+
+@pytest.fixture
+def fake_service_options():
+    return {"connection_class": RemoteConnection}
+
+
+@pytest.mark.asyncio
+async def test_cached_uploads(fake_driver, fake_webdriver, tmp_path):
+    path = tmp_path / "fixture.txt"
+    path.write_text("fixture")
+    fake_webdriver.connection.upload_cache = cache = UploadCache()
+    session = await fake_webdriver.new_session(browsers.Chrome())
+    remote_path = await session.connection.upload_file(path)
+    assert await session.connection.upload_file(path) == remote_path
+    other = await fake_webdriver.new_session(browsers.Chrome())
+    assert await other.connection.upload_file(path) != remote_path
+    assert len(fake_driver.uploads) == 2
+    assert cache.stats.hits == 1
+    assert cache.stats.misses == 2
+    assert cache.stats.bytes_saved == 7
+
+
+@pytest.mark.asyncio
+async def test_remote_upload_cache(fake_driver_server, tmp_path):
+    path = tmp_path / "fixture.txt"
+    path.write_text("fixture")
+    cache = UploadCache()
+    service = Remote(fake_driver_server.url, upload_cache=cache)
+    async with get_session(service, browsers.Chrome()) as session:
+        assert session.connection.upload_cache is cache
+        await session.connection.upload_file(path)
+        await session.connection.upload_file(path)
+    assert len(fake_driver_server.uploads) == 1
+    assert cache.stats.hits == 1
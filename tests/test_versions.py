@@ -0,0 +1,81 @@
+import re
+import sys
+
+import pytest
+
+from arsenic.services import Chromedriver, Geckodriver, MSEdgeDriver
+from arsenic.versions import VersionCache, binary_key
+
+pytestmark = [
+    pytest.mark.asyncio,
+    pytest.mark.skipif(sys.platform == "win32", reason="Not supported on windows"),
+]
+
+VERSION_RE = re.compile(r"driver (\d+\.\d+)")
+
+
+def make_binary(tmpdir, output):
+    path = tmpdir.join("driver")
+    runs = tmpdir.join("runs")
+    path.write(
+        f"#!{sys.executable}\n"
+        f"open({str(runs)!r}, 'a').write('x')\n"
+        f"print({output!r})\n"
+    )
+    path.chmod(0o755)
+    return path, runs
+
+
+async def test_memory_cache(tmpdir):
+    path, runs = make_binary(tmpdir, "driver 1.2")
+    cache = VersionCache()
+    assert await cache.version(str(path), VERSION_RE) == "1.2"
+    assert await cache.version(str(path), VERSION_RE) == "1.2"
+    assert runs.read() == "x"
+    assert cache.stats.probes == 1
+    assert cache.stats.hits == 1
+    path.write(path.read().replace("1.2", "1.30"))
+    assert await cache.version(str(path), VERSION_RE) == "1.30"
+    assert cache.stats.probes == 2
+
+
+async def test_disk_cache(tmpdir):
+    path, runs = make_binary(tmpdir, "driver 1.2")
+    cache_path = str(tmpdir.join("cache", "versions.json"))
+    assert await VersionCache(cache_path).output(str(path)) == "driver 1.2\n"
+    cache = VersionCache(cache_path)
+    assert await cache.output(str(path)) == "driver 1.2\n"
+    assert runs.read() == "x"
+    assert cache.stats.disk_hits == 1
+    cache.clear()
+    assert len(cache) == 0
+    assert await cache.output(str(path)) == "driver 1.2\n"
+    assert runs.read() == "xx"
+
+
+async def test_unknown_binary(tmpdir):
+    assert binary_key(str(tmpdir.join("missing"))) is None
+    with pytest.raises(Exception):
+        await VersionCache().output(str(tmpdir.join("missing")))
+
+
+@pytest.mark.parametrize(
+    "service_class,output,version",
+    [
+        (Geckodriver, "geckodriver 0.33.0 (a80e5fd61076 2023-04-02)", "0.33"),
+        (Chromedriver, "ChromeDriver 114.0.5735.90 (386bc09e8f4f)", "114.0.5735.90"),
+        (
+            MSEdgeDriver,
+            "Microsoft Edge WebDriver 114.0.1823.51 (f9e3)",
+            "114.0.1823.51",
+        ),
+        (MSEdgeDriver, "MSEdgeDriver 91.0.864.59 (a1b2)", "91.0.864.59"),
+    ],
+)
+async def test_service_version(tmpdir, service_class, output, version):
+    path, runs = make_binary(tmpdir, output)
+    cache = VersionCache()
+    service = service_class(binary=str(path), version_cache=cache)
+    assert await service.version() == version
+    assert await service.version() == version
+    assert cache.stats.probes == 1
@@ -0,0 +1,152 @@
+import time
+
+import pytest
+
+from arsenic import browsers, constants
+from arsenic.constants import SelectorType
+from arsenic.errors import ArsenicTimeout
+from arsenic.fakedriver import FakeDriverError
+from arsenic.scheduler import CommandScheduler
+from arsenic.waits import (
+    SCHEDULED_SLICE,
+    WAIT_SCRIPT,
+    Attribute,
+    Present,
+    Text,
+    Visible,
+)
+
+pytestmark = [pytest.mark.asyncio]
+
+
+class BrowserWaits:
+    """
+    Answers the wait script like a browser in which the condition holds after
+    ``rounds`` unsatisfied slices.
+    """
+
+    def __init__(self, rounds=0, error=None):
+        self.rounds = rounds
+        self.error = error
+        self.specs = []
+        self.durations = []
+        self.element_id = None
+
+    def __call__(self, script, args):
+        assert script == WAIT_SCRIPT
+        spec, duration = args
+        self.specs.append(spec)
+        self.durations.append(duration)
+        if self.error:
+            raise FakeDriverError(self.error, "failed", 500)
+        if self.rounds:
+            self.rounds -= 1
+            time.sleep(min(duration / 1000, 0.01))
+            return {"satisfied": False}
+        element = None
+        if spec["kind"] != "absent":
+            element = {constants.WEB_ELEMENT: self.element_id}
+        return {"satisfied": True, "element": element}
+
+
+@pytest.fixture
+async def browser_waits():
+    return BrowserWaits()
+
+
+@pytest.fixture
+def fake_driver_options(browser_waits):
+    return {"script_handler": browser_waits}
+
+
+@pytest.fixture
+async def fake_session(fake_session, browser_waits):
+    fake_session.browser_waits = True
+    browser_waits.element_id = (await fake_session.get_element("h1")).id
+    return fake_session
+
+
+async def test_polls_by_default(fake_webdriver, browser_waits):
+    async with fake_webdriver.session(browsers.Chrome()) as session:
+        assert not session.browser_waits
+        await session.wait_for_element(1, "h1")
+        await session.wait_for(1, Visible("h1"))
+    assert browser_waits.specs == []
+
+
+async def test_wait_in_browser(fake_session, browser_waits):
+    browser_waits.rounds = 2
+    element = await fake_session.wait_for_element(5, "h1")
+    assert element.id == browser_waits.element_id
+    assert await fake_session.wait_for_element_gone(5, "//h2", SelectorType.xpath)
+    assert browser_waits.specs == [
+        {"kind": "present", "using": "css", "value": "h1"}
+    ] * 3 + [{"kind": "absent", "using": "xpath", "value": "//h2"}]
+    assert fake_session.browser_waits
+
+
+async def test_conditions(fake_session, browser_waits):
+    await fake_session.wait_for(1, Visible("h1"))
+    await fake_session.wait_for(1, Text("h1", "hello"))
+    await fake_session.wait_for(1, Attribute("a", "href", "/"))
+    assert [spec["kind"] for spec in browser_waits.specs] == [
+        "visible",
+        "text",
+        "attribute",
+    ]
+    assert browser_waits.specs[1]["text"] == "hello"
+    assert browser_waits.specs[2]["name"] == "href"
+    assert browser_waits.specs[2]["expected"] == "/"
+
+
+async def test_timeout(fake_session, browser_waits):
+    browser_waits.rounds = 1000
+    fake_session.wait_slice = 0.05
+    with pytest.raises(ArsenicTimeout):
+        await fake_session.wait_for_element(0.2, "h1")
+
+
+async def test_script_timeout_shortens_slices(fake_session, browser_waits):
+    browser_waits.error = "script timeout"
+    with pytest.raises(ArsenicTimeout):
+        await fake_session.wait_for(0.5, Text("h1", "never"))
+    assert len(browser_waits.specs) == 6
+    # the shorter slice only applies to that wait
+    assert fake_session.browser_waits
+    assert fake_session.wait_slice == 5.0
+
+
+async def test_transient_error_polls_once(fake_session, browser_waits):
+    browser_waits.error = "unknown error"
+    await fake_session.wait_for_element(1, "h1")
+    assert fake_session.browser_waits
+    browser_waits.error = None
+    await fake_session.wait_for_element(1, "h1")
+    assert len(browser_waits.specs) == 2
+
+
+async def test_scheduler_shortens_slices(fake_webdriver, browser_waits):
+    browser_waits.rounds = 1
+    scheduler = CommandScheduler()
+    async with fake_webdriver.session(
+        browsers.Chrome(), scheduler=scheduler
+    ) as session:
+        session.browser_waits = True
+        browser_waits.element_id = (await session.get_element("h1")).id
+        await session.wait_for_element(10, "h1")
+    assert browser_waits.durations == [SCHEDULED_SLICE * 1000] * 2
+
+
+async def test_fallback_to_polling(fake_session, browser_waits):
+    browser_waits.error = "unknown command"
+    element = await fake_session.wait_for(1, Text("h1", "text of"))
+    assert await element.get_text() == f"text of {element.id}"
+    assert not fake_session.browser_waits
+    assert await fake_session.wait_for(1, Visible("h1"))
+    assert len(browser_waits.specs) == 1
+
+
+async def test_unsupported_selector_polls(fake_session, browser_waits):
+    await fake_session.wait_for(1, Present("Home", SelectorType.link_text))
+    assert browser_waits.specs == []
+    assert fake_session.browser_waits
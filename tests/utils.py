@@ -4,6 +4,10 @@ from shutil import which
 
 import pytest as pytest
 
+from arsenic import constants
+from arsenic.fakedriver import FakeDriverError
+from arsenic.session import FETCH_SCRIPT
+
 
 @contextmanager
 def null_context():
@@ -21,3 +25,51 @@ def find_binary(name: str) -> str:
         if path:
             return path
     raise pytest.skip(f"Could not find driver {name!r}, skipping")
+
+
+def fetch_handler(script, args):
+    """
+    Answers the fetch script like a browser would with the values the fake
+    driver returns for single element commands.
+    """
+    assert script == FETCH_SCRIPT
+    refs, options = args
+    rows = []
+    for ref in refs:
+        element_id = ref[constants.WEB_ELEMENT]
+        row = []
+        if options["text"]:
+            row.append(f"text of {element_id}")
+        for kind in ("attrs", "props", "css"):
+            row.extend(f"{name} of {element_id}" for name in options[kind])
+        if options["rect"]:
+            row.append([1, 2, 3, 4])
+        if options["displayed"]:
+            row.append(True)
+        if options["enabled"]:
+            row.append(True)
+        rows.append(row)
+    return rows
+
+
+def disabled_handler(script, args):
+    raise FakeDriverError("javascript error", "scripting is disabled", 500)
+
+
+def unsupported_handler(script, args):
+    raise FakeDriverError("unknown command", "no script support", 404)
+
+
+def flaky_handler(failures):
+    """
+    Fails the first ``failures`` runs of the fetch script.
+    """
+    runs = []
+
+    def handler(script, args):
+        runs.append(script)
+        if len(runs) <= failures:
+            return disabled_handler(script, args)
+        return fetch_handler(script, args)
+
+    return handler